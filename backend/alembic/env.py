@@ -0,0 +1,53 @@
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from app.database.database import Base, DATABASE_URL
+import app.models.models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+if not config.get_main_option("sqlalchemy.url"):
+    config.set_main_option("sqlalchemy.url", DATABASE_URL)
+
+target_metadata = Base.metadata
+
+def include_object(object, name, type_, reflected, compare_to):
+    # SQLite's FTS5 search table (and its shadow tables) is created by DDL, not the metadata
+    if type_ == "table" and name.startswith("poll_search_fts"):
+        return False
+    # The tsvector GIN index only exists on Postgres
+    if type_ == "index" and name == "ix_polls_search_vector":
+        return context.get_context().dialect.name == "postgresql"
+    return True
+
+def run_migrations_offline():
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        # SQLite can't ALTER most things in place; batch mode rebuilds the table instead
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,82 @@
+"""Baseline: users, polls, options, votes and likes
+
+Databases created by create_all before migrations existed already have these
+tables; run `alembic stamp 0001` on them once, then `upgrade head`. Development
+databases that create_all built from the current models already have the
+objects of every revision; run `alembic stamp head` on those instead.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "polls",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("booster", sa.Boolean()),
+        sa.Column("expires_in", sa.Integer()),
+    )
+    op.create_index("ix_polls_id", "polls", ["id"])
+
+    op.create_table(
+        "poll_options",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("text", sa.String(), nullable=False),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_poll_options_id", "poll_options", ["id"])
+
+    op.create_table(
+        "votes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls.id"), nullable=False),
+        sa.Column("option_id", sa.Integer(), sa.ForeignKey("poll_options.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint("user_id", "poll_id", name="_user_poll_vote"),
+    )
+    op.create_index("ix_votes_id", "votes", ["id"])
+
+    op.create_table(
+        "poll_likes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint("user_id", "poll_id", name="_user_poll_like"),
+    )
+    op.create_index("ix_poll_likes_id", "poll_likes", ["id"])
+
+def downgrade():
+    op.drop_table("poll_likes")
+    op.drop_table("votes")
+    op.drop_table("poll_options")
+    op.drop_table("polls")
+    op.drop_table("users")
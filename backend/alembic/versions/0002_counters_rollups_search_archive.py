@@ -0,0 +1,157 @@
+"""Sharded counters, vote switches and rollups, trending and search columns,
+result snapshots, archive tables and users.last_seen_at
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+
+    op.create_table(
+        "poll_counter_shards",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls.id"), nullable=False),
+        sa.Column("option_id", sa.Integer(), sa.ForeignKey("poll_options.id"), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("poll_id", "option_id", "shard", name="_poll_option_shard"),
+    )
+    op.create_index("ix_poll_counter_shards_id", "poll_counter_shards", ["id"])
+    op.create_index("ix_poll_counter_shards_poll_id", "poll_counter_shards", ["poll_id"])
+
+    op.create_table(
+        "vote_switches",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls.id"), nullable=False),
+        sa.Column("from_option_id", sa.Integer(), sa.ForeignKey("poll_options.id"), nullable=False),
+        sa.Column("to_option_id", sa.Integer(), sa.ForeignKey("poll_options.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_vote_switches_id", "vote_switches", ["id"])
+    op.create_index("ix_vote_switches_poll_id", "vote_switches", ["poll_id"])
+
+    op.create_table(
+        "vote_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls.id"), nullable=False),
+        sa.Column("option_id", sa.Integer(), sa.ForeignKey("poll_options.id"), nullable=False),
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("poll_id", "bucket", "option_id", name="_poll_bucket_option_rollup"),
+    )
+    op.create_index("ix_vote_rollups_id", "vote_rollups", ["id"])
+
+    op.create_table(
+        "rollup_watermarks",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("last_id", sa.Integer(), nullable=False),
+    )
+
+    op.create_table(
+        "poll_result_snapshots",
+        sa.Column("poll_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("etag", sa.String(), nullable=False),
+        sa.Column("document", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+    with op.batch_alter_table("polls") as batch:
+        batch.add_column(sa.Column("trending_score", sa.Float()))
+        batch.add_column(sa.Column("search_vector", sa.Text().with_variant(TSVECTOR(), "postgresql")))
+        batch.add_column(sa.Column("deactivated_at", sa.DateTime(timezone=True)))
+    if dialect == "postgresql":
+        op.create_index("ix_polls_search_vector", "polls", ["search_vector"], postgresql_using="gin")
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS poll_search_fts "
+            "USING fts5(title, description, options, tokenize='porter')"
+        )
+
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("last_seen_at", sa.DateTime(timezone=True)))
+
+    # Archive tables keep the hot tables' ids and carry no unique constraints
+    op.create_table(
+        "polls_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("booster", sa.Boolean()),
+        sa.Column("expires_in", sa.Integer()),
+        sa.Column("deactivated_at", sa.DateTime(timezone=True)),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_polls_archive_created_at", "polls_archive", ["created_at"])
+
+    op.create_table(
+        "poll_options_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("text", sa.String(), nullable=False),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls_archive.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_poll_options_archive_poll_id", "poll_options_archive", ["poll_id"])
+
+    op.create_table(
+        "votes_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls_archive.id"), nullable=False),
+        sa.Column("option_id", sa.Integer(), sa.ForeignKey("poll_options_archive.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_votes_archive_poll_id", "votes_archive", ["poll_id"])
+    op.create_index("ix_votes_archive_user_id", "votes_archive", ["user_id"])
+
+    op.create_table(
+        "poll_likes_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls_archive.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_poll_likes_archive_poll_id", "poll_likes_archive", ["poll_id"])
+    op.create_index("ix_poll_likes_archive_user_id", "poll_likes_archive", ["user_id"])
+
+    op.create_table(
+        "vote_switches_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls_archive.id"), nullable=False),
+        sa.Column("from_option_id", sa.Integer(), sa.ForeignKey("poll_options_archive.id"), nullable=False),
+        sa.Column("to_option_id", sa.Integer(), sa.ForeignKey("poll_options_archive.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_vote_switches_archive_poll_id", "vote_switches_archive", ["poll_id"])
+
+def downgrade():
+    dialect = op.get_context().dialect.name
+
+    for table in ("vote_switches_archive", "poll_likes_archive", "votes_archive", "poll_options_archive", "polls_archive"):
+        op.drop_table(table)
+
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("last_seen_at")
+
+    if dialect == "postgresql":
+        op.drop_index("ix_polls_search_vector", table_name="polls")
+    elif dialect == "sqlite":
+        op.execute("DROP TABLE IF EXISTS poll_search_fts")
+    with op.batch_alter_table("polls") as batch:
+        batch.drop_column("deactivated_at")
+        batch.drop_column("search_vector")
+        batch.drop_column("trending_score")
+
+    for table in ("poll_result_snapshots", "rollup_watermarks", "vote_rollups", "vote_switches", "poll_counter_shards"):
+        op.drop_table(table)
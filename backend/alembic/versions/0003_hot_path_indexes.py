@@ -0,0 +1,58 @@
+"""Hot-path indexes: votes and likes by poll and option, polls by status and age,
+options by poll, and the expiry job's partial index
+
+Built with CREATE INDEX CONCURRENTLY on Postgres, so votes and polls stay
+writable while they build (outside a transaction; rerunning after a failure
+skips the indexes that already exist).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns)
+INDEXES = [
+    ("ix_votes_poll_id", "votes", ["poll_id"]),
+    ("ix_votes_option_id", "votes", ["option_id"]),
+    ("ix_poll_likes_poll_id", "poll_likes", ["poll_id"]),
+    ("ix_poll_options_poll_id", "poll_options", ["poll_id"]),
+    ("ix_polls_is_active_created_at", "polls", ["is_active", "created_at"]),
+]
+
+EXPIRING = ("ix_polls_expiring", "polls", ["is_active"])
+EXPIRING_WHERE = sa.text("expires_in IS NOT NULL")
+
+def upgrade():
+    if op.get_context().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+            name, table, columns = EXPIRING
+            op.create_index(
+                name, table, columns,
+                postgresql_where=EXPIRING_WHERE, postgresql_concurrently=True, if_not_exists=True
+            )
+        return
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+    name, table, columns = EXPIRING
+    op.create_index(name, table, columns, sqlite_where=EXPIRING_WHERE, if_not_exists=True)
+
+def downgrade():
+    concurrently = op.get_context().dialect.name == "postgresql"
+    names = [(name, table) for name, table, _ in INDEXES + [EXPIRING]]
+    if concurrently:
+        with op.get_context().autocommit_block():
+            for name, table in names:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        return
+    for name, table in names:
+        op.drop_index(name, table_name=table, if_exists=True)
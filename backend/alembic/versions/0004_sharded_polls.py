@@ -0,0 +1,26 @@
+"""Sharded poll registry, so every worker agrees on which polls' counter shards
+are seeded and maintained
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "sharded_polls",
+        sa.Column("poll_id", sa.Integer(), sa.ForeignKey("polls.id"), primary_key=True, autoincrement=False),
+        sa.Column("seeded_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    # Shards seeded by per-process bookkeeping before this revision can't be trusted
+    op.execute("DELETE FROM poll_counter_shards")
+
+def downgrade():
+    op.drop_table("sharded_polls")
@@ -0,0 +1,158 @@
+"""
+Concurrency benchmark for vote counters.
+
+Runs the same vote workload (a first vote, then switches between two options,
+each thread as its own user) from many threads at once against the baseline
+unsharded vote path, a single-row counter (1 shard) and a sharded counter, and
+reports throughput, latency and how often writers were blocked on row locks
+(sampled from pg_locks on Postgres).
+
+    python -m app.benchmarks.counter_contention --threads 32 --increments 200 --shards 16
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.database.database import SessionLocal, engine, create_tables
+from app.models.models import Poll, PollOption, PollCounterShard, ShardedPoll, User, Vote
+from app.services.sharded_counters import ShardedCounterService
+
+def _sample_lock_waits(stop: threading.Event, samples: list):
+    """Count ungranted row/transaction locks every few milliseconds (Postgres only)"""
+    with engine.connect() as conn:
+        while not stop.is_set():
+            waiting = conn.execute(text("SELECT count(*) FROM pg_locks WHERE NOT granted")).scalar()
+            samples.append(waiting)
+            conn.commit()
+            time.sleep(0.005)
+
+def _writer(counters: ShardedCounterService, poll: Poll, option_ids: list, increments: int, latencies: list):
+    """Vote as a new user, then keep switching options: the vote route's writes"""
+    db = SessionLocal()
+    try:
+        user = User(username=f"bench_user_{uuid.uuid4().hex}", email=f"{uuid.uuid4().hex}@bench.local", hashed_password="no_password")
+        db.add(user)
+        db.commit()
+        old_option_id = None
+        for i in range(increments):
+            option_id = option_ids[i % 2]
+            started = time.perf_counter()
+            counters.record_vote(db, poll, old_option_id, option_id)
+            if old_option_id is None:
+                db.add(Vote(user_id=user.id, poll_id=poll.id, option_id=option_id))
+            else:
+                db.query(Vote).filter(Vote.user_id == user.id, Vote.poll_id == poll.id).update({Vote.option_id: option_id})
+            db.commit()
+            latencies.append(time.perf_counter() - started)
+            old_option_id = option_id
+    finally:
+        db.close()
+
+def run(num_shards: int, threads: int, increments: int) -> dict:
+    """One pass; num_shards=0 runs the baseline, a plain poll whose votes never touch shards"""
+    counters = ShardedCounterService(num_shards=max(1, num_shards))
+
+    db = SessionLocal()
+    try:
+        owner = User(
+            username=f"bench_user_{time.time_ns()}",
+            email=f"{time.time_ns()}@bench.local",
+            hashed_password="no_password"
+        )
+        db.add(owner)
+        db.commit()
+        poll = Poll(title="Counter benchmark", user_id=owner.id, booster=num_shards > 0)
+        db.add(poll)
+        db.commit()
+        options = [PollOption(text="hot", poll_id=poll.id), PollOption(text="cold", poll_id=poll.id)]
+        db.add_all(options)
+        db.commit()
+        poll_id, option_ids, owner_id = poll.id, [option.id for option in options], owner.id
+
+        if num_shards:
+            # Seed up front so the measured loop is pure increments
+            counters._prepare(db, poll)
+            db.commit()
+        db.refresh(poll)
+        db.expunge(poll)
+    finally:
+        db.close()
+
+    latencies = []
+    lock_samples = []
+    stop = threading.Event()
+    sampler = None
+    if engine.dialect.name == "postgresql":
+        sampler = threading.Thread(target=_sample_lock_waits, args=(stop, lock_samples))
+        sampler.start()
+
+    workers = [
+        threading.Thread(target=_writer, args=(counters, poll, option_ids, increments, latencies))
+        for _ in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    if sampler:
+        sampler.join()
+
+    db = SessionLocal()
+    try:
+        counts = counters.counts(db, poll_id)
+        votes = db.query(Vote.user_id).filter(Vote.poll_id == poll_id)
+        total = sum(counts.values()) if counts is not None else votes.count()
+        voter_ids = [user_id for user_id, in votes.all()]
+        db.query(Vote).filter(Vote.poll_id == poll_id).delete()
+        db.query(PollCounterShard).filter(PollCounterShard.poll_id == poll_id).delete()
+        db.query(ShardedPoll).filter(ShardedPoll.poll_id == poll_id).delete()
+        db.query(PollOption).filter(PollOption.poll_id == poll_id).delete()
+        db.query(Poll).filter(Poll.id == poll_id).delete()
+        db.query(User).filter(User.id.in_(voter_ids + [owner_id])).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    latencies.sort()
+    return {
+        "shards": num_shards or "none",
+        "ops": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed if elapsed else 0,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "lock_wait_samples": sum(1 for s in lock_samples if s) if sampler else None,
+        "max_lock_waiters": max(lock_samples, default=0) if sampler else None,
+        "counted": total,  # one vote per thread
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the unsharded vote path vs single-row and sharded vote counters")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--increments", type=int, default=200, help="votes (a first vote, then switches) per thread")
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    create_tables()
+    if engine.dialect.name != "postgresql":
+        print("⚠️  Row-level lock waits are only measurable on Postgres; reporting latency only")
+
+    # 0: the baseline unsharded vote path
+    for num_shards in (0, 1, args.shards):
+        result = run(num_shards, args.threads, args.increments)
+        print(
+            f"shards={result['shards']:>4}  ops={result['ops']}  "
+            f"{result['ops_per_sec']:.0f} ops/s  p50={result['p50_ms']:.2f}ms  p99={result['p99_ms']:.2f}ms  "
+            f"lock_wait_samples={result['lock_wait_samples']}  max_waiters={result['max_lock_waiters']}  "
+            f"counted={result['counted']}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Query plan regression check.
+
+Seeds a scaled dataset with app.seed (once; run it against a scratch database), then drives
+the hot paths through the app: the poll list, poll details, a vote, a like and
+the expiry job's query. Every statement they run is captured and EXPLAINed.
+Exits non-zero when a plan scans a whole hot table or, on Postgres, when its
+estimated cost exceeds the budget, so CI can catch a missing index.
+
+    DATABASE_URL=postgresql://.../plans python -m app.benchmarks.query_plans --polls 20000 --max-cost 5000
+"""
+import argparse
+import json
+import sys
+import uuid
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event
+
+from app.database.database import SessionLocal, engine, create_tables
+from app.models.models import Poll, PollOption
+from app.seed import analyze, build_dataset, is_seeded
+
+# A full scan of any of these is a regression at scale
+HOT_TABLES = {"users", "polls", "poll_options", "votes", "poll_likes"}
+
+def capture(run) -> List[Tuple[str, object]]:
+    """The distinct statements (with parameters) executed by run(), inserts excluded"""
+    statements: Dict[str, object] = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.lstrip().upper().startswith("INSERT"):
+            statements.setdefault(statement, parameters)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return list(statements.items())
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+def explain(statement: str, parameters) -> Tuple[List[str], float]:
+    """Full scans of hot tables and the estimated total cost (0 where unknown)"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            rows = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            plan = (rows if isinstance(rows, list) else json.loads(rows))[0]["Plan"]
+            scans = [
+                node["Relation Name"] for node in _plan_nodes(plan)
+                if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in HOT_TABLES
+            ]
+            return scans, plan["Total Cost"]
+
+        # SQLite: SEARCH is an index lookup; SCAN visits every row (or every entry of an index).
+        # SQLite before 3.36 writes "SCAN TABLE votes", later versions "SCAN votes"
+        scans = []
+        for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters):
+            words = row[-1].split()
+            if words[0] != "SCAN" or len(words) < 2:
+                continue
+            table = words[2] if words[1] == "TABLE" and len(words) > 2 else words[1]
+            if table in HOT_TABLES:
+                scans.append(table)
+        return scans, 0.0
+
+def hot_paths() -> Dict[str, object]:
+    """Named callables exercising each hot path through the real handlers and jobs"""
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+    from app.services.demo_data_generator import DemoDataGenerator
+
+    client = TestClient(main.app)  # no lifespan: background jobs stay off
+    headers = {"X-Session-Id": str(uuid.uuid4())}
+
+    db = SessionLocal()
+    try:
+        poll = db.query(Poll).filter(Poll.is_active == True).order_by(Poll.created_at.desc()).first()
+        poll_id = poll.id
+        option_id = db.query(PollOption.id).filter(PollOption.poll_id == poll_id).first()[0]
+    finally:
+        db.close()
+
+    def expiry():
+        db = SessionLocal()
+        try:
+            DemoDataGenerator.expiring_polls_query(db).all()
+        finally:
+            db.close()
+
+    return {
+        "get_polls": lambda: client.get("/api/polls/", headers=headers),
+        "get_poll_details": lambda: client.get(f"/api/polls/{poll_id}", headers=headers),
+        "create_vote": lambda: client.post("/api/votes/", json={"poll_id": poll_id, "option_id": option_id}, headers=headers),
+        "create_like": lambda: client.post("/api/likes/", json={"poll_id": poll_id}, headers=headers),
+        "expire_polls": expiry,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail on full scans or expensive plans in the hot paths")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--polls", type=int, default=20000)
+    parser.add_argument("--options", type=int, default=4, help="options per poll")
+    parser.add_argument("--votes", type=int, default=400000, help="total votes (zipfian over polls)")
+    parser.add_argument("--likes", type=int, default=100000, help="total likes")
+    parser.add_argument("--max-cost", type=float, default=5000, help="estimated plan cost budget (Postgres only)")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        seeded = is_seeded(db)
+    finally:
+        db.close()
+    if seeded:
+        print("📦 Dataset already seeded")
+    else:
+        print(f"📦 Seeding {args.users} users, {args.polls} polls, {args.votes} votes...")
+        build_dataset(args.users, args.polls, args.votes, args.likes, options_per_poll=args.options)
+    analyze()
+    if engine.dialect.name != "postgresql":
+        print("⚠️  Plan costs are only available on Postgres; checking for full scans only")
+
+    failures = 0
+    for name, run in hot_paths().items():
+        for statement, parameters in capture(run):
+            scans, cost = explain(statement, parameters)
+            over_budget = cost > args.max_cost
+            failed = bool(scans) or over_budget
+            failures += failed
+            summary = " ".join(statement.split())[:100]
+            print(
+                f"{'❌' if failed else '✅'} {name:<17} cost={cost:<10.1f} "
+                f"{'full scan of ' + ', '.join(scans) + '  ' if scans else ''}{summary}"
+            )
+
+    if failures:
+        print(f"❌ {failures} statement(s) over budget or scanning a hot table")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold start benchmark.
+
+Measures, in fresh interpreter processes, how long `import app.main` takes and
+how long the app takes from lifespan start to readiness. Prints a JSON report
+and exits non-zero when a budget is exceeded, so CI can catch regressions.
+
+    START_MODE=production python -m app.benchmarks.startup --runs 5 --max-import-ms 1500
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Runs in a child process: import the app, then drive its lifespan up to readiness
+_PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import app.main as main
+imported = time.perf_counter() - started
+
+async def probe():
+    async with main.lifespan(main.app):
+        return main.app.state.startup_seconds
+
+startup = asyncio.run(probe())
+print(json.dumps({"import_seconds": imported, "startup_seconds": startup}))
+"""
+
+def _slowest_imports(limit: int = 10):
+    """Top cumulative import times reported by `python -X importtime`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            continue  # header line
+        rows.append((cumulative, fields[2].strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": us / 1000} for us, name in rows[:limit]]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend import and startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-startup-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            sys.exit(result.returncode)
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    import_ms = statistics.median(s["import_seconds"] for s in samples) * 1000
+    startup_ms = statistics.median(s["startup_seconds"] for s in samples) * 1000
+    report = {
+        "runs": args.runs,
+        "import_ms_median": round(import_ms, 1),
+        "startup_ms_median": round(startup_ms, 1),
+        "slowest_imports": _slowest_imports(),
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"❌ Import time {import_ms:.1f}ms exceeds budget of {args.max_import_ms}ms", file=sys.stderr)
+        failed = True
+    if args.max_startup_ms is not None and startup_ms > args.max_startup_ms:
+        print(f"❌ Startup time {startup_ms:.1f}ms exceeds budget of {args.max_startup_ms}ms", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
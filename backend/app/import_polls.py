@@ -0,0 +1,60 @@
+"""
+Import polls from an NDJSON or JSON-array file (or stdin) in large batches.
+
+    python -m app.import_polls app/data/sample_polls.json
+    cat polls.ndjson | python -m app.import_polls - --chunk-size 5000
+
+Each record uses the same fields as POST /api/polls/ (title, description,
+options, booster, expires_in).
+"""
+import argparse
+import asyncio
+import sys
+import time
+from functools import partial
+
+from app.database.database import SessionLocal
+from app.services.poll_import import PollImporter
+from app.utils.json_stream import iter_json_records
+from app.utils.session import get_or_create_user_by_session
+
+READ_SIZE = 1024 * 1024
+
+async def import_polls(source, session_id: str, chunk_size: int) -> dict:
+    db = SessionLocal()
+    try:
+        user = get_or_create_user_by_session(db, session_id)
+        importer = PollImporter(db, user, chunk_size=chunk_size)
+        for record in iter_json_records(iter(partial(source.read, READ_SIZE), "")):
+            if importer.add(record):
+                await importer.flush()
+                print(f"📥 Imported {importer.created} polls...", file=sys.stderr)
+
+        await importer.flush()
+        return importer.result()
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import polls from NDJSON or a JSON array")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="polls per transaction")
+    parser.add_argument("--session-id", default="poll-importer", help="session ID of the user owning the imported polls")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.path == "-":
+        result = asyncio.run(import_polls(sys.stdin, args.session_id, args.chunk_size))
+    else:
+        with open(args.path, encoding="utf-8") as source:
+            result = asyncio.run(import_polls(source, args.session_id, args.chunk_size))
+
+    for error in result["errors"]:
+        print(f"⚠️  Record {error['index']}: {error['error']}", file=sys.stderr)
+    print(
+        f"✅ Imported {result['created']} polls in {result['chunks']} chunk(s) "
+        f"({time.perf_counter() - started:.2f}s, {len(result['errors'])} skipped)"
+    )
+
+if __name__ == "__main__":
+    main()
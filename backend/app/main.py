@@ -1,31 +1,116 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import time
+_import_started = time.perf_counter()
+
+from fastapi import Depends, FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 import json
 from contextlib import asynccontextmanager
+from typing import Optional
 import asyncio
+from sqlalchemy import text
 
+from app.config import settings
 from app.database.database import engine, Base, create_tables
-from app.routers import polls_router as polls, users_router as users, votes_router as votes, likes_router as likes
+from app.routers import polls_router as polls, users_router as users, votes_router as votes, likes_router as likes, stats_router as stats, events_router as events, admin_router as admin
 from app.websocket.manager import manager
+from app.utils.admin import require_admin
+from app.utils.identity import IDENTITY_HEADER, check_identity_settings
 from app.models.models import Poll
-from app.services.demo_data_generator import demo_data_generator
+from app.services.sharded_counters import sharded_counters
+from app.services.vote_rollups import vote_rollup_job
+from app.services.trending import trending
+from app.services.poll_archive import poll_archiver
+from app.services.visitor_gc import visitor_gc
+from app.services.shared_tallies import shared_tallies
+from app.services.vote_log import vote_log
+
+import_seconds = time.perf_counter() - _import_started
+
+async def start_background_jobs(app: FastAPI, delay: float = 0):
+    """Start background jobs, optionally only `delay` seconds after the app is ready"""
+    if delay:
+        await asyncio.sleep(delay)
+
+    # Imported lazily so the generator's dependencies don't slow down cold starts
+    from app.services.demo_data_generator import demo_data_generator
+    app.state.demo_data_generator = demo_data_generator
 
-# Create database tables
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup
-    create_tables()
-    
     # Start demo data generator in background
     print("🚀 Starting demo data generator...")
     asyncio.create_task(demo_data_generator.start())
+
+    # Fold sharded vote counters of hot polls in the background
+    await sharded_counters.start()
+
+    # Keep the per-minute vote rollups current
+    await vote_rollup_job.start()
+
+    # Load trending scores and persist them periodically
+    await trending.start()
+
+    # Move long-inactive polls to the archive tables
+    await poll_archiver.start()
+
+    # Delete anonymous visitors that never did anything and stopped coming back
+    await visitor_gc.start()
+
+    # Snapshot the vote log's tallies so restarts replay little
+    await vote_log.start()
+
+    # Repair shared tally slots that drifted from the database
+    await shared_tallies.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup
+    started = time.perf_counter()
+    production = settings.start_mode == "production"
+    check_identity_settings()
+
+    await manager.start_heartbeat()
+
+    # In production, migrations run out of band through apply_migrations
+    if not production:
+        create_tables()
+
+    # Vote and like counts shared with the other workers on this host (TALLY_SHM_NAME)
+    shared_tallies.attach()
+
+    # Vote and like tallies from the last snapshot plus the log tail (VOTE_LOG_DIR). Shared
+    # tallies already serve the same counts to every worker, so only one of them runs
+    if shared_tallies.enabled and settings.vote_log_dir:
+        print("⚠️  VOTE_LOG_DIR ignored: shared tallies (TALLY_SHM_NAME) serve vote and like counts")
+    else:
+        vote_log.open()
+
+    background_jobs = asyncio.create_task(
+        start_background_jobs(app, delay=settings.background_jobs_delay if production else 0)
+    )
+
+    app.state.startup_seconds = time.perf_counter() - started
+    app.state.ready = True
     
     yield
     
     # Shutdown
-    print("🛑 Stopping demo data generator...")
-    demo_data_generator.stop()
+    app.state.ready = False
+    background_jobs.cancel()
+    demo_data_generator = getattr(app.state, "demo_data_generator", None)
+    if demo_data_generator:
+        print("🛑 Stopping demo data generator...")
+        demo_data_generator.stop()
+    sharded_counters.stop()
+    vote_rollup_job.stop()
+    trending.stop()
+    poll_archiver.stop()
+    visitor_gc.stop()
+    vote_log.stop()
+    shared_tallies.stop()
+    shared_tallies.close()
+    vote_log.close()
+    manager.stop_heartbeat()
 
 app = FastAPI(
     title="Free Poll API",
@@ -41,6 +126,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[IDENTITY_HEADER],
 )
 
 # Include routers
@@ -48,24 +134,91 @@ app.include_router(polls, prefix="/api/polls", tags=["polls"])
 app.include_router(users, prefix="/api/users", tags=["users"])
 app.include_router(votes, prefix="/api/votes", tags=["votes"])
 app.include_router(likes, prefix="/api/likes", tags=["likes"])
+app.include_router(stats, prefix="/api/stats", tags=["stats"])
+app.include_router(events, prefix="/api/events", tags=["events"])
+app.include_router(admin, prefix="/api/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
     return {"message": "Free Poll API", "version": "1.0.0"}
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: startup finished and the primary database is reachable"""
+    report = {
+        "import_seconds": round(import_seconds, 4),
+        "startup_seconds": round(getattr(app.state, "startup_seconds", 0), 4),
+        "start_mode": settings.start_mode,
+        "websockets": manager.stats(),
+    }
+    if not getattr(app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting", **report})
+
+    def ping():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    try:
+        # Connecting blocks (up to the pool and connect timeouts); keep it off the event loop
+        await run_in_threadpool(ping)
+    except Exception as e:
+        # Driver errors carry DSNs and hostnames: keep them in the server log only
+        print(f"❌ Readiness check failed: {e}")
+        return JSONResponse(status_code=503, content={"status": "database unavailable", **report})
+
+    return {"status": "ready", **report}
+
+@app.get("/metrics", dependencies=[Depends(require_admin)])
+async def metrics():
+    """Prometheus metrics of the WebSocket broadcast path"""
+    return PlainTextResponse(
+        manager.metrics.exposition(manager.stats(), manager.subscriber_counts()),
+        media_type="text/plain; version=0.0.4"
+    )
+
 @app.websocket("/ws/{poll_id}")
-async def websocket_endpoint(websocket: WebSocket, poll_id: int):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, poll_id: int, since: Optional[str] = None, session_id: Optional[str] = None):
+    """
+    Live events of a poll (or, for poll_id 0, the global events). A reconnecting
+    client passes the last `seq` it saw as `since` and gets just the events it
+    missed; when they are no longer buffered, or the seq is from another worker
+    or before a restart, it gets a fresh snapshot instead (poll_state, or
+    `resync: true` on the global stream). Clients must answer the
+    server's `ping` messages with `pong` (or send anything) to stay connected.
+    """
+    if not await manager.connect(websocket, session_id):
+        return
     
     # For poll_id 0, this is a global listener (just connects without subscribing to specific poll)
     if poll_id != 0:
         await manager.subscribe_to_poll(poll_id, websocket)
 
+    # Nothing has been awaited since subscribing, so no live event can fall between
+    # the buffer read and the hold; held events go out after the catch-up below
+    manager.hold(websocket)
+    missed = manager.missed_events(poll_id, since) if since is not None else None
+    seq = manager.last_seq
+
     try:
+        if missed is not None:
+            for message_str in missed:
+                await manager.send_personal_message(message_str, websocket)
+            if poll_id == 0:
+                await manager.send_personal_message(json.dumps({
+                    "type": "connected",
+                    "poll_id": 0,
+                    "seq": seq,
+                    "data": {"message": "Connected to global updates", "resync": False, "replayed": len(missed)}
+                }), websocket)
         # Send current poll state when client connects (only for specific polls)
-        if poll_id != 0:
-            from app.database.database import SessionLocal
-            db = SessionLocal()
+        elif poll_id != 0:
+            from app.database.database import open_read_session
+            db = open_read_session()
             try:
                 poll = db.query(Poll).filter(Poll.id == poll_id, Poll.is_active == True).first()
                 if poll:
@@ -77,6 +230,7 @@ async def websocket_endpoint(websocket: WebSocket, poll_id: int):
                     await manager.send_personal_message(json.dumps({
                         "type": "poll_state",
                         "poll_id": poll_id,
+                        "seq": seq,
                         "data": {
                             "total_votes": poll.total_votes,
                             "total_likes": poll.total_likes,
@@ -97,14 +251,23 @@ async def websocket_endpoint(websocket: WebSocket, poll_id: int):
             await manager.send_personal_message(json.dumps({
                 "type": "connected",
                 "poll_id": 0,
-                "data": {"message": "Connected to global updates"}
+                "seq": seq,
+                # The gap is older than the buffer: the client has to refetch
+                "data": {"message": "Connected to global updates", "resync": since is not None}
             }), websocket)
 
+        await manager.release(websocket)
+
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
+            if manager.is_pong(data):
+                continue
             # Handle client messages if needed
             await manager.send_personal_message(f"Echo: {data}", websocket)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 if __name__ == "__main__":
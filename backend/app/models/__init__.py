@@ -1 +1 @@
-from .models import User, Poll, PollOption, Vote, PollLike
+from .models import User, Poll, PollOption, Vote, PollLike, PollCounterShard, ShardedPoll, VoteSwitch, VoteRollup, RollupWatermark, PollResultSnapshot, ArchivedPoll, ArchivedPollOption, ArchivedVote, ArchivedPollLike, ArchivedVoteSwitch
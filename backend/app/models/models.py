@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, ForeignKey, UniqueConstraint, Index, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func, select
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -14,6 +15,7 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_seen_at = Column(DateTime(timezone=True))  # coarse: written at most every visitor_touch_minutes
 
     # Relationships
     polls = relationship("Poll", back_populates="owner", cascade="all, delete-orphan")
@@ -31,6 +33,10 @@ class Poll(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     booster = Column(Boolean, default=False)
     expires_in = Column(Integer)  # seconds
+    trending_score = Column(Float)  # log of the time-decayed activity, see services/trending.py
+    # Weighted title/description/option text, maintained by services/poll_search.py (unused on SQLite, see below)
+    search_vector = Column(Text().with_variant(TSVECTOR(), "postgresql"))
+    deactivated_at = Column(DateTime(timezone=True))  # when is_active was cleared; the archiver ages polls from here
 
     # Relationships
     owner = relationship("User", back_populates="polls")
@@ -81,12 +87,38 @@ class Poll(Base):
         elapsed = (now - created_at_aware).total_seconds()
         return elapsed >= self.expires_in
 
+Index("ix_polls_search_vector", Poll.search_vector, postgresql_using="gin").ddl_if(dialect="postgresql")
+# The newest-first listing of active (or inactive) polls
+Index("ix_polls_is_active_created_at", Poll.is_active, Poll.created_at)
+# The expiry job only looks at active polls that have an expiry
+Index(
+    "ix_polls_expiring",
+    Poll.is_active,
+    postgresql_where=Poll.expires_in.isnot(None),
+    sqlite_where=Poll.expires_in.isnot(None)
+)
+
+# SQLite has no tsvector; local databases index polls in an FTS5 table keyed by poll id instead
+event.listen(
+    Poll.__table__,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS poll_search_fts "
+        "USING fts5(title, description, options, tokenize='porter')"
+    ).execute_if(dialect="sqlite")
+)
+event.listen(
+    Poll.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS poll_search_fts").execute_if(dialect="sqlite")
+)
+
 class PollOption(Base):
     __tablename__ = "poll_options"
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String, nullable=False)
-    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(), nullable=False)
 
     # Relationships
@@ -114,8 +146,8 @@ class Vote(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
-    option_id = Column(Integer, ForeignKey("poll_options.id"), nullable=False)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False, index=True)
+    option_id = Column(Integer, ForeignKey("poll_options.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
 
     # Relationships
@@ -131,7 +163,7 @@ class PollLike(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
 
     # Relationships
@@ -140,3 +172,115 @@ class PollLike(Base):
 
     # Ensure one like per user per poll
     __table_args__ = (UniqueConstraint('user_id', 'poll_id', name='_user_poll_like'),)
+
+class PollCounterShard(Base):
+    __tablename__ = "poll_counter_shards"
+
+    id = Column(Integer, primary_key=True, index=True)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False, index=True)
+    option_id = Column(Integer, ForeignKey("poll_options.id"), nullable=False)
+    shard = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    # One row per (option, shard); writers spread increments across shards
+    __table_args__ = (UniqueConstraint('poll_id', 'option_id', 'shard', name='_poll_option_shard'),)
+
+class ShardedPoll(Base):
+    __tablename__ = "sharded_polls"
+
+    # Polls whose poll_counter_shards are seeded and maintained, as seen by every worker
+    poll_id = Column(Integer, ForeignKey("polls.id"), primary_key=True, autoincrement=False)
+    seeded_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+class VoteSwitch(Base):
+    __tablename__ = "vote_switches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False, index=True)
+    from_option_id = Column(Integer, ForeignKey("poll_options.id"), nullable=False)
+    to_option_id = Column(Integer, ForeignKey("poll_options.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+class VoteRollup(Base):
+    __tablename__ = "vote_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
+    option_id = Column(Integer, ForeignKey("poll_options.id"), nullable=False)
+    bucket = Column(DateTime(timezone=True), nullable=False)  # start of the minute, UTC
+    count = Column(Integer, nullable=False, default=0)
+
+    # Also serves range scans of a poll's buckets for trend queries
+    __table_args__ = (UniqueConstraint('poll_id', 'bucket', 'option_id', name='_poll_bucket_option_rollup'),)
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)  # highest source row id already rolled up
+
+class PollResultSnapshot(Base):
+    __tablename__ = "poll_result_snapshots"
+
+    # No foreign key: the snapshot outlives the poll's move to the archive tables
+    poll_id = Column(Integer, primary_key=True, autoincrement=False)
+    etag = Column(String, nullable=False)
+    document = Column(Text, nullable=False)  # final PollSchema JSON, without the per-user fields
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+# Archive tables: polls that have been inactive for a while are moved here with their
+# options, votes, likes and switches (see services/poll_archive.py), keeping their ids.
+# They are read-only, so they carry no unique constraints and only the poll_id and user_id indexes.
+
+class ArchivedPoll(Base):
+    __tablename__ = "polls_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    booster = Column(Boolean, default=False)
+    expires_in = Column(Integer)
+    deactivated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    is_active = False
+
+    # Relationships
+    owner = relationship("User")
+    options = relationship("ArchivedPollOption", order_by="ArchivedPollOption.id")
+
+class ArchivedPollOption(Base):
+    __tablename__ = "poll_options_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    text = Column(String, nullable=False)
+    poll_id = Column(Integer, ForeignKey("polls_archive.id"), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+class ArchivedVote(Base):
+    __tablename__ = "votes_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    poll_id = Column(Integer, ForeignKey("polls_archive.id"), nullable=False, index=True)
+    option_id = Column(Integer, ForeignKey("poll_options_archive.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+class ArchivedPollLike(Base):
+    __tablename__ = "poll_likes_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    poll_id = Column(Integer, ForeignKey("polls_archive.id"), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+class ArchivedVoteSwitch(Base):
+    __tablename__ = "vote_switches_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    poll_id = Column(Integer, ForeignKey("polls_archive.id"), nullable=False, index=True)
+    from_option_id = Column(Integer, ForeignKey("poll_options_archive.id"), nullable=False)
+    to_option_id = Column(Integer, ForeignKey("poll_options_archive.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -2,3 +2,6 @@ from .polls import router as polls_router
 from .users import router as users_router
 from .votes import router as votes_router
 from .likes import router as likes_router
+from .stats import router as stats_router
+from .events import router as events_router
+from .admin import router as admin_router
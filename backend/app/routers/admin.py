@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.services.profiler import cpu_profiler, memory_profiler
+from app.utils.admin import require_admin
+from app.websocket.manager import manager
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+PSTATS_SORTS = {"cumulative", "tottime", "calls", "ncalls"}
+MEMORY_GROUPINGS = {"lineno", "filename", "traceback"}
+
+@router.get("/websockets")
+async def get_websocket_stats(top: int = 10):
+    """Connection counters, broadcast latency/size summary and the polls with the highest fan-out cost."""
+    subscribers = manager.subscriber_counts()
+    return {
+        "connections": manager.stats(),
+        "broadcasts": manager.metrics.summary(),
+        "top_polls": manager.metrics.top_polls(subscribers, top=max(1, min(top, 100))),
+    }
+
+@router.get("/profile/cpu", response_class=PlainTextResponse)
+async def profile_cpu(seconds: float = 10, mode: str = "sample", interval: float = 0.005, sort: str = "cumulative", limit: int = 50):
+    """
+    Profile the process for `seconds` while it serves traffic. `mode=sample` returns
+    collapsed stacks of all threads sampled every `interval` seconds (feed them to a
+    flame graph tool); `mode=cprofile` returns a pstats report of the event loop.
+    """
+    if not 0 < seconds <= settings.profile_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {settings.profile_max_seconds}")
+    if mode == "sample":
+        return await cpu_profiler.sample(seconds, max(interval, 0.001))
+    if mode == "cprofile":
+        if sort not in PSTATS_SORTS:
+            raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(sorted(PSTATS_SORTS))}")
+        return await cpu_profiler.trace(seconds, sort, max(1, min(limit, 1000)))
+    raise HTTPException(status_code=400, detail="mode must be sample or cprofile")
+
+@router.post("/profile/memory")
+async def start_memory_tracing(frames: int = 10, seconds: float = 300):
+    """Start tracemalloc, keeping `frames` frames per allocation; it stops by itself after `seconds`"""
+    if not 0 < seconds <= settings.profile_memory_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {settings.profile_memory_max_seconds}")
+    return memory_profiler.start(max(1, min(frames, 100)), seconds)
+
+@router.get("/profile/memory")
+async def get_memory_snapshot(group_by: str = "lineno", top: int = 25):
+    """The largest allocation sites and, from the second call on, what changed since the previous call"""
+    if group_by not in MEMORY_GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(sorted(MEMORY_GROUPINGS))}")
+    return memory_profiler.snapshot(group_by, max(1, min(top, 200)))
+
+@router.delete("/profile/memory")
+async def stop_memory_tracing():
+    """Stop tracemalloc and drop the stored snapshot"""
+    return memory_profiler.stop()
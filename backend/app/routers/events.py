@@ -0,0 +1,47 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.websocket.event_feed import event_feed
+
+router = APIRouter()
+
+# Tells the client to drop its state and refetch: events were lost while it lagged
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+
+async def _event_stream(request: Request, cursor: int, reset: bool):
+    event_feed.subscribers += 1
+    try:
+        yield f"retry: {settings.sse_retry_ms}\n\n".encode()
+        if reset:
+            yield RESET_FRAME
+        while True:
+            frames, cursor, missed = event_feed.read(cursor)
+            if missed:
+                yield RESET_FRAME
+            if frames:
+                yield frames
+
+            if await request.is_disconnected():
+                break
+            if not await event_feed.wait(cursor, settings.sse_keepalive_seconds):
+                # Comment line: keeps proxies from closing an idle stream
+                yield b": keepalive\n\n"
+    finally:
+        event_feed.subscribers -= 1
+
+@router.get("/")
+async def stream_events(request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of the global poll events (the same messages as
+    /ws/0). Reconnecting clients resume after their Last-Event-ID while it is
+    still in the buffer of this feed; otherwise they get a `reset` event.
+    """
+    cursor, reset = event_feed.cursor_after(last_event_id)
+    return StreamingResponse(
+        _event_stream(request, cursor, reset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
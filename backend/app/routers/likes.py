@@ -1,7 +1,6 @@
 from typing import Optional
-import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Header, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Response, status
 from sqlalchemy import and_
 from sqlalchemy.orm import Session, joinedload
 
@@ -14,21 +13,27 @@ from app.schemas.schemas import (
     PollLikeCreate,
     PollOption as PollOptionSchema,
 )
-from app.utils.session import get_or_create_user_by_session
+from app.utils.identity import visitor_session_id
+from app.utils.session import get_acting_user, get_current_user
 from app.websocket.manager import manager
+from app.services.poll_stats import poll_stats_cache
+from app.services.trending import trending
+from app.services.poll_payloads import poll_payloads
+from app.services.user_activity import user_activity_cache
+from app.services.shared_tallies import shared_tallies
+from app.services.vote_log import vote_log
 
 router = APIRouter()
 
 @router.post("/", response_model=PollLikeSchema)
-async def create_like(like: PollLikeCreate, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None)):
+async def create_like(like: PollLikeCreate, response: Response, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None), x_identity_token: Optional[str] = Header(None)):
     poll = db.query(Poll).filter(
         and_(Poll.id == like.poll_id, Poll.is_active == True)
     ).first()
     if poll is None:
         raise HTTPException(status_code=404, detail="Poll not found")
 
-    session_id = x_session_id if x_session_id else str(uuid.uuid4())
-    temp_user = get_or_create_user_by_session(db, session_id)
+    temp_user = await get_acting_user(db, response, x_session_id, x_identity_token)
 
     existing_like = db.query(PollLike).filter(
         and_(PollLike.user_id == temp_user.id, PollLike.poll_id == like.poll_id)
@@ -42,111 +47,54 @@ async def create_like(like: PollLikeCreate, db: Session = Depends(get_db), x_ses
         poll_id=like.poll_id
     )
     db.add(db_like)
-    db.commit()
+    shared_tallies.commit(db, like.poll_id, likes=1)
+    vote_log.liked(like.poll_id)
     db.refresh(db_like)
+    poll_stats_cache.invalidate(like.poll_id)
+    user_activity_cache.liked(temp_user.id, like.poll_id)
+    trending.record(poll.id, poll.booster, likes=1)
 
-    poll = db.query(Poll)\
-        .options(
-            joinedload(Poll.options).joinedload(PollOption.votes),
-            joinedload(Poll.votes),
-            joinedload(Poll.likes),
-            joinedload(Poll.owner).load_only(User.id, User.username, User.email)
-        )\
-        .filter(Poll.id == like.poll_id)\
-        .first()
-    
-    like_message = {
-        "type": "poll_update",
-        "poll_id": like.poll_id,
-        "data": {
-            "id": poll.id,
-            "title": poll.title,
-            "description": poll.description,
-            "total_votes": poll.total_votes,
-            "total_likes": poll.total_likes,
-            "options": [{
-                "id": o.id,
-                "text": o.text,
-                "vote_count": o.vote_count,
-                "created_at": o.created_at,
-                "poll_id": o.poll_id,
-                "percentage": int((o.vote_count / poll.total_votes * 100) if poll.total_votes > 0 else 0)
-            } for o in poll.options],
-            "user_id": poll.user_id,
-            "username": poll.owner.username,
-            "created_at": poll.created_at,
-            "booster": poll.booster,
-            "expires_in": poll.expires_in,
-            "is_active": poll.is_active
-        }
-    }
-
-    await manager.broadcast_to_poll(like.poll_id, like_message)
-    
-    await manager.broadcast(like_message)
+    # None if the poll was deleted meanwhile: nothing to broadcast
+    like_message = poll_payloads.poll_update(db, like.poll_id)
+    if like_message is not None:
+        await manager.broadcast_to_poll(like.poll_id, like_message)
+        await manager.broadcast(like_message)
 
     return {
         "id": db_like.id,
         "poll_id": db_like.poll_id,
         "user_id": db_like.user_id,
         "created_at": db_like.created_at,
-        "session_id": session_id
+        "session_id": visitor_session_id(temp_user)
     }
 
 @router.delete("/{poll_id}")
-async def delete_like(poll_id: int, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None)):
-    if not x_session_id:
+async def delete_like(poll_id: int, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None), x_identity_token: Optional[str] = Header(None)):
+    if not x_session_id and not x_identity_token:
         raise HTTPException(status_code=400, detail="Session ID required")
     
-    temp_user = get_or_create_user_by_session(db, x_session_id)
+    # A visitor without a users row yet has no likes to remove
+    temp_user = get_current_user(x_session_id, x_identity_token, db)
 
     like = db.query(PollLike).filter(
         and_(PollLike.user_id == temp_user.id, PollLike.poll_id == poll_id)
-    ).first()
+    ).first() if temp_user else None
     if like is None:
         raise HTTPException(status_code=404, detail="Like not found")
 
-    db.delete(like)
-    db.commit()
-
-    poll = db.query(Poll)\
-        .options(
-            joinedload(Poll.options).joinedload(PollOption.votes),
-            joinedload(Poll.votes),
-            joinedload(Poll.likes),
-            joinedload(Poll.owner).load_only(User.id, User.username, User.email)
-        )\
-        .filter(Poll.id == poll_id)\
-        .first()
-    
-    unlike_message = {
-        "type": "poll_update",
-        "poll_id": poll_id,
-            "data": {
-            "id": poll.id,
-            "title": poll.title,
-            "description": poll.description,
-            "total_votes": poll.total_votes,
-            "total_likes": poll.total_likes,
-            "options": [{
-                "id": o.id,
-                "text": o.text,
-                "vote_count": o.vote_count,
-                "created_at": o.created_at,
-                "poll_id": o.poll_id,
-                "percentage": int((o.vote_count / poll.total_votes * 100) if poll.total_votes > 0 else 0)
-            } for o in poll.options],
-            "user_id": poll.user_id,
-            "username": poll.owner.username,
-            "created_at": poll.created_at,
-            "booster": poll.booster,
-            "expires_in": poll.expires_in,
-            "is_active": poll.is_active
-        }
-    }
-
-    await manager.broadcast_to_poll(poll_id, unlike_message)
+    # Results of closed polls are final (and frozen in their snapshot)
+    if not like.poll.is_active:
+        raise HTTPException(status_code=404, detail="Poll not found")
 
-    await manager.broadcast(unlike_message)
+    db.delete(like)
+    shared_tallies.commit(db, poll_id, likes=-1)
+    vote_log.liked(poll_id, False)
+    poll_stats_cache.invalidate(poll_id)
+    user_activity_cache.liked(temp_user.id, poll_id, False)
+
+    unlike_message = poll_payloads.poll_update(db, poll_id)
+    if unlike_message is not None:
+        await manager.broadcast_to_poll(poll_id, unlike_message)
+        await manager.broadcast(unlike_message)
 
     return {"message": "Like deleted successfully"}
@@ -1,34 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session, joinedload, subqueryload, aliased
-from sqlalchemy import func, case, select
+from sqlalchemy import func, case, select, null
 from typing import List, Optional
+import codecs
 import json
-import uuid
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 
-from app.database.database import get_db
-from app.models.models import Poll, PollOption, User, Vote, PollLike
-from app.schemas.schemas import PollCreate, Poll as PollSchema, PollOption as PollOptionSchema
+from app.config import settings
+from app.database.database import get_db, get_read_db
+from app.models.models import Poll, PollOption, User, Vote, PollLike, ArchivedPoll
+from app.schemas.schemas import PollCreate, PollBulkResult, PollStats, VoteTrend, Poll as PollSchema, PollOption as PollOptionSchema
 from app.websocket.manager import manager
-from app.utils.session import get_or_create_user_by_session, get_current_user
+from app.utils.session import get_acting_user, get_current_user
 from app.utils.poll_details import get_poll_details
+from app.services.sharded_counters import sharded_counters
+from app.services.poll_import import PollImporter
+from app.utils.json_stream import JSONRecordStream
+from app.utils.export import stream_export
+from app.services.poll_stats import RESOLUTIONS, compute_poll_stats, poll_stats_cache
+from app.services.vote_rollups import vote_rollup_job
+from app.services.trending import trending
+from app.services.poll_archive import ARCHIVE_TABLES, HOT_TABLES, PollTables
+from app.services.poll_snapshots import SNAPSHOT_MAX_AGE, poll_snapshots
+from app.services.poll_search import index_polls, poll_search_cache, ranked_matches, search_key
+from app.services.user_activity import user_activity_cache
+from app.services.poll_payloads import poll_payloads
+from app.services.shared_tallies import shared_tallies
+from app.services.vote_log import vote_log
+from app.utils.fields import FieldSet, parse_fields, wanted
 
 router = APIRouter()
 
 @router.post("/", response_model=PollSchema)
-async def create_poll(poll: PollCreate, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None)):
-    # Get or create user based on session
-    if not x_session_id:
-        x_session_id = str(uuid.uuid4())
-    
-    user = get_or_create_user_by_session(db, x_session_id)
-
+async def create_poll(poll: PollCreate, response: Response, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None), x_identity_token: Optional[str] = Header(None)):
     # Validate expires_in (max 1 day = 86400 seconds)
     expires_in = poll.expires_in
     if expires_in is not None and expires_in > 86400:
         raise HTTPException(status_code=400, detail="Poll expiry cannot exceed 1 day (86400 seconds)")
 
+    # Get or create user based on session
+    user = await get_acting_user(db, response, x_session_id, x_identity_token)
+
     # Create the poll
     db_poll = Poll(
         title=poll.title,
@@ -47,6 +61,8 @@ async def create_poll(poll: PollCreate, db: Session = Depends(get_db), x_session
         db_option = PollOption(text=option_text, poll_id=db_poll.id)
         db.add(db_option)
 
+    db.flush()
+    index_polls(db, [db_poll.id])
     db.commit()
     db.refresh(db_poll)
 
@@ -65,6 +81,9 @@ async def create_poll(poll: PollCreate, db: Session = Depends(get_db), x_session
         "is_active": db_poll.is_active
     }
 
+    poll_stats_cache.invalidate(db_poll.id)
+    trending.add_poll(db_poll.id, db_poll.booster)
+
     await manager.broadcast_to_poll(db_poll.id, poll_data)
     
     await manager.broadcast({
@@ -80,87 +99,299 @@ async def create_poll(poll: PollCreate, db: Session = Depends(get_db), x_session
 
     return db_poll
 
-@router.get("/", response_model=List[PollSchema])
-async def get_polls(status: str = "active", skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Get list of polls with aggregated counts."""
-    
-    vote_count = select(func.count(Vote.id))\
-        .where(Vote.poll_id == Poll.id)\
-        .correlate(Poll)\
-        .scalar_subquery()
+@router.post("/bulk", response_model=PollBulkResult)
+async def create_polls_bulk(request: Request, response: Response, chunk_size: int = 1000, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None), x_identity_token: Optional[str] = Header(None)):
+    """
+    Create many polls from an NDJSON or JSON-array body of PollCreate records.
+    The body is parsed as it streams in; every `chunk_size` polls are written in
+    one transaction and announced with a single `polls_created` broadcast.
+    Invalid records, malformed JSON included, are skipped and listed in `errors`.
+    """
+    user = await get_acting_user(db, response, x_session_id, x_identity_token)
+    importer = PollImporter(db, user, chunk_size=max(1, min(chunk_size, 10000)))
+    records = JSONRecordStream()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    try:
+        async for chunk in request.stream():
+            for record in records.feed(decoder.decode(chunk)):
+                if importer.add(record):
+                    await importer.flush()
+        for record in records.feed(decoder.decode(b"", final=True)) + records.close():
+            importer.add(record)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": f"Invalid input: {e}", **importer.result()}
+        )
+
+    await importer.flush()
+    return importer.result()
+
+def _poll_list_query(db: Session, status: str, tables: PollTables = HOT_TABLES, with_counts: bool = True, fields: Optional[FieldSet] = None):
+    """
+    Polls with their vote/like counts, as served by the list endpoints.
+    with_counts=False selects NULL counts, for callers that take them from result
+    snapshots; so do counts left out of `fields`, and the owner join is skipped
+    without `username`.
+    """
+    Poll, _, Vote, PollLike = tables
+
+    vote_count = like_count = null()
+    if with_counts and wanted(fields, "total_votes"):
+        vote_count = select(func.count(Vote.id))\
+            .where(Vote.poll_id == Poll.id)\
+            .correlate(Poll)\
+            .scalar_subquery()
     
-    like_count = select(func.count(PollLike.id))\
-        .where(PollLike.poll_id == Poll.id)\
-        .correlate(Poll)\
-        .scalar_subquery()
+    if with_counts and wanted(fields, "total_likes"):
+        like_count = select(func.count(PollLike.id))\
+            .where(PollLike.poll_id == Poll.id)\
+            .correlate(Poll)\
+            .scalar_subquery()
     
     query = db.query(Poll)\
         .add_columns(
             vote_count.label('total_votes'),
             like_count.label('total_likes')
-        )\
-        .options(
-            joinedload(Poll.owner).load_only(User.id, User.username, User.email)
-        )\
-        .filter(Poll.is_active == (status == "active"))
-    
-    if current_user:
-        user_voted = select(Vote.id)\
-            .where(Vote.poll_id == Poll.id, Vote.user_id == current_user.id)\
-            .correlate(Poll)\
-            .exists()
-        
-        user_liked = select(PollLike.id)\
-            .where(PollLike.poll_id == Poll.id, PollLike.user_id == current_user.id)\
-            .correlate(Poll)\
-            .exists()
-        
-        query = query.add_columns(user_voted, user_liked)
+        )
+    if wanted(fields, "username"):
+        query = query.options(joinedload(Poll.owner).load_only(User.id, User.username, User.email))
     
-    results = query\
-        .order_by(Poll.created_at.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
+    # Archived polls are all inactive
+    if tables is HOT_TABLES:
+        query = query.filter(Poll.is_active == (status == "active"))
     
+    return query
+
+def _counted_rows(db: Session, status: str, poll_ids: List[int], fields: Optional[FieldSet] = None) -> dict:
+    """List rows with aggregated counts of the given polls, hot or archived, by poll id"""
+    rows = {}
+    for tables in (HOT_TABLES, ARCHIVE_TABLES):
+        query = _poll_list_query(db, status, tables, fields=fields).filter(tables.poll.id.in_(poll_ids))
+        rows.update((row[0].id, row) for row in query.all())
+    return rows
+
+def _rows_in_order(query, poll_ids: List[int]):
+    """Hydrate a page of poll ids chosen elsewhere, keeping their order"""
+    position = {poll_id: i for i, poll_id in enumerate(poll_ids)}
+    return sorted(
+        query.filter(Poll.id.in_(poll_ids)).all(),
+        key=lambda row: position[row[0].id]
+    )
+
+def _poll_list_items(db: Session, results, current_user: Optional[User], snapshots: Optional[dict] = None, fields: Optional[FieldSet] = None) -> List[PollSchema]:
+    # The caller's votes and likes come from the per-user cache, not per-row subqueries
+    with_user_state = current_user and wanted(fields, "user_voted_option_id", "user_liked")
+    activity = user_activity_cache.get(current_user.id) if with_user_state else None
+    with_username = wanted(fields, "username")
+
     polls_data = []
-    for row in results:
-        if current_user:
-            poll, total_votes, total_likes, has_voted, has_liked = row
-        else:
-            poll, total_votes, total_likes = row
-            has_voted = has_liked = None
+    for poll, total_votes, total_likes in results:
+        voted_option_id, liked = activity.state(poll.id) if activity else (None, False)
+        
+        if snapshots and poll.id in snapshots:
+            document, _ = snapshots[poll.id]
+            total_votes, total_likes = document["total_votes"], document["total_likes"]
         
         poll_data = PollSchema(
             id=poll.id,
             is_active=poll.is_active,
             created_at=poll.created_at,
             user_id=poll.user_id,
-            username=poll.owner.username if poll.owner else None,
+            username=poll.owner.username if with_username and poll.owner else None,
             booster=poll.booster,
             title=poll.title,
             description=poll.description,
             options=[],
             expires_in=poll.expires_in,
-            total_votes=total_votes,
-            total_likes=total_likes,
-            user_liked=has_liked,
-            user_voted_option_id=has_voted
+            total_votes=total_votes or 0,
+            total_likes=total_likes or 0,
+            user_liked=liked,
+            user_voted_option_id=voted_option_id
         )
         
         polls_data.append(poll_data)
     
     return polls_data
 
+def _sparse(polls: List[PollSchema], fields: Optional[FieldSet]):
+    """The list response, trimmed to `fields` when given"""
+    if fields is None:
+        return polls
+    return JSONResponse(fields.trim_all([poll.model_dump(mode="json") for poll in polls]))
+
+def _sparse_poll(poll: PollSchema, fields: Optional[FieldSet]):
+    if fields is None:
+        return poll
+    return JSONResponse(fields.trim(poll.model_dump(mode="json")))
+
+@router.get("/", response_model=List[PollSchema])
+async def get_polls(status: str = "active", sort: str = "newest", skip: int = 0, limit: int = 100, fields: Optional[str] = None, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    """
+    Get list of polls with aggregated counts, newest first or (sort=trending) hottest
+    first. `fields` (e.g. `title,total_votes`) limits the response, and the work
+    done for it, to those fields.
+    """
+    if sort not in ("newest", "trending"):
+        raise HTTPException(status_code=400, detail="sort must be newest or trending")
+    fieldset = parse_fields(fields)
+    
+    query = _poll_list_query(db, status, fields=fieldset)
+    
+    if sort == "trending" and status == "active":
+        # The page comes from the in-memory ranking; the query only hydrates those ids
+        results = _rows_in_order(query, trending.top(db, skip, limit))
+    elif status == "active":
+        results = query\
+            .order_by(Poll.created_at.desc())\
+            .offset(skip)\
+            .limit(limit)\
+            .all()
+    else:
+        # Inactive polls live in two places: merge the newest of each. Their counts
+        # come from the frozen result snapshots instead of per-row aggregates.
+        query = _poll_list_query(db, status, with_counts=False, fields=fieldset)
+        archive_query = _poll_list_query(db, status, ARCHIVE_TABLES, with_counts=False, fields=fieldset)
+        results = query.order_by(Poll.created_at.desc()).limit(skip + limit).all()\
+            + archive_query.order_by(ArchivedPoll.created_at.desc()).limit(skip + limit).all()
+        results = sorted(results, key=lambda row: row[0].created_at, reverse=True)[skip:skip + limit]
+
+        snapshots = {}
+        if wanted(fieldset, "total_votes", "total_likes"):
+            poll_ids = [row[0].id for row in results]
+            snapshots = poll_snapshots.get_many(db, poll_ids)
+            missing = [poll_id for poll_id in poll_ids if poll_id not in snapshots]
+            if missing:
+                # Closed before snapshots existed: count them here, the archiver freezes them
+                counts = _counted_rows(db, status, missing, fieldset)
+                results = [counts.get(row[0].id, row) for row in results]
+        return _sparse(_poll_list_items(db, results, current_user, snapshots, fieldset), fieldset)
+    
+    return _sparse(_poll_list_items(db, results, current_user, fields=fieldset), fieldset)
+
+@router.get("/search", response_model=List[PollSchema])
+async def search_polls(response: Response, q: str, status: str = "active", skip: int = 0, limit: int = 20, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    """
+    Full-text search over poll titles, descriptions and option text, best match
+    first, with the same counts as the list endpoint. Every word must match; the
+    last one also matches as a prefix.
+    """
+    key = search_key(q, status, skip, limit)
+    if key is None:
+        raise HTTPException(status_code=400, detail="q must contain at least one word")
+
+    poll_ids = poll_search_cache.get(key)
+    if poll_ids is None:
+        matches = ranked_matches(db, q)
+        poll_ids = [
+            poll_id for poll_id, in db.query(matches.c.poll_id)
+                .join(Poll, Poll.id == matches.c.poll_id)
+                .filter(Poll.is_active == (status == "active"))
+                .order_by(matches.c.rank.desc(), Poll.id.desc())
+                .offset(skip)
+                .limit(limit)
+                .all()
+        ]
+        poll_search_cache.set(key, poll_ids)
+
+    # Pages carry the caller's voted/liked flags when a session is sent
+    response.headers["Cache-Control"] = f"{'private' if current_user else 'public'}, max-age={settings.search_cache_seconds}"
+    response.headers["Vary"] = "X-Session-Id, X-Identity-Token"
+
+    return _poll_list_items(db, _rows_in_order(_poll_list_query(db, status), poll_ids), current_user)
+
+def _snapshot_response(request: Request, db: Session, snapshot: tuple, current_user: Optional[User], fields: Optional[FieldSet] = None) -> Response:
+    """Serve a frozen result document with long-lived caching headers"""
+    document, etag = snapshot
+    if current_user and wanted(fields, "user_voted_option_id", "user_liked"):
+        option_id, liked = user_activity_cache.get(current_user.id).state(document["id"])
+        etag = f"{etag}-{option_id or 0}-{int(liked)}"
+        cache_control = f"private, max-age={SNAPSHOT_MAX_AGE}, immutable"
+    else:
+        option_id, liked = None, False
+        cache_control = f"public, max-age={SNAPSHOT_MAX_AGE}, immutable"
+
+    headers = {"ETag": f'"{etag}"', "Cache-Control": cache_control, "Vary": "X-Session-Id, X-Identity-Token"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    document = {**document, "user_voted_option_id": option_id, "user_liked": liked}
+    return JSONResponse(fields.trim(document) if fields else document, headers=headers)
+
 @router.get("/{poll_id}", response_model=PollSchema)
-async def get_poll(poll_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Get a poll by ID."""
+async def get_poll(poll_id: int, request: Request, fields: Optional[str] = None, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    """
+    Get a poll by ID. Closed polls are served from their frozen result snapshot.
+    `fields` works as for the list (option fields as `options.<field>`).
+    """
+    fieldset = parse_fields(fields)
 
-    poll = get_poll_details(db, poll_id, current_user.id if current_user else None)
-    if not poll:
+    # Only closed polls have snapshots: look one up once the poll turns out closed
+    snapshot = poll_snapshots.cached(poll_id)
+    if snapshot is None:
+        poll = get_poll_details(db, poll_id, current_user.id if current_user else None, fields=fieldset)
+        if poll is not None and poll.is_active:
+            return _sparse_poll(poll, fieldset)
+
+        snapshot = poll_snapshots.get(db, poll_id)
+        if snapshot is None:
+            if not poll:
+                raise HTTPException(status_code=404, detail="Poll not found")
+            # Closed before snapshots existed; the archiver freezes it before moving it
+            return _sparse_poll(poll, fieldset)
+
+    return _snapshot_response(request, db, snapshot, current_user, fieldset)
+
+@router.get("/{poll_id}/stats", response_model=PollStats)
+async def get_poll_stats(poll_id: int, resolution: str = "hour", db: Session = Depends(get_read_db)):
+    """Vote shares with 95% confidence intervals, option switches, entropy and vote rate of a poll."""
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
+
+    stats = compute_poll_stats(db, poll_id, resolution)
+    if stats is None:
         raise HTTPException(status_code=404, detail="Poll not found")
 
-    return poll
+    return stats
+
+@router.get("/{poll_id}/trend", response_model=VoteTrend)
+async def get_poll_trend(poll_id: int, resolution: str = "minute", since: Optional[datetime] = None, until: Optional[datetime] = None, db: Session = Depends(get_read_db)):
+    """
+    New votes per minute, hour or day, served from the per-minute rollups
+    (never the raw votes). Defaults to the last hour, day or 30 days.
+    """
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
+
+    return {
+        "poll_id": poll_id,
+        "resolution": resolution,
+        "buckets": vote_rollup_job.get_trend(db, poll_id, resolution, since, until)
+    }
+
+@router.get("/{poll_id}/export")
+async def export_poll(poll_id: int, format: str = "csv", kind: str = "votes", since: Optional[datetime] = None, db: Session = Depends(get_read_db)):
+    """
+    Stream the raw votes (or likes, with kind=likes) of a poll as CSV or NDJSON.
+    Rows are read through a server-side cursor, so memory use doesn't grow with
+    the poll. Pass `since` (ISO timestamp) to export only newer rows.
+    """
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    if kind not in ("votes", "likes"):
+        raise HTTPException(status_code=400, detail="kind must be votes or likes")
+
+    if not db.query(db.query(Poll).filter(Poll.id == poll_id).exists()).scalar():
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(poll_id, kind, format, since),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="poll_{poll_id}_{kind}.{format}"'}
+    )
 
 @router.delete("/{poll_id}")
 async def delete_poll(poll_id: int, db: Session = Depends(get_db)):
@@ -169,7 +400,15 @@ async def delete_poll(poll_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Poll not found")
 
     poll.is_active = False
+    poll.deactivated_at = datetime.now(timezone.utc)
     db.commit()
+    sharded_counters.forget(poll_id)
+    trending.remove(poll_id)
+    poll_payloads.forget(poll_id)
+    shared_tallies.forget(poll_id)
+    vote_log.closed([poll_id])
+    poll_search_cache.clear()
+    poll_snapshots.freeze(db, [poll_id])
 
     # Notify WebSocket clients
     await manager.broadcast({
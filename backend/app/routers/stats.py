@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.database.database import get_read_db
+from app.schemas.schemas import GlobalStats
+from app.services.poll_stats import MAX_TOP_POLLS, RESOLUTIONS, compute_global_stats
+
+router = APIRouter()
+
+@router.get("/", response_model=GlobalStats)
+async def get_global_stats(resolution: str = "hour", top: int = 10, db: Session = Depends(get_read_db)):
+    """Cross-poll statistics, computed in bulk with NumPy and refreshed every STATS_REFRESH_SECONDS."""
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
+
+    return compute_global_stats(db, resolution, top=max(1, min(top, MAX_TOP_POLLS)))
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
 from app.models.models import User
 from app.schemas.schemas import UserCreate, User as UserSchema
 
@@ -29,13 +29,13 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @router.get("/{user_id}", response_model=UserSchema)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: Session = Depends(get_read_db)):
     db_user = db.query(User).filter(User.id == user_id).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 @router.get("/", response_model=list[UserSchema])
-async def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     users = db.query(User).offset(skip).limit(limit).all()
     return users
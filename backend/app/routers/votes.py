@@ -1,19 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_
 from typing import Optional
-import uuid
 
 from app.database.database import get_db
-from app.models.models import Poll, PollOption, User, Vote
+from app.models.models import Poll, PollOption, User, Vote, VoteSwitch
 from app.schemas.schemas import VoteCreate, Vote as VoteSchema, Poll as PollSchema, PollOption as PollOptionSchema
 from app.websocket.manager import manager
-from app.utils.session import get_or_create_user_by_session
+from app.utils.identity import visitor_session_id
+from app.utils.session import get_acting_user
+from app.services.sharded_counters import sharded_counters
+from app.services.poll_stats import poll_stats_cache
+from app.services.trending import trending
+from app.services.poll_payloads import poll_payloads
+from app.services.user_activity import user_activity_cache
+from app.services.shared_tallies import shared_tallies
+from app.services.vote_log import vote_log
 
 router = APIRouter()
 
 @router.post("/", response_model=VoteSchema)
-async def create_vote(vote: VoteCreate, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None)):
+async def create_vote(vote: VoteCreate, response: Response, db: Session = Depends(get_db), x_session_id: Optional[str] = Header(None), x_identity_token: Optional[str] = Header(None)):
     poll = db.query(Poll).filter(
         and_(Poll.id == vote.poll_id, Poll.is_active == True)
     ).first()
@@ -26,16 +33,28 @@ async def create_vote(vote: VoteCreate, db: Session = Depends(get_db), x_session
     if option is None:
         raise HTTPException(status_code=404, detail="Poll option not found")
 
-    session_id = x_session_id if x_session_id else str(uuid.uuid4())
-    temp_user = get_or_create_user_by_session(db, session_id)
+    temp_user = await get_acting_user(db, response, x_session_id, x_identity_token)
 
     existing_vote = db.query(Vote).filter(
         and_(Vote.user_id == temp_user.id, Vote.poll_id == vote.poll_id)
     ).first()
 
+    # Counters must see the vote change before it is flushed
+    old_option_id = existing_vote.option_id if existing_vote else None
+    sharded_counters.record_vote(db, poll, old_option_id, vote.option_id)
+    deltas = {vote.option_id: 1}
+    if old_option_id is not None:
+        deltas[old_option_id] = deltas.get(old_option_id, 0) - 1
+
     if existing_vote:
+        if existing_vote.option_id != vote.option_id:
+            db.add(VoteSwitch(
+                poll_id=vote.poll_id,
+                from_option_id=existing_vote.option_id,
+                to_option_id=vote.option_id
+            ))
         existing_vote.option_id = vote.option_id
-        db.commit()
+        shared_tallies.commit(db, vote.poll_id, deltas)
         db.refresh(existing_vote)
     else:
         db_vote = Vote(
@@ -44,53 +63,24 @@ async def create_vote(vote: VoteCreate, db: Session = Depends(get_db), x_session
             option_id=vote.option_id
         )
         db.add(db_vote)
-        db.commit()
+        shared_tallies.commit(db, vote.poll_id, deltas)
         db.refresh(db_vote)
 
         existing_vote = db_vote
 
     db.commit()
-    
-    from sqlalchemy.orm import joinedload
-    poll = db.query(Poll)\
-        .options(
-            joinedload(Poll.options).joinedload(PollOption.votes),
-            joinedload(Poll.owner).load_only(User.id, User.username, User.email),
-            joinedload(Poll.votes),
-            joinedload(Poll.likes)
-        )\
-        .filter(Poll.id == vote.poll_id)\
-        .first()
-    
-    vote_message = {
-        "type": "poll_update",
-        "poll_id": vote.poll_id,
-        "data": {
-            "id": poll.id,
-            "title": poll.title,
-            "description": poll.description,
-            "total_votes": poll.total_votes,
-            "total_likes": poll.total_likes,
-            "options": [{
-                "id": o.id,
-                "text": o.text,
-                "vote_count": o.vote_count,
-                "created_at": o.created_at,
-                "poll_id": o.poll_id,
-                "percentage": int((o.vote_count / poll.total_votes * 100) if poll.total_votes > 0 else 0)
-            } for o in poll.options],
-            "user_id": poll.user_id,
-            "username": poll.owner.username,
-            "created_at": poll.created_at,
-            "booster": poll.booster,
-            "expires_in": poll.expires_in,
-            "is_active": poll.is_active
-        }
-    }
-
-    await manager.broadcast_to_poll(vote.poll_id, vote_message)
-
-    await manager.broadcast(vote_message)
+    vote_log.voted(vote.poll_id, old_option_id, vote.option_id)
+    poll_stats_cache.invalidate(vote.poll_id)
+    user_activity_cache.voted(temp_user.id, vote.poll_id, vote.option_id)
+    if old_option_id != vote.option_id:
+        # Re-submitting the same option is no new activity
+        trending.record(poll.id, poll.booster, votes=1)
+
+    # None if the poll was deleted meanwhile: nothing to broadcast
+    vote_message = poll_payloads.poll_update(db, vote.poll_id)
+    if vote_message is not None:
+        await manager.broadcast_to_poll(vote.poll_id, vote_message)
+        await manager.broadcast(vote_message)
 
     return {
         "id": existing_vote.id,
@@ -98,7 +88,7 @@ async def create_vote(vote: VoteCreate, db: Session = Depends(get_db), x_session
         "option_id": existing_vote.option_id,
         "user_id": existing_vote.user_id,
         "created_at": existing_vote.created_at,
-        "session_id": session_id
+        "session_id": visitor_session_id(temp_user)
     }
 
 @router.delete("/{vote_id}")
@@ -107,9 +97,19 @@ async def delete_vote(vote_id: int, db: Session = Depends(get_db)):
     if vote is None:
         raise HTTPException(status_code=404, detail="Vote not found")
 
+    # Results of closed polls are final (and frozen in their snapshot)
+    if not vote.poll.is_active:
+        raise HTTPException(status_code=404, detail="Poll not found")
+
     poll_id = vote.poll_id
+    user_id = vote.user_id
+    option_id = vote.option_id
+    sharded_counters.record_vote(db, vote.poll, option_id, None)
     db.delete(vote)
-    db.commit()
+    shared_tallies.commit(db, poll_id, {option_id: -1})
+    vote_log.voted(poll_id, option_id, None)
+    poll_stats_cache.invalidate(poll_id)
+    user_activity_cache.voted(user_id, poll_id, None)
 
     await manager.broadcast_to_poll(poll_id, {
         "type": "vote_removed",
@@ -1 +1 @@
-from .schemas import UserCreate, User, PollCreate, Poll, PollOption, VoteCreate, PollLikeCreate
+from .schemas import UserCreate, User, PollCreate, Poll, PollOption, VoteCreate, PollLikeCreate, PollStats, GlobalStats
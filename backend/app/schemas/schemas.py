@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # User schemas
@@ -28,6 +28,11 @@ class PollCreate(PollBase):
     booster: bool = False
     expires_in: Optional[int] = None  # seconds, max 86400 (1 day)
 
+class PollBulkResult(BaseModel):
+    created: int
+    chunks: int
+    errors: List[dict] = []  # {"index": position in the input, "error": message}
+
 class PollOption(BaseModel):
     id: int
     text: str
@@ -92,10 +97,41 @@ class PollLike(PollLikeBase):
         from_attributes = True
 
 # Stats schemas
+class VoteRateBucket(BaseModel):
+    start: datetime
+    count: int
+
 class PollStats(BaseModel):
     total_votes: int
     total_likes: int
     option_stats: List[dict]
+    poll_id: Optional[int] = None
+    total_switches: int = 0
+    entropy_bits: float = 0.0
+    normalized_entropy: float = 0.0
+    resolution: str = "hour"
+    vote_rate: List[VoteRateBucket] = []
+
+class VoteTrendBucket(BaseModel):
+    start: datetime
+    total: int
+    options: Dict[int, int]  # option_id -> votes in the bucket
+
+class VoteTrend(BaseModel):
+    poll_id: int
+    resolution: str
+    buckets: List[VoteTrendBucket]
+
+class GlobalStats(BaseModel):
+    total_polls: int
+    total_votes: int
+    total_likes: int
+    total_switches: int
+    votes_per_poll: dict  # mean, p50, p90, p99, max
+    mean_entropy_bits: float
+    resolution: str
+    vote_rate: List[VoteRateBucket]
+    top_polls: List[dict]
 
 # WebSocket message schemas
 class WSMessage(BaseModel):
@@ -0,0 +1,320 @@
+"""
+Build a large, reproducible synthetic dataset for benchmarks and plan checks.
+
+    python -m app.seed --users 200000 --polls 100000 --votes 20000000 --likes 5000000
+
+Votes and likes follow a zipfian distribution over polls (a few polls get most
+of the traffic) and over each poll's options. The same arguments and --seed
+always produce the same rows on an empty database. Rows are generated with
+NumPy a chunk of polls at a time and written with COPY on Postgres (psycopg2)
+or executemany elsewhere, bypassing the ORM.
+"""
+import argparse
+import csv
+import io
+import math
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal, engine, create_tables
+from app.models.models import Poll, PollLike, PollOption, User, Vote
+from app.services.poll_search import reindex_all
+
+USERNAME_PREFIX = "seed_user_"
+BLOCK = 1000  # polls generated together (and per random generator)
+USER_CHUNK = 100000
+
+def is_seeded(db: Session) -> bool:
+    return db.query(User.id).filter(User.username.like(f"{USERNAME_PREFIX}%")).first() is not None
+
+def zipf_counts(total: int, n: int, s: float, cap: int, rng: np.random.Generator) -> np.ndarray:
+    """Split `total` over n items with weights 1/rank^s (ranks shuffled), at most `cap` each"""
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** s
+    counts = np.floor(weights / weights.sum() * total).astype(np.int64)
+    return np.minimum(counts[rng.permutation(n)], cap)
+
+def _coprime_strides(n: int, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Strides that visit every user exactly once when stepping modulo n"""
+    strides: List[int] = []
+    while len(strides) < count:
+        stride = int(rng.integers(1, max(n, 2)))
+        if math.gcd(stride, n) == 1:
+            strides.append(stride)
+    return np.array(strides, dtype=np.int64)
+
+def distinct_users(counts: np.ndarray, num_users: int, first_user_id: int, strides: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    counts[i] distinct user ids for each poll i, concatenated. Each poll walks the
+    users from a random start with a stride coprime to num_users, so no user
+    repeats within a poll (the votes and likes unique constraints).
+    """
+    total = int(counts.sum())
+    group_start = np.repeat(np.cumsum(counts) - counts, counts)
+    step = np.arange(total, dtype=np.int64) - group_start
+    start = np.repeat(rng.integers(0, num_users, len(counts)), counts)
+    stride = np.repeat(strides[rng.integers(0, len(strides), len(counts))], counts)
+    return first_user_id + (start + step * stride) % num_users
+
+def option_ranks(total: int, options_per_poll: int, s: float, rng: np.random.Generator) -> np.ndarray:
+    """Zipfian option ranks (0 is the favourite) for `total` votes"""
+    weights = 1.0 / np.arange(1, options_per_poll + 1, dtype=np.float64) ** s
+    cdf = np.cumsum(weights / weights.sum())
+    return np.minimum(np.searchsorted(cdf, rng.random(total)), options_per_poll - 1)
+
+class TableWriter:
+    """Writes row tuples to one table: COPY with psycopg2, executemany otherwise"""
+
+    def __init__(self, db: Session, table: str, columns: Sequence[str]):
+        self.db = db
+        self.table = table
+        self.columns = columns
+        self.written = 0
+
+    def _timestamp(self, values: np.ndarray) -> List[Optional[str]]:
+        """UTC datetime64 values as text, NaT as NULL"""
+        if engine.dialect.name == "sqlite":
+            # SQLAlchemy's SQLite storage format: naive UTC with a space separator
+            formatted = np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ")
+        else:
+            formatted = np.datetime_as_string(values, unit="us", timezone="UTC")
+        return [None if missing else value for value, missing in zip(formatted.tolist(), np.isnat(values).tolist())]
+
+    def write(self, *columns):
+        """One array (or list) per column; datetime64 arrays are formatted for the database"""
+        values = [
+            self._timestamp(column) if isinstance(column, np.ndarray) and column.dtype.kind == "M"
+            else column.tolist() if isinstance(column, np.ndarray)
+            else column
+            for column in columns
+        ]
+        rows = list(zip(*values))
+        if not rows:
+            return
+
+        cursor = self.db.connection().connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            else:
+                placeholder = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+                cursor.executemany(
+                    f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({', '.join([placeholder] * len(self.columns))})",
+                    rows
+                )
+        finally:
+            cursor.close()
+        self.written += len(rows)
+
+def _next_id(db: Session, model) -> int:
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+def _reset_sequences(db: Session):
+    """Explicit ids leave Postgres sequences behind; move them past the seeded rows"""
+    if engine.dialect.name != "postgresql":
+        return
+    for table in ("users", "polls", "poll_options", "votes", "poll_likes"):
+        db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"))
+
+def build_dataset(
+    num_users: int,
+    num_polls: int,
+    total_votes: int,
+    total_likes: int,
+    options_per_poll: int = 4,
+    zipf_s: float = 1.1,
+    history_days: int = 90,
+    active_days: int = 7,
+    chunk_size: int = 10000,
+    seed: int = 42,
+    until: Optional[datetime] = None,
+) -> dict:
+    """
+    Insert the dataset, about chunk_size polls per transaction; returns the row
+    counts. Timestamps end at `until` (UTC, default now).
+    """
+    rng = np.random.default_rng(seed)
+    until = until or datetime.now(timezone.utc)
+    if until.tzinfo is not None:
+        until = until.astimezone(timezone.utc)
+    now = np.datetime64(until.replace(tzinfo=None, microsecond=0), "us")  # naive values are taken as UTC
+    history = np.timedelta64(history_days * 86400, "s")
+    day = np.timedelta64(86400, "s")
+
+    db = SessionLocal()
+    try:
+        if engine.dialect.name == "sqlite":
+            db.execute(text("PRAGMA synchronous = OFF"))
+
+        first_user_id = _next_id(db, User)
+        first_poll_id = _next_id(db, Poll)
+        first_option_id = _next_id(db, PollOption)
+        first_vote_id = _next_id(db, Vote)
+        first_like_id = _next_id(db, PollLike)
+
+        users = TableWriter(db, "users", ("id", "username", "email", "hashed_password", "is_active", "created_at"))
+        polls = TableWriter(db, "polls", ("id", "title", "description", "is_active", "created_at", "user_id", "booster", "expires_in", "deactivated_at"))
+        options = TableWriter(db, "poll_options", ("id", "text", "poll_id", "created_at"))
+        votes = TableWriter(db, "votes", ("id", "user_id", "poll_id", "option_id", "created_at"))
+        likes = TableWriter(db, "poll_likes", ("id", "user_id", "poll_id", "created_at"))
+
+        user_created = now - history - day + (rng.random(num_users) * history_days * 86400).astype("timedelta64[s]")
+        for start in range(0, num_users, USER_CHUNK):
+            ids = np.arange(first_user_id + start, first_user_id + min(start + USER_CHUNK, num_users), dtype=np.int64)
+            id_list = ids.tolist()
+            users.write(
+                ids,
+                [f"{USERNAME_PREFIX}{user_id}" for user_id in id_list],
+                [f"{user_id}@seed.local" for user_id in id_list],
+                ["no_password"] * len(ids),
+                [True] * len(ids),
+                user_created[start:start + USER_CHUNK],
+            )
+            db.commit()
+        print(f"🌱 {users.written} users", file=sys.stderr)
+
+        vote_counts = zipf_counts(total_votes, num_polls, zipf_s, num_users, rng)
+        like_counts = np.minimum(vote_counts * total_likes // max(total_votes, 1), num_users)
+        poll_created = now - history + np.sort(rng.random(num_polls) * history_days * 86400).astype("timedelta64[s]")
+        strides = _coprime_strides(num_users, 64, rng)
+
+        for start in range(0, num_polls, BLOCK):
+            # Each block of polls draws from its own generator, so the rows don't depend on chunk_size
+            block_rng = np.random.default_rng([seed, start // BLOCK])
+            stop = min(start + BLOCK, num_polls)
+            n = stop - start
+            poll_ids = np.arange(first_poll_id + start, first_poll_id + stop, dtype=np.int64)
+            created = poll_created[start:stop]
+            active = created > now - np.timedelta64(active_days * 86400, "s")
+            expiring = active & (block_rng.random(n) < 0.05)
+
+            polls.write(
+                poll_ids,
+                [f"Seed poll {poll_id}" for poll_id in poll_ids.tolist()],
+                [None] * n,
+                active,
+                created,
+                first_user_id + block_rng.integers(0, num_users, n),
+                [False] * n,
+                [86400 if expires else None for expires in expiring.tolist()],
+                np.where(active, np.datetime64("NaT"), created + day),
+            )
+
+            option_ids = first_option_id + (poll_ids[:, None] - first_poll_id) * options_per_poll + np.arange(options_per_poll)
+            options.write(
+                option_ids.ravel(),
+                [f"Option {rank + 1}" for _ in range(n) for rank in range(options_per_poll)],
+                np.repeat(poll_ids, options_per_poll),
+                np.repeat(created, options_per_poll),
+            )
+
+            # Votes: distinct users per poll, zipfian options (the favourite rotates per poll),
+            # arriving mostly soon after the poll opened
+            counts = vote_counts[start:stop]
+            poll_of_vote = np.repeat(np.arange(n), counts)
+            ranks = option_ranks(len(poll_of_vote), options_per_poll, zipf_s, block_rng)
+            favourite = block_rng.integers(0, options_per_poll, n)
+            lifetime = np.minimum(now - created, day).astype("timedelta64[s]").astype(np.int64)
+            voted_at = created[poll_of_vote] + (block_rng.random(len(poll_of_vote)) ** 2 * lifetime[poll_of_vote]).astype("timedelta64[s]")
+            votes.write(
+                first_vote_id + votes.written + np.arange(len(poll_of_vote)),
+                distinct_users(counts, num_users, first_user_id, strides, block_rng),
+                poll_ids[poll_of_vote],
+                option_ids[poll_of_vote, (ranks + favourite[poll_of_vote]) % options_per_poll],
+                voted_at,
+            )
+
+            counts = like_counts[start:stop]
+            poll_of_like = np.repeat(np.arange(n), counts)
+            liked_at = created[poll_of_like] + (block_rng.random(len(poll_of_like)) * lifetime[poll_of_like]).astype("timedelta64[s]")
+            likes.write(
+                first_like_id + likes.written + np.arange(len(poll_of_like)),
+                distinct_users(counts, num_users, first_user_id, strides, block_rng),
+                poll_ids[poll_of_like],
+                liked_at,
+            )
+            if polls.written % chunk_size < BLOCK or stop == num_polls:
+                db.commit()
+                print(f"🌱 {polls.written} polls, {votes.written} votes, {likes.written} likes", file=sys.stderr)
+
+        _reset_sequences(db)
+        db.commit()
+
+        # COPY bypasses the search index maintenance of the write paths
+        indexed = reindex_all(db, after_id=first_poll_id - 1)
+        print(f"🔎 Indexed {indexed} polls for search", file=sys.stderr)
+        return {
+            "users": users.written,
+            "polls": polls.written,
+            "options": options.written,
+            "votes": votes.written,
+            "likes": likes.written,
+        }
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def analyze():
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a reproducible zipfian dataset")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--polls", type=int, default=50000)
+    parser.add_argument("--votes", type=int, default=10_000_000, help="total votes before per-poll caps")
+    parser.add_argument("--likes", type=int, default=2_000_000, help="total likes before per-poll caps")
+    parser.add_argument("--options", type=int, default=4, help="options per poll")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew exponent of polls and options")
+    parser.add_argument("--days", type=int, default=90, help="history covered by the polls")
+    parser.add_argument("--active-days", type=int, default=7, help="polls newer than this are active")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="polls per transaction (rounded to blocks of 1000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--until", type=datetime.fromisoformat, help="end of the history, ISO 8601 (default now)")
+    parser.add_argument("--force", action="store_true", help="seed even if seeded users already exist")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        if is_seeded(db) and not args.force:
+            print("📦 Dataset already seeded (use --force to add another)", file=sys.stderr)
+            return
+    finally:
+        db.close()
+
+    started = time.perf_counter()
+    counts = build_dataset(
+        args.users, args.polls, args.votes, args.likes,
+        options_per_poll=args.options,
+        zipf_s=args.zipf,
+        history_days=args.days,
+        active_days=args.active_days,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        until=args.until,
+    )
+    analyze()
+    print(
+        f"✅ Seeded {counts['users']} users, {counts['polls']} polls, {counts['options']} options, "
+        f"{counts['votes']} votes and {counts['likes']} likes in {time.perf_counter() - started:.1f}s"
+    )
+    print(
+        "⚠️  The rows bypassed the app's write paths. Before serving this database, stop every worker, "
+        "delete VOTE_LOG_DIR/tallies.snapshot and set a new TALLY_GENERATION so the vote log and shared "
+        "tallies are rebuilt from the tables; sharded counters reseed from the votes table when a poll gets hot",
+        file=sys.stderr
+    )
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,18 @@ from sqlalchemy import select, and_
 from collections import defaultdict
 
 from app.database.database import SessionLocal
-from app.models.models import Poll, Vote, PollLike, User
+from app.models.models import Poll, Vote, PollLike, User, VoteSwitch
 from app.websocket.manager import manager
 from app.schemas.schemas import Poll as PollSchema, PollOption as PollOptionSchema
+from app.services.sharded_counters import sharded_counters
+from app.services.poll_stats import poll_stats_cache
+from app.services.trending import trending
+from app.services.poll_search import index_missing, poll_search_cache
+from app.services.poll_snapshots import poll_snapshots
+from app.services.visitor_gc import visitor_gc
+from app.services.poll_payloads import poll_payloads
+from app.services.shared_tallies import shared_tallies
+from app.services.vote_log import vote_log
 
 class DemoDataGenerator:
     def __init__(self):
@@ -25,6 +34,7 @@ class DemoDataGenerator:
         self.demo_user_ids = [user.id for user in existing_users]
         
         if existing_count >= count:
+            visitor_gc.protect(self.demo_user_ids)
             return
         
         # Bulk insert remaining users
@@ -48,6 +58,7 @@ class DemoDataGenerator:
             User.username.like("demo_user_%")
         ).limit(count).all()
         self.demo_user_ids = [user.id for user in all_users]
+        visitor_gc.protect(self.demo_user_ids)
 
     async def start(self):
         """Start the demo data generator"""
@@ -70,6 +81,11 @@ class DemoDataGenerator:
                 db.commit()
             
             await self._create_demo_users_pool(db, count=50)
+
+            # The demo votes on whatever polls exist; make sure they are all searchable
+            indexed = index_missing(db)
+            if indexed:
+                print(f"🔎 Indexed {indexed} demo poll(s) for search")
         finally:
             db.close()
         
@@ -122,16 +138,21 @@ class DemoDataGenerator:
             
             await asyncio.sleep(15)
     
+    @staticmethod
+    def expiring_polls_query(db: Session):
+        """Active polls that have an expiry, with only the fields the expiry check needs"""
+        return db.query(Poll.id, Poll.title, Poll.expires_in, Poll.created_at).filter(
+            Poll.is_active == True,
+            Poll.expires_in != None
+        )
+
     async def _expire_polls_periodically(self):
         """Check and expire polls every 30 seconds"""
         while self.running:
             db = SessionLocal()
             try:
                 # Get only necessary fields
-                polls = db.query(Poll.id, Poll.title, Poll.expires_in, Poll.created_at).filter(
-                    Poll.is_active == True,
-                    Poll.expires_in != None
-                ).all()
+                polls = self.expiring_polls_query(db).all()
                 
                 from datetime import datetime, timedelta, timezone
                 now = datetime.now(timezone.utc)
@@ -149,10 +170,17 @@ class DemoDataGenerator:
                     # Bulk update
                     db.query(Poll).filter(
                         Poll.id.in_(expired_poll_ids)
-                    ).update({Poll.is_active: False}, synchronize_session=False)
+                    ).update({Poll.is_active: False, Poll.deactivated_at: now}, synchronize_session=False)
                     db.commit()
                     
                     print(f"✅ Expired {len(expired_poll_ids)} poll(s)")
+                    for poll_id in expired_poll_ids:
+                        trending.remove(poll_id)
+                        poll_payloads.forget(poll_id)
+                        shared_tallies.forget(poll_id)
+                    vote_log.closed(expired_poll_ids)
+                    poll_search_cache.clear()
+                    poll_snapshots.freeze(db, expired_poll_ids)
                     
                     # Broadcast deletions
                     for poll_id in expired_poll_ids:
@@ -226,7 +254,7 @@ class DemoDataGenerator:
                     # Update existing vote
                     old_option_id = existing_votes_map[user_id]
                     if old_option_id != random_option_id:
-                        votes_to_update.append((user_id, random_option_id))
+                        votes_to_update.append((user_id, old_option_id, random_option_id))
                         option_vote_deltas[old_option_id] -= 1
                         option_vote_deltas[random_option_id] += 1
                 else:
@@ -247,6 +275,9 @@ class DemoDataGenerator:
                 ))
                 likes_added += 1
         
+        # Booster polls are sharded; apply the deltas before the votes are written
+        sharded_counters.record_votes(db, poll, option_vote_deltas)
+
         # Bulk insert new votes and likes
         if votes_to_insert:
             db.bulk_save_objects(votes_to_insert)
@@ -255,53 +286,34 @@ class DemoDataGenerator:
             db.bulk_save_objects(likes_to_insert)
         
         # Bulk update changed votes
-        for user_id, new_option_id in votes_to_update:
+        for user_id, old_option_id, new_option_id in votes_to_update:
             db.query(Vote).filter(
                 and_(Vote.user_id == user_id, Vote.poll_id == poll.id)
             ).update({Vote.option_id: new_option_id}, synchronize_session=False)
+
+        if votes_to_update:
+            db.bulk_save_objects([
+                VoteSwitch(poll_id=poll.id, from_option_id=old_option_id, to_option_id=new_option_id)
+                for _, old_option_id, new_option_id in votes_to_update
+            ])
         
-        db.commit()
+        shared_tallies.commit(db, poll.id, option_vote_deltas, likes_added)
+        vote_log.record(
+            poll.id,
+            [(None, new_vote.option_id) for new_vote in votes_to_insert]
+            + [(old_option_id, new_option_id) for _, old_option_id, new_option_id in votes_to_update],
+            likes_added
+        )
+        poll_stats_cache.invalidate(poll.id)
+        trending.record(poll.id, poll.booster, votes=votes_added + len(votes_to_update), likes=likes_added)
         
-        # Update counters in memory
         if votes_added > 0 or likes_added > 0:
-            poll.total_votes += votes_added
-            poll.total_likes += likes_added
-            
-            for option in poll.options:
-                if option.id in option_vote_deltas:
-                    option.vote_count += option_vote_deltas[option.id]
-            
             # Broadcast update
-            update_message = {
-                "type": "poll_update",
-                "poll_id": poll.id,
-                "data": {
-                    "id": poll.id,
-                    "title": poll.title,
-                    "description": poll.description,
-                    "total_votes": poll.total_votes,
-                    "total_likes": poll.total_likes,
-                    "options": [{
-                        "id": o.id,
-                        "text": o.text,
-                        "vote_count": o.vote_count,
-                        "created_at": o.created_at,
-                        "poll_id": o.poll_id,
-                        "percentage": int((o.vote_count / poll.total_votes * 100) if poll.total_votes > 0 else 0)
-                    } for o in poll.options],
-                    "user_id": poll.user_id,
-                    "username": poll.owner.username,
-                    "created_at": poll.created_at,
-                    "booster": poll.booster,
-                    "expires_in": poll.expires_in,
-                    "is_active": poll.is_active
-                }
-            }
+            update_message = poll_payloads.poll_update(db, poll.id)
+            if update_message is not None:
+                await manager.broadcast_to_poll(poll.id, update_message)
+                await manager.broadcast(update_message)
 
-            await manager.broadcast_to_poll(poll.id, update_message)
-            
-            await manager.broadcast(update_message)
-            
             print(f"✅ Poll {poll.id}: Added {votes_added} votes, {likes_added} likes")
 
 demo_data_generator = DemoDataGenerator()
\ No newline at end of file
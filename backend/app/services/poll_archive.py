@@ -0,0 +1,143 @@
+import asyncio
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.models import (
+    Poll, PollOption, Vote, PollLike, VoteSwitch, PollCounterShard, ShardedPoll, VoteRollup,
+    ArchivedPoll, ArchivedPollOption, ArchivedVote, ArchivedPollLike, ArchivedVoteSwitch
+)
+from app.services.poll_stats import poll_stats_cache
+from app.services.sharded_counters import sharded_counters
+from app.services.shared_tallies import shared_tallies
+from app.services.vote_log import vote_log
+from app.services.poll_search import poll_search_cache, unindex_polls
+from app.services.trending import trending
+
+# The tables a poll's reads go through: the hot ones, or their archive copies
+PollTables = namedtuple("PollTables", ["poll", "option", "vote", "like"])
+
+HOT_TABLES = PollTables(Poll, PollOption, Vote, PollLike)
+ARCHIVE_TABLES = PollTables(ArchivedPoll, ArchivedPollOption, ArchivedVote, ArchivedPollLike)
+
+# Copied parent-first, deleted child-first
+ARCHIVED = [
+    (Poll, ArchivedPoll, Poll.id),
+    (PollOption, ArchivedPollOption, PollOption.poll_id),
+    (Vote, ArchivedVote, Vote.poll_id),
+    (PollLike, ArchivedPollLike, PollLike.poll_id),
+    (VoteSwitch, ArchivedVoteSwitch, VoteSwitch.poll_id),
+]
+
+# Derived per-poll data that is dropped rather than archived
+DROPPED = [
+    (PollCounterShard, PollCounterShard.poll_id),
+    (ShardedPoll, ShardedPoll.poll_id),
+    (VoteRollup, VoteRollup.poll_id),
+]
+
+MAX_EXPIRES_IN = timedelta(days=1)
+
+class PollArchiver:
+    """
+    Moves polls that have been inactive (or expired) for `archive_after_days`
+    out of the hot tables, a batch of `archive_batch_size` polls per transaction,
+    so the indexes and aggregates on polls, poll_options, votes and poll_likes
+    only cover the live working set.
+    """
+
+    def __init__(self):
+        self.running = False
+
+    def _candidates(self, db: Session, cutoff: datetime) -> List[int]:
+        # expires_in is capped at a day, so anything created before cutoff - 1 day
+        # with an expiry expired at least archive_after_days ago, flagged or not
+        return [
+            poll_id for poll_id, in db.query(Poll.id)
+                .filter(or_(
+                    and_(Poll.is_active == False, func.coalesce(Poll.deactivated_at, Poll.created_at) < cutoff),
+                    and_(Poll.expires_in != None, Poll.created_at < cutoff - MAX_EXPIRES_IN)
+                ))
+                .order_by(Poll.id)
+                .limit(settings.archive_batch_size)
+                .all()
+        ]
+
+    def archive_batch(self, db: Session, cutoff: datetime) -> List[int]:
+        """Move one batch of polls to the archive in a single transaction; returns their ids"""
+        poll_ids = self._candidates(db, cutoff)
+        if not poll_ids:
+            return []
+
+        # Polls closed before snapshots existed get theirs now, from the hot tables,
+        # in the same transaction as the move
+        from app.services.poll_snapshots import poll_snapshots
+        poll_snapshots.freeze(db, poll_ids, commit=False)
+
+        for hot, archive, poll_column in ARCHIVED:
+            columns = [column.name for column in archive.__table__.columns if column.name in hot.__table__.columns]
+            db.execute(
+                insert(archive.__table__).from_select(
+                    columns,
+                    select(*[hot.__table__.c[name] for name in columns]).where(poll_column.in_(poll_ids))
+                )
+            )
+
+        for model, poll_column in DROPPED:
+            db.execute(delete(model.__table__).where(poll_column.in_(poll_ids)))
+        for hot, _, poll_column in reversed(ARCHIVED):
+            db.execute(delete(hot.__table__).where(poll_column.in_(poll_ids)))
+
+        unindex_polls(db, poll_ids)
+        db.commit()
+
+        vote_log.closed(poll_ids)
+        for poll_id in poll_ids:
+            sharded_counters.forget(poll_id)
+            shared_tallies.forget(poll_id)
+            poll_stats_cache.invalidate(poll_id)
+            trending.remove(poll_id)
+        poll_search_cache.clear()
+        return poll_ids
+
+    def archive(self, db: Session) -> int:
+        """Archive every eligible poll; returns the number archived"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.archive_after_days)
+        archived = 0
+        while True:
+            poll_ids = self.archive_batch(db, cutoff)
+            archived += len(poll_ids)
+            if len(poll_ids) < settings.archive_batch_size:
+                return archived
+
+    async def start(self):
+        """Start archiving in the background"""
+        self.running = True
+        asyncio.create_task(self._archive_periodically())
+
+    def stop(self):
+        """Stop the archiver"""
+        self.running = False
+
+    async def _archive_periodically(self):
+        """Archive old inactive polls every `archive_interval` seconds"""
+        while self.running:
+            db = SessionLocal()
+            try:
+                archived = self.archive(db)
+                if archived:
+                    print(f"📦 Archived {archived} inactive poll(s)")
+            except Exception as e:
+                print(f"❌ Error archiving polls: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+            await asyncio.sleep(settings.archive_interval)
+
+poll_archiver = PollArchiver()
@@ -0,0 +1,162 @@
+import csv
+import io
+from datetime import datetime, timezone
+from typing import List
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.models import Poll, PollOption, User
+from app.schemas.schemas import PollCreate
+from app.websocket.manager import manager
+from app.services.poll_stats import GLOBAL_KEY, poll_stats_cache
+from app.services.trending import trending
+from app.services.poll_search import index_polls
+from app.utils.json_stream import MalformedRecord
+
+MAX_EXPIRES_IN = 86400  # 1 day, same limit as create_poll
+
+def parse_poll_record(record: dict) -> PollCreate:
+    """Validate one imported record; raises ValueError with a readable message"""
+    if isinstance(record, MalformedRecord):
+        raise record
+    try:
+        poll = PollCreate(**record) if isinstance(record, dict) else None
+    except ValidationError as e:
+        error = e.errors()[0]
+        raise ValueError(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}")
+    if poll is None:
+        raise ValueError("Record must be a JSON object")
+    if not poll.options:
+        raise ValueError("Poll needs at least one option")
+    if poll.expires_in is not None and poll.expires_in > MAX_EXPIRES_IN:
+        raise ValueError("Poll expiry cannot exceed 1 day (86400 seconds)")
+    return poll
+
+def _copy_options(db: Session, rows: List[dict]) -> bool:
+    """Stream option rows through COPY when the driver supports it (psycopg2 on Postgres)"""
+    connection = db.connection()
+    if connection.dialect.name != "postgresql":
+        return False
+    cursor = connection.connection.cursor()
+    try:
+        if not hasattr(cursor, "copy_expert"):
+            return False
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row["poll_id"], row["text"], row["created_at"].isoformat()])
+        buffer.seek(0)
+        cursor.copy_expert("COPY poll_options (poll_id, text, created_at) FROM STDIN WITH (FORMAT csv)", buffer)
+        return True
+    finally:
+        cursor.close()
+
+def insert_poll_chunk(db: Session, user: User, polls: List[PollCreate]) -> List[dict]:
+    """
+    Insert a chunk of polls and their options in one transaction: one multi-row
+    INSERT ... RETURNING for the polls and one COPY (or executemany) for the options.
+    Returns the broadcast payload of every created poll.
+    """
+    now = datetime.now(timezone.utc)
+    poll_rows = [
+        {
+            "title": poll.title,
+            "description": poll.description,
+            "user_id": user.id,
+            "booster": poll.booster,
+            "expires_in": poll.expires_in,
+            "is_active": True,
+            "created_at": now,
+        }
+        for poll in polls
+    ]
+    poll_ids = db.execute(
+        insert(Poll.__table__).returning(Poll.__table__.c.id, sort_by_parameter_order=True),
+        poll_rows
+    ).scalars().all()
+
+    option_rows = [
+        {"poll_id": poll_id, "text": text, "created_at": now}
+        for poll_id, poll in zip(poll_ids, polls)
+        for text in poll.options
+    ]
+    if option_rows and not _copy_options(db, option_rows):
+        db.execute(insert(PollOption.__table__), option_rows)
+
+    index_polls(db, poll_ids)
+    db.commit()
+
+    return [
+        {
+            "id": poll_id,
+            "user_id": user.id,
+            "username": user.username,
+            "title": row["title"],
+            "description": row["description"],
+            "total_votes": 0,
+            "total_likes": 0,
+            "options": [],
+            "created_at": now,
+            "booster": row["booster"],
+            "expires_in": row["expires_in"],
+            "is_active": True
+        }
+        for poll_id, row in zip(poll_ids, poll_rows)
+    ]
+
+async def broadcast_created(polls_data: List[dict]):
+    """One aggregated event per chunk instead of one per poll"""
+    if polls_data:
+        await manager.broadcast({
+            "type": "polls_created",
+            "poll_id": 0,
+            "data": polls_data
+        })
+
+class PollImporter:
+    """
+    Buffers validated poll records and writes them in chunks of `chunk_size`.
+    Invalid records are skipped and reported with their position in the input.
+    """
+
+    def __init__(self, db: Session, user: User, chunk_size: int = 1000):
+        self.db = db
+        self.user = user
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.chunks = 0
+        self.errors: List[dict] = []
+        self._pending: List[PollCreate] = []
+        self._seen = 0
+
+    def add(self, record: dict) -> bool:
+        """Queue a record; returns True when a full chunk is ready to flush"""
+        index = self._seen
+        self._seen += 1
+        try:
+            self._pending.append(parse_poll_record(record))
+        except ValueError as e:
+            self.errors.append({"index": index, "error": str(e)})
+        return len(self._pending) >= self.chunk_size
+
+    async def flush(self):
+        if not self._pending:
+            return
+        polls, self._pending = self._pending, []
+        try:
+            polls_data = insert_poll_chunk(self.db, self.user, polls)
+        except Exception:
+            self.db.rollback()
+            raise
+        poll_stats_cache.invalidate(GLOBAL_KEY)
+        for poll, poll_data in zip(polls, polls_data):
+            trending.add_poll(poll_data["id"], poll.booster)
+        self.created += len(polls_data)
+        self.chunks += 1
+        await broadcast_created(polls_data)
+
+    def result(self) -> dict:
+        return {"created": self.created, "chunks": self.chunks, "errors": self.errors}
@@ -0,0 +1,96 @@
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.models import Poll, User
+from app.utils.poll_details import poll_counts
+from app.websocket.manager import EncodedMessage, json_serializer
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=json_serializer)
+
+class PollFragments:
+    """
+    The parts of a poll_update message that never change, encoded once. Only the
+    counters, percentages and is_active are encoded per update.
+    """
+    __slots__ = ("head", "options", "tail")
+
+    def __init__(self, poll: Poll):
+        self.head = (
+            f'{{"type": "poll_update", "poll_id": {poll.id}, "data": {{"id": {poll.id}, '
+            f'"title": {_dumps(poll.title)}, "description": {_dumps(poll.description)}, '
+        )
+        # (option id, text before its vote_count, text between vote_count and percentage)
+        self.options: List[Tuple[int, str, str]] = [
+            (
+                option.id,
+                f'{{"id": {option.id}, "text": {_dumps(option.text)}, "vote_count": ',
+                f', "created_at": {_dumps(option.created_at)}, "poll_id": {poll.id}, "percentage": '
+            )
+            for option in sorted(poll.options, key=lambda option: option.id)
+        ]
+        self.tail = (
+            f'"user_id": {poll.user_id}, "username": {_dumps(poll.owner.username if poll.owner else None)}, '
+            f'"created_at": {_dumps(poll.created_at)}, "booster": {_dumps(poll.booster)}, '
+            f'"expires_in": {_dumps(poll.expires_in)}, "is_active": '
+        )
+
+    def encode(self, vote_counts: Dict[int, int], total_likes: int, is_active: bool) -> str:
+        total_votes = sum(vote_counts.get(option_id, 0) for option_id, _, _ in self.options)
+        options = ", ".join(
+            f"{before}{count}{between}{int(count / total_votes * 100) if total_votes > 0 else 0}}}"
+            for option_id, before, between in self.options
+            for count in (vote_counts.get(option_id, 0),)
+        )
+        return (
+            f'{self.head}"total_votes": {total_votes}, "total_likes": {total_likes}, '
+            f'"options": [{options}], {self.tail}{"true" if is_active else "false"}}}}}'
+        )
+
+class PollPayloadBuilder:
+    """
+    Builds the poll_update message broadcast after every vote and like. The static
+    fragments of recently updated polls are kept in an LRU, so an update costs the
+    two count queries (or a shared tally read) and a string join over the options.
+    """
+
+    def __init__(self, max_polls: int = 5000):
+        self.max_polls = max_polls
+        self._fragments: OrderedDict = OrderedDict()  # poll_id -> PollFragments
+
+    def _fragments_for(self, db: Session, poll_id: int) -> Optional[PollFragments]:
+        fragments = self._fragments.get(poll_id)
+        if fragments is not None:
+            self._fragments.move_to_end(poll_id)
+            return fragments
+
+        poll = db.query(Poll)\
+            .options(
+                joinedload(Poll.options),
+                joinedload(Poll.owner).load_only(User.id, User.username)
+            )\
+            .filter(Poll.id == poll_id)\
+            .first()
+        if poll is None:
+            return None
+
+        fragments = self._fragments[poll_id] = PollFragments(poll)
+        while len(self._fragments) > self.max_polls:
+            self._fragments.popitem(last=False)
+        return fragments
+
+    def poll_update(self, db: Session, poll_id: int, is_active: bool = True) -> Optional[EncodedMessage]:
+        """The current poll_update message of a poll, or None if it doesn't exist"""
+        fragments = self._fragments_for(db, poll_id)
+        if fragments is None:
+            return None
+        vote_counts, total_likes = poll_counts(db, poll_id)
+        return EncodedMessage("poll_update", fragments.encode(vote_counts, total_likes, is_active))
+
+    def forget(self, poll_id: int):
+        self._fragments.pop(poll_id, None)
+
+poll_payloads = PollPayloadBuilder()
@@ -0,0 +1,147 @@
+import re
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, bindparam, func, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from app.models.models import Poll
+
+SEARCH_CONFIG = "english"
+
+MAX_QUERY_TERMS = 16
+
+# Title matches outrank description matches, which outrank option text
+_PG_INDEX = text(f"""
+    UPDATE polls SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', title), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(
+            (SELECT string_agg(text, ' ') FROM poll_options WHERE poll_options.poll_id = polls.id), ''
+        )), 'C')
+    WHERE id IN :poll_ids
+""").bindparams(bindparam("poll_ids", expanding=True))
+
+_SQLITE_DELETE = text("DELETE FROM poll_search_fts WHERE rowid IN :poll_ids")\
+    .bindparams(bindparam("poll_ids", expanding=True))
+
+_SQLITE_INDEX = text("""
+    INSERT INTO poll_search_fts (rowid, title, description, options)
+    SELECT id, title, coalesce(description, ''), coalesce(
+        (SELECT group_concat(text, ' ') FROM poll_options WHERE poll_options.poll_id = polls.id), ''
+    )
+    FROM polls WHERE id IN :poll_ids
+""").bindparams(bindparam("poll_ids", expanding=True))
+
+# bm25 column weights in fts5 column order (title, description, options); lower scores rank higher
+_SQLITE_MATCH = text("""
+    SELECT rowid AS poll_id, -bm25(poll_search_fts, 4.0, 2.0, 1.0) AS rank
+    FROM poll_search_fts WHERE poll_search_fts MATCH :query
+""").columns(poll_id=Integer, rank=Float)
+
+def _terms(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())[:MAX_QUERY_TERMS]
+
+class PollSearchCache:
+    """
+    LRU cache of ranked result pages, keyed by (normalized query, status, skip, limit).
+    Only the ordered poll ids are cached, so the counts on a cached page are still
+    read fresh. Any write to the index clears it.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: tuple):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: tuple, value: list):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+poll_search_cache = PollSearchCache()
+
+def index_polls(db: Session, poll_ids: List[int]):
+    """
+    (Re)index polls from their stored title, description and options. Runs in the
+    caller's transaction, so call it after the options are flushed and before commit.
+    """
+    if not poll_ids:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(_PG_INDEX, {"poll_ids": poll_ids})
+    else:
+        db.execute(_SQLITE_DELETE, {"poll_ids": poll_ids})
+        db.execute(_SQLITE_INDEX, {"poll_ids": poll_ids})
+    poll_search_cache.clear()
+
+def unindex_polls(db: Session, poll_ids: List[int]):
+    """Drop polls from the index before their rows are deleted (the tsvector goes with the row on Postgres)"""
+    if poll_ids and db.get_bind().dialect.name != "postgresql":
+        db.execute(_SQLITE_DELETE, {"poll_ids": poll_ids})
+    poll_search_cache.clear()
+
+def reindex_all(db: Session, batch_size: int = 1000, after_id: int = 0) -> int:
+    """Index every poll with an id above `after_id`, e.g. after adding search to an existing database; returns the polls indexed"""
+    indexed = 0
+    last_id = after_id
+    while True:
+        poll_ids = db.query(Poll.id).filter(Poll.id > last_id).order_by(Poll.id).limit(batch_size).all()
+        if not poll_ids:
+            return indexed
+        poll_ids = [poll_id for poll_id, in poll_ids]
+        index_polls(db, poll_ids)
+        db.commit()
+        indexed += len(poll_ids)
+        last_id = poll_ids[-1]
+
+def index_missing(db: Session, batch_size: int = 1000) -> int:
+    """Index the polls that were written without going through index_polls; returns the polls indexed"""
+    if db.get_bind().dialect.name == "postgresql":
+        missing = db.query(Poll.id).filter(Poll.search_vector == None)
+    else:
+        missing = db.query(Poll.id).filter(Poll.id.notin_(select(literal_column("rowid")).select_from(text("poll_search_fts"))))
+    indexed = 0
+    while True:
+        poll_ids = [poll_id for poll_id, in missing.order_by(Poll.id).limit(batch_size).all()]
+        if not poll_ids:
+            return indexed
+        index_polls(db, poll_ids)
+        db.commit()
+        indexed += len(poll_ids)
+
+def ranked_matches(db: Session, q: str):
+    """
+    Subquery of (poll_id, rank) for polls matching every term of `q`, higher rank
+    first, or None when `q` has no searchable terms. Terms are passed as plain
+    words (never as tsquery or FTS5 syntax), with the last one prefix-matched.
+    """
+    terms = _terms(q)
+    if not terms:
+        return None
+
+    if db.get_bind().dialect.name == "postgresql":
+        query = func.to_tsquery(
+            SEARCH_CONFIG,
+            " & ".join(terms[:-1] + [terms[-1] + ":*"])
+        )
+        return db.query(
+            Poll.id.label("poll_id"),
+            func.ts_rank_cd(Poll.search_vector, query).label("rank")
+        ).filter(Poll.search_vector.op("@@")(query)).subquery()
+
+    fts_query = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+    return _SQLITE_MATCH.bindparams(query=fts_query.strip()).subquery()
+
+def search_key(q: str, status: str, skip: int, limit: int) -> Optional[Tuple]:
+    terms = _terms(q)
+    return (" ".join(terms), status, skip, limit) if terms else None
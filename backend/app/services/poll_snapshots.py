@@ -0,0 +1,95 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.models import PollResultSnapshot
+from app.utils.poll_details import get_poll_details
+
+# Fields that depend on who is asking; they are looked up per request, never stored
+USER_FIELDS = {"user_liked", "user_voted_option_id"}
+
+SNAPSHOT_MAX_AGE = 365 * 86400  # seconds; snapshots never change
+
+class PollSnapshotStore:
+    """
+    Final result documents of closed polls. A poll's votes and likes can't change
+    once it is inactive, so its snapshot is written once, never invalidated and
+    kept in an in-process LRU on top of the poll_result_snapshots table.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # poll_id -> (document, etag)
+
+    def _remember(self, poll_id: int, snapshot: Tuple[dict, str]):
+        self._entries[poll_id] = snapshot
+        self._entries.move_to_end(poll_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, db: Session, poll_ids: List[int]) -> Dict[int, Tuple[dict, str]]:
+        """(document, etag) of each given poll that has a snapshot"""
+        found = {}
+        missing = []
+        for poll_id in poll_ids:
+            if poll_id in self._entries:
+                self._entries.move_to_end(poll_id)
+                found[poll_id] = self._entries[poll_id]
+            else:
+                missing.append(poll_id)
+
+        if missing:
+            rows = db.query(PollResultSnapshot.poll_id, PollResultSnapshot.document, PollResultSnapshot.etag)\
+                .filter(PollResultSnapshot.poll_id.in_(missing))\
+                .all()
+            for poll_id, document, etag in rows:
+                found[poll_id] = (json.loads(document), etag)
+                self._remember(poll_id, found[poll_id])
+        return found
+
+    def get(self, db: Session, poll_id: int) -> Optional[Tuple[dict, str]]:
+        return self.get_many(db, [poll_id]).get(poll_id)
+
+    def cached(self, poll_id: int) -> Optional[Tuple[dict, str]]:
+        """The snapshot if this process holds it, without a query"""
+        snapshot = self._entries.get(poll_id)
+        if snapshot is not None:
+            self._entries.move_to_end(poll_id)
+        return snapshot
+
+    def freeze(self, db: Session, poll_ids: List[int], commit: bool = True) -> Dict[int, Tuple[dict, str]]:
+        """
+        Compute and store the snapshots of closed polls that don't have one yet;
+        active or unknown polls are skipped. Commits, unless `commit` is False:
+        then the snapshots are only flushed into the caller's transaction.
+        """
+        snapshots = self.get_many(db, poll_ids)
+        for poll_id in poll_ids:
+            if poll_id in snapshots:
+                continue
+            poll = get_poll_details(db, poll_id)
+            if poll is None or poll.is_active:
+                continue
+            document = poll.model_dump(mode="json", exclude=USER_FIELDS)
+            encoded = json.dumps(document, sort_keys=True)
+            etag = hashlib.sha256(encoded.encode()).hexdigest()[:32]
+            db.add(PollResultSnapshot(poll_id=poll_id, etag=etag, document=encoded))
+            snapshots[poll_id] = (document, etag)
+
+        if not commit:
+            db.flush()
+            return snapshots
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker froze the same poll first; both documents are identical
+            db.rollback()
+        for poll_id, snapshot in snapshots.items():
+            self._remember(poll_id, snapshot)
+        return snapshots
+
+poll_snapshots = PollSnapshotStore()
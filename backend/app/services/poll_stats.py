@@ -0,0 +1,253 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import Poll, PollLike, PollOption, Vote, VoteSwitch
+
+Z_95 = 1.959963984540054  # two-sided 95% normal quantile
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+
+GLOBAL_KEY = 0  # cache key of the cross-poll stats
+
+MAX_TOP_POLLS = 100  # top polls kept in the cached cross-poll stats; requests get a slice
+
+class PollStatsCache:
+    """
+    LRU cache of computed stats, keyed by (poll_id, resolution). Writes to a poll
+    drop its entries, so reads never see stale counts from this process's writes;
+    every entry also expires after `max_age` seconds, which bounds how long writes
+    made elsewhere (other workers) go unseen. The cross-poll entries scan every
+    vote, so writes don't drop them and they are only recomputed by age.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_age: float = 30):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: OrderedDict = OrderedDict()  # key -> (monotonic time computed, stats)
+
+    def get(self, poll_id: int, resolution: str):
+        key = (poll_id, resolution)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        computed_at, value = entry
+        if time.monotonic() - computed_at >= self.max_age:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, poll_id: int, resolution: str, value: dict):
+        self._entries[(poll_id, resolution)] = (time.monotonic(), value)
+        self._entries.move_to_end((poll_id, resolution))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, poll_id: int):
+        """Drop a poll's entries (GLOBAL_KEY: the cross-poll ones, e.g. after a bulk import)"""
+        for resolution in RESOLUTIONS:
+            self._entries.pop((poll_id, resolution), None)
+
+poll_stats_cache = PollStatsCache(max_age=settings.stats_refresh_seconds)
+
+def _columns(db: Session, stmt, width: int):
+    """
+    Run a query of numeric columns and return it as one (rows, width) float64 array.
+    Goes through the DBAPI cursor directly: building a Row object per vote costs
+    more than the rest of the statistics put together.
+    """
+    import numpy as np
+
+    connection = db.connection()
+    compiled = stmt.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(str(compiled), params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if not rows:
+        return np.empty((0, width), dtype=np.float64)
+    return np.array(rows, dtype=np.float64).reshape(len(rows), width)
+
+def _epoch(column):
+    return cast(func.extract("epoch", column), Float)
+
+def _wilson_interval(counts, total):
+    """Vectorized 95% Wilson score interval for each option's share"""
+    import numpy as np
+
+    if total == 0:
+        zeros = np.zeros(len(counts))
+        return zeros, zeros
+    p = counts / total
+    z2 = Z_95 ** 2
+    denom = 1 + z2 / total
+    center = (p + z2 / (2 * total)) / denom
+    margin = Z_95 * np.sqrt(p * (1 - p) / total + z2 / (4 * total ** 2)) / denom
+    return np.clip(center - margin, 0, 1), np.clip(center + margin, 0, 1)
+
+def _entropy_bits(counts) -> float:
+    import numpy as np
+
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    p = counts[counts > 0] / total
+    return float((p * np.log2(1 / p)).sum())
+
+def _rate_series(timestamps, bucket_seconds: int) -> list:
+    """Votes per time bucket; empty buckets are omitted"""
+    import numpy as np
+
+    if timestamps.size == 0:
+        return []
+    start = np.floor(timestamps.min() / bucket_seconds) * bucket_seconds
+    counts = np.bincount(((timestamps - start) // bucket_seconds).astype(np.int64))
+    return [
+        {
+            "start": datetime.fromtimestamp(start + i * bucket_seconds, tz=timezone.utc),
+            "count": int(counts[i])
+        }
+        for i in np.flatnonzero(counts)
+    ]
+
+def compute_poll_stats(db: Session, poll_id: int, resolution: str = "hour") -> Optional[dict]:
+    """Per-option shares, confidence intervals, switches, entropy and vote rate of one poll"""
+    import numpy as np
+
+    cached = poll_stats_cache.get(poll_id, resolution)
+    if cached is not None:
+        return cached
+
+    if db.query(Poll.id).filter(Poll.id == poll_id).scalar() is None:
+        return None
+
+    options = db.query(PollOption.id, PollOption.text)\
+        .filter(PollOption.poll_id == poll_id)\
+        .order_by(PollOption.id)\
+        .all()
+    option_ids = np.array([option.id for option in options], dtype=np.float64)
+    n_options = len(options)
+
+    votes = _columns(db, select(Vote.option_id, _epoch(Vote.created_at)).where(Vote.poll_id == poll_id), 2)
+    switches = _columns(
+        db,
+        select(VoteSwitch.from_option_id, VoteSwitch.to_option_id).where(VoteSwitch.poll_id == poll_id),
+        2
+    )
+    total_likes = db.query(func.count(PollLike.id)).filter(PollLike.poll_id == poll_id).scalar()
+
+    # Map option ids to positions 0..n-1 so every per-option aggregate is one bincount
+    vote_idx = np.searchsorted(option_ids, votes[:, 0])
+    counts = np.bincount(vote_idx, minlength=n_options)[:n_options]
+    total_votes = int(counts.sum())
+    shares = counts / total_votes if total_votes else np.zeros(n_options)
+    ci_low, ci_high = _wilson_interval(counts, total_votes)
+    switched_out = np.bincount(np.searchsorted(option_ids, switches[:, 0]), minlength=n_options)[:n_options]
+    switched_in = np.bincount(np.searchsorted(option_ids, switches[:, 1]), minlength=n_options)[:n_options]
+
+    entropy = _entropy_bits(counts)
+    stats = {
+        "poll_id": poll_id,
+        "total_votes": total_votes,
+        "total_likes": total_likes,
+        "total_switches": int(len(switches)),
+        "entropy_bits": entropy,
+        "normalized_entropy": entropy / np.log2(n_options) if n_options > 1 else 0.0,
+        "resolution": resolution,
+        "vote_rate": _rate_series(votes[:, 1], RESOLUTIONS[resolution]),
+        "option_stats": [
+            {
+                "option_id": option.id,
+                "text": option.text,
+                "vote_count": int(counts[i]),
+                "share": float(shares[i]),
+                "percentage": int(shares[i] * 100),
+                "ci_low": float(ci_low[i]),
+                "ci_high": float(ci_high[i]),
+                "switched_in": int(switched_in[i]),
+                "switched_out": int(switched_out[i]),
+            }
+            for i, option in enumerate(options)
+        ]
+    }
+    poll_stats_cache.set(poll_id, resolution, stats)
+    return stats
+
+def compute_global_stats(db: Session, resolution: str = "hour", top: int = 10) -> dict:
+    """Cross-poll totals, vote distribution, per-poll entropy and overall vote rate"""
+    stats = poll_stats_cache.get(GLOBAL_KEY, resolution)
+    if stats is None:
+        stats = _global_stats(db, resolution)
+        poll_stats_cache.set(GLOBAL_KEY, resolution, stats)
+    return {**stats, "top_polls": stats["top_polls"][:top]}
+
+def _global_stats(db: Session, resolution: str) -> dict:
+    """The cross-poll stats with the MAX_TOP_POLLS top polls"""
+    import numpy as np
+
+    polls = db.query(Poll.id, Poll.title).order_by(Poll.id).all()
+    poll_ids = np.array([poll.id for poll in polls], dtype=np.float64)
+    n_polls = len(polls)
+
+    options = _columns(db, select(PollOption.id, PollOption.poll_id).order_by(PollOption.id), 2)
+    votes = _columns(db, select(Vote.option_id, _epoch(Vote.created_at)), 2)
+    likes = _columns(db, select(PollLike.poll_id), 1)
+    total_switches = db.query(func.count(VoteSwitch.id)).scalar()
+
+    # votes -> option position -> poll position, all through sorted-id lookups
+    option_counts = np.bincount(np.searchsorted(options[:, 0], votes[:, 0]), minlength=len(options))[:len(options)]
+    option_poll_idx = np.searchsorted(poll_ids, options[:, 1])
+    votes_per_poll = np.bincount(option_poll_idx, weights=option_counts, minlength=n_polls)[:n_polls]
+    likes_per_poll = np.bincount(np.searchsorted(poll_ids, likes[:, 0]), minlength=n_polls)[:n_polls]
+
+    # Entropy per poll: sum of -p*log2(p) over each poll's options
+    poll_totals = votes_per_poll[option_poll_idx]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.where(poll_totals > 0, option_counts / poll_totals, 0)
+        contributions = np.where(p > 0, -p * np.log2(p), 0)
+    entropy_per_poll = np.bincount(option_poll_idx, weights=contributions, minlength=n_polls)[:n_polls]
+
+    voted = votes_per_poll > 0
+    top_idx = np.argsort(-votes_per_poll, kind="stable")[:MAX_TOP_POLLS]
+    percentiles = np.percentile(votes_per_poll, [50, 90, 99]) if n_polls else [0, 0, 0]
+
+    stats = {
+        "total_polls": n_polls,
+        "total_votes": int(votes_per_poll.sum()),
+        "total_likes": int(likes_per_poll.sum()),
+        "total_switches": total_switches,
+        "votes_per_poll": {
+            "mean": float(votes_per_poll.mean()) if n_polls else 0.0,
+            "p50": float(percentiles[0]),
+            "p90": float(percentiles[1]),
+            "p99": float(percentiles[2]),
+            "max": int(votes_per_poll.max()) if n_polls else 0,
+        },
+        "mean_entropy_bits": float(entropy_per_poll[voted].mean()) if voted.any() else 0.0,
+        "resolution": resolution,
+        "vote_rate": _rate_series(votes[:, 1], RESOLUTIONS[resolution]),
+        "top_polls": [
+            {
+                "poll_id": polls[i].id,
+                "title": polls[i].title,
+                "total_votes": int(votes_per_poll[i]),
+                "total_likes": int(likes_per_poll[i]),
+                "entropy_bits": float(entropy_per_poll[i]),
+            }
+            for i in top_idx if votes_per_poll[i] > 0
+        ]
+    }
+    return stats
@@ -0,0 +1,160 @@
+import asyncio
+import cProfile
+import io
+import linecache
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class CPUProfiler:
+    """
+    On-demand CPU profiles of the running process. Nothing is installed between
+    profiles, so there is no overhead while idle; only one profile runs at a time.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    def _acquire(self):
+        if self._lock.locked():
+            raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async def sample(self, seconds: float, interval: float) -> str:
+        """
+        Sample the stacks of every thread (the event loop included) every `interval`
+        seconds from a helper thread. Returns collapsed stacks, one `frame;frame;... count`
+        line per distinct stack, the format flame graph tools read.
+        """
+        self._acquire()
+        async with self._lock:
+            stacks: Counter = Counter()
+            done = threading.Event()
+            sampler_id: List[int] = []
+
+            def run():
+                sampler_id.append(threading.get_ident())
+                deadline = time.monotonic() + seconds
+                while not done.is_set() and time.monotonic() < deadline:
+                    for thread_id, frame in sys._current_frames().items():
+                        if thread_id in sampler_id:
+                            continue
+                        labels = []
+                        while frame is not None:
+                            labels.append(_frame_label(frame))
+                            frame = frame.f_back
+                        stacks[";".join(reversed(labels))] += 1
+                    time.sleep(interval)
+
+            sampler = threading.Thread(target=run, name="cpu-profiler", daemon=True)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                done.set()
+                sampler.join()  # at most one interval
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    async def trace(self, seconds: float, sort: str, limit: int) -> str:
+        """
+        Run cProfile on the event loop thread for `seconds`, covering every request
+        and background task the loop runs meanwhile. Returns the pstats report.
+        """
+        self._acquire()
+        async with self._lock:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+            return out.getvalue()
+
+class MemoryProfiler:
+    """
+    tracemalloc snapshots and diffs. Tracing is off (and free) until start(), and
+    stops by itself after `seconds` so a forgotten session doesn't slow the process
+    for good; each snapshot() is compared with the previous one to show what grew.
+    """
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stops_at = 0.0
+
+    def start(self, frames: int, seconds: float) -> dict:
+        if tracemalloc.is_tracing():
+            raise HTTPException(status_code=409, detail="Memory tracing is already running")
+        tracemalloc.start(frames)
+        self._previous = None
+        self._stops_at = time.monotonic() + seconds
+        self._timer = asyncio.get_running_loop().call_later(seconds, self._expire)
+        return self.status()
+
+    def _expire(self):
+        self._timer = None
+        self.stop()
+        print("🧠 Memory tracing stopped after its time limit")
+
+    def stop(self) -> dict:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        tracemalloc.stop()
+        self._previous = None
+        return self.status()
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        tracing = tracemalloc.is_tracing()
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "stops_in_seconds": round(max(0.0, self._stops_at - time.monotonic()), 1) if tracing else 0,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+        }
+
+    @staticmethod
+    def _stat(stat, group_by: str) -> dict:
+        frames = [
+            {"file": frame.filename, "line": frame.lineno, "code": linecache.getline(frame.filename, frame.lineno).strip()}
+            for frame in stat.traceback
+        ]
+        entry = {"size_bytes": stat.size, "count": stat.count, "frames": frames if group_by == "traceback" else frames[:1]}
+        if hasattr(stat, "size_diff"):
+            entry["size_diff_bytes"] = stat.size_diff
+            entry["count_diff"] = stat.count_diff
+        return entry
+
+    def snapshot(self, group_by: str, top: int) -> Dict[str, object]:
+        """The largest allocation sites, and the biggest changes since the previous snapshot"""
+        if not tracemalloc.is_tracing():
+            raise HTTPException(status_code=409, detail="Memory tracing is not running")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        result: Dict[str, object] = self.status()
+        result["top"] = [self._stat(stat, group_by) for stat in snapshot.statistics(group_by)[:top]]
+        if self._previous is not None:
+            result["diff"] = [self._stat(stat, group_by) for stat in snapshot.compare_to(self._previous, group_by)[:top]]
+        self._previous = snapshot
+        return result
+
+cpu_profiler = CPUProfiler()
+memory_profiler = MemoryProfiler()
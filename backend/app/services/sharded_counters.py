@@ -0,0 +1,267 @@
+import asyncio
+import random
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, Optional, Set
+
+from sqlalchemy import func, update, delete
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.models import Poll, PollCounterShard, ShardedPoll, Vote
+from app.utils.upsert import upsert_counts
+
+SHARD_KEYS = ["poll_id", "option_id", "shard"]
+
+class ShardedCounterService:
+    """
+    Per-option vote counters split across N shard rows.
+
+    Writers add to a random shard so concurrent votes on the same option rarely
+    touch the same row; readers sum the shards. A background compactor folds the
+    shards back into shard 0 so reads stay cheap.
+
+    Only booster polls and polls detected as hot are sharded. Which polls are
+    sharded lives in the sharded_polls table, so every worker maintains and
+    trusts the same shards: writers of sharded polls read it under a shared lock
+    on the poll row, and a poll is seeded from the votes table (or dropped) under
+    an exclusive one. Votes on other polls check the table without any lock; one
+    that raced a seed is caught by reseeding every newly sharded poll once, after
+    every write that may have missed the seed has committed.
+    """
+
+    def __init__(self, num_shards: int = None, hot_threshold: int = None, compaction_interval: int = None):
+        self.running = False
+        self.num_shards = max(1, num_shards or settings.counter_shards)
+        self.hot_threshold = hot_threshold or settings.hot_poll_votes_per_minute
+        self.compaction_interval = compaction_interval or settings.counter_compaction_interval
+        self.seeded_poll_ids: Set[int] = set()  # polls this process saw sharded; only picks the lock mode
+        self.hot_poll_ids: Set[int] = set()
+        self._recent_writes: Dict[int, Deque[float]] = defaultdict(deque)
+        # Polls seeded up to this time have been reseeded (by this or the seeding worker)
+        self._reseeded_until = datetime.now(timezone.utc) - timedelta(seconds=2 * self.compaction_interval)
+
+    def _recent_write_count(self, poll_id: int) -> int:
+        """Number of writes seen for the poll in the last minute"""
+        now = time.monotonic()
+        writes = self._recent_writes[poll_id]
+        while writes and now - writes[0] > 60:
+            writes.popleft()
+        return len(writes)
+
+    def _note_write(self, poll_id: int, count: int = 1):
+        """Record writes for hot-poll detection"""
+        self._recent_writes[poll_id].extend([time.monotonic()] * count)
+        if self._recent_write_count(poll_id) >= self.hot_threshold:
+            self.hot_poll_ids.add(poll_id)
+
+    def is_sharded(self, poll: Poll) -> bool:
+        """Whether the poll should be sharded; whether it is, is up to sharded_polls"""
+        return bool(poll.booster) or poll.id in self.hot_poll_ids
+
+    @staticmethod
+    def _lock_poll(db: Session, poll_id: int, exclusive: bool) -> bool:
+        """Lock the poll row (shared or exclusive) until the caller commits; returns whether it is sharded"""
+        return db.query(ShardedPoll.poll_id)\
+            .select_from(Poll)\
+            .outerjoin(ShardedPoll, ShardedPoll.poll_id == Poll.id)\
+            .filter(Poll.id == poll_id)\
+            .with_for_update(read=not exclusive, of=Poll)\
+            .scalar() is not None
+
+    @staticmethod
+    def _registered(db: Session, poll_id: int) -> bool:
+        """Whether the poll is in sharded_polls, read without locking anything"""
+        return db.query(ShardedPoll.poll_id).filter(ShardedPoll.poll_id == poll_id).scalar() is not None
+
+    def _seed(self, db: Session, poll_id: int):
+        """Reset the poll's shards to the committed vote counts; the poll row must be locked exclusively"""
+        db.execute(
+            update(PollCounterShard)
+            .where(PollCounterShard.poll_id == poll_id)
+            .values(count=0)
+        )
+        counts = db.query(Vote.option_id, func.count(Vote.id))\
+            .filter(Vote.poll_id == poll_id)\
+            .group_by(Vote.option_id)\
+            .all()
+        if counts:
+            upsert_counts(db, PollCounterShard, [
+                {"poll_id": poll_id, "option_id": option_id, "shard": 0, "count": count}
+                for option_id, count in counts
+            ], SHARD_KEYS, replace=True)
+        db.flush()
+
+    def _prepare(self, db: Session, poll: Poll) -> bool:
+        """
+        Whether this write must update the poll's shards, seeding them first if the
+        poll just became sharded. Polls that are neither sharded nor about to be
+        take no lock; the exclusive lock is only taken for a seed, never upgrading
+        a shared one (two upgraders would deadlock).
+        """
+        wanted = self.is_sharded(poll)
+        if not wanted and not self._registered(db, poll.id):
+            # The common case, a plain poll: no lock round trip
+            self.seeded_poll_ids.discard(poll.id)
+            return False
+        if wanted and poll.id not in self.seeded_poll_ids:
+            if not self._lock_poll(db, poll.id, exclusive=True):
+                self._seed(db, poll.id)
+                db.add(ShardedPoll(poll_id=poll.id))
+                db.flush()
+            self.seeded_poll_ids.add(poll.id)
+            return True
+        sharded = self._lock_poll(db, poll.id, exclusive=False)
+        if not sharded:
+            self.seeded_poll_ids.discard(poll.id)  # cooled down elsewhere; the next write reseeds
+        return sharded
+
+    def record_vote(self, db: Session, poll: Poll, old_option_id: Optional[int], new_option_id: Optional[int]):
+        """
+        Apply a vote change to the poll's sharded counters inside the caller's transaction.
+        Must be called before the vote change itself is flushed, so a first-time seed
+        counts the committed votes only. No-op for polls that are not sharded.
+        """
+        self._note_write(poll.id)
+
+        if old_option_id == new_option_id or not self._prepare(db, poll):
+            return
+
+        shard = random.randrange(self.num_shards)
+        rows = []
+        if old_option_id is not None:
+            rows.append({"poll_id": poll.id, "option_id": old_option_id, "shard": shard, "count": -1})
+        if new_option_id is not None:
+            rows.append({"poll_id": poll.id, "option_id": new_option_id, "shard": shard, "count": 1})
+        upsert_counts(db, PollCounterShard, rows, SHARD_KEYS)
+
+    def record_votes(self, db: Session, poll: Poll, option_deltas: Dict[int, int]):
+        """Batch variant of record_vote for callers that aggregate deltas per option"""
+        self._note_write(poll.id, sum(abs(delta) for delta in option_deltas.values()))
+
+        deltas = {option_id: delta for option_id, delta in option_deltas.items() if delta}
+        if not deltas or not self._prepare(db, poll):
+            return
+
+        shard = random.randrange(self.num_shards)
+        upsert_counts(db, PollCounterShard, [
+            {"poll_id": poll.id, "option_id": option_id, "shard": shard, "count": delta}
+            for option_id, delta in deltas.items()
+        ], SHARD_KEYS)
+
+    def counts(self, db: Session, poll_id: int) -> Optional[Dict[int, int]]:
+        """Per-option vote counts summed across shards, or None if the poll is not sharded"""
+        rows = db.query(ShardedPoll.poll_id, PollCounterShard.option_id, func.sum(PollCounterShard.count))\
+            .outerjoin(PollCounterShard, PollCounterShard.poll_id == ShardedPoll.poll_id)\
+            .filter(ShardedPoll.poll_id == poll_id)\
+            .group_by(ShardedPoll.poll_id, PollCounterShard.option_id)\
+            .all()
+        if not rows:
+            return None
+        return {option_id: int(total or 0) for _, option_id, total in rows if option_id is not None}
+
+    def forget(self, poll_id: int):
+        """Drop this process's bookkeeping for a poll (the compactor unshards it in the database)"""
+        self.seeded_poll_ids.discard(poll_id)
+        self.hot_poll_ids.discard(poll_id)
+        self._recent_writes.pop(poll_id, None)
+
+    def compact(self, db: Session, poll_id: int):
+        """
+        Fold all shards of a poll into shard 0. Only the sharded_polls row is locked
+        (skipped when another worker is compacting the poll); each shard is
+        decremented by what was read from it, so concurrent increments survive.
+        """
+        claimed = db.query(ShardedPoll.poll_id)\
+            .filter(ShardedPoll.poll_id == poll_id)\
+            .with_for_update(skip_locked=True)\
+            .scalar()
+        if claimed is None:
+            db.rollback()
+            return
+
+        shards = db.query(PollCounterShard.id, PollCounterShard.option_id, PollCounterShard.count)\
+            .filter(PollCounterShard.poll_id == poll_id, PollCounterShard.shard != 0, PollCounterShard.count != 0)\
+            .all()
+        if not shards:
+            db.rollback()
+            return
+
+        totals = defaultdict(int)
+        for shard_id, option_id, count in shards:
+            totals[option_id] += count
+            db.execute(
+                update(PollCounterShard)
+                .where(PollCounterShard.id == shard_id)
+                .values(count=PollCounterShard.count - count)
+            )
+        upsert_counts(db, PollCounterShard, [
+            {"poll_id": poll_id, "option_id": option_id, "shard": 0, "count": total}
+            for option_id, total in totals.items()
+        ], SHARD_KEYS)
+        db.commit()
+
+    def _cool_down(self, db: Session):
+        """Unshard polls that closed, or that are neither boosters nor hot across all workers any more"""
+        since = datetime.now(timezone.utc) - timedelta(minutes=1)
+        recent = db.query(func.count(Vote.id))\
+            .filter(Vote.poll_id == Poll.id, Vote.created_at >= since)\
+            .correlate(Poll)\
+            .scalar_subquery()
+        cold = db.query(ShardedPoll.poll_id)\
+            .join(Poll, Poll.id == ShardedPoll.poll_id)\
+            .filter((Poll.is_active == False) | ((Poll.booster != True) & (recent < self.hot_threshold // 2)))\
+            .all()
+        for poll_id, in cold:
+            self._lock_poll(db, poll_id, exclusive=True)
+            db.execute(delete(ShardedPoll).where(ShardedPoll.poll_id == poll_id))
+            db.execute(delete(PollCounterShard).where(PollCounterShard.poll_id == poll_id))
+            db.commit()
+            self.forget(poll_id)
+
+    def _reseed_new(self, db: Session):
+        """
+        Reseed the polls sharded since the last pass, once they have been sharded for
+        a whole compaction interval: by then every vote that checked sharded_polls
+        (unlocked) before the seed committed has committed too, and is counted.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.compaction_interval)
+        new = db.query(ShardedPoll.poll_id)\
+            .filter(ShardedPoll.seeded_at > self._reseeded_until, ShardedPoll.seeded_at <= cutoff)\
+            .all()
+        for poll_id, in new:
+            if self._lock_poll(db, poll_id, exclusive=True):
+                # Keeps compact() (which locks this row) from folding shards mid-seed
+                db.query(ShardedPoll.poll_id).filter(ShardedPoll.poll_id == poll_id).with_for_update().scalar()
+                self._seed(db, poll_id)
+            db.commit()
+        self._reseeded_until = cutoff
+
+    async def start(self):
+        """Start the background compactor"""
+        self.running = True
+        asyncio.create_task(self._compact_periodically())
+
+    def stop(self):
+        """Stop the background compactor"""
+        self.running = False
+
+    async def _compact_periodically(self):
+        """Fold shards of every sharded poll every `compaction_interval` seconds"""
+        while self.running:
+            await asyncio.sleep(self.compaction_interval)
+            db = SessionLocal()
+            try:
+                self._cool_down(db)
+                self._reseed_new(db)
+                for poll_id, in db.query(ShardedPoll.poll_id).all():
+                    self.compact(db, poll_id)
+            except Exception as e:
+                print(f"❌ Error compacting sharded counters: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+sharded_counters = ShardedCounterService()
@@ -0,0 +1,375 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.models import Poll, PollLike, PollOption, Vote
+from app.services.sharded_counters import sharded_counters
+
+MAGIC = 0x51504F4C4C544C59  # "QPOLLTLY"
+VERSION = 2
+HEADER = 5  # magic, version, slots, max options, generation
+BUCKETS = 1024  # load-race guards, see counts()
+MAX_PROBE = 32
+
+Tally = Tuple[Dict[int, int], int]  # (votes per option id, total likes)
+
+class SharedTallies:
+    """
+    Vote counts per option and like totals of active polls, kept in a host-local
+    `multiprocessing.shared_memory` segment shared by every worker process, so
+    any worker reads current counts without a database round trip.
+
+    The segment is a fixed set of int64 arrays: an open-addressing poll_id ->
+    slot map, and per slot the option ids, their counts, the like total and a
+    sequence number. Writers (the worker that committed the vote or like) update
+    a slot under an flock on a lock file; readers retry on a changed sequence
+    number instead of locking.
+
+    Only writes made through commit() are counted, so enable it only when every
+    writer to the database runs on this host. Anything else (seeds, restores,
+    migrations, a worker killed mid-commit) is repaired by a verifier that one
+    worker runs, comparing slots with the database a batch at a time; a new
+    TALLY_GENERATION clears the segment on the next attach.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.running = False
+        self._shm = None
+        self._lock_file = None
+        self._verifier_file = None  # exclusively locked by the worker that verifies
+        self._verify_cursor = 0
+        self._pending_seen: Dict[int, int] = {}  # bucket -> epoch when last seen pending
+        self._thread_lock = threading.Lock()
+
+    @staticmethod
+    def _generation() -> int:
+        digest = hashlib.blake2b(settings.tally_generation.encode(), digest_size=7).digest()
+        return int.from_bytes(digest, "little")
+
+    def attach(self) -> bool:
+        """Open (or create) the segment named by TALLY_SHM_NAME; returns whether tallies are enabled"""
+        if not settings.tally_shm_name or self.enabled:
+            return self.enabled
+        try:
+            import fcntl  # noqa: F401  (POSIX only)
+            from multiprocessing import resource_tracker, shared_memory
+        except ImportError:
+            print("⚠️  Shared tallies need POSIX file locks; disabled")
+            return False
+        import numpy as np
+
+        slots, width, generation = settings.tally_slots, settings.tally_max_options, self._generation()
+        size = 8 * (HEADER + 2 * BUCKETS + slots * (3 + 2 * width))
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{settings.tally_shm_name}.lock"), "a+")
+        with self._locked():
+            try:
+                self._shm = shared_memory.SharedMemory(name=settings.tally_shm_name)
+            except FileNotFoundError:
+                self._shm = shared_memory.SharedMemory(name=settings.tally_shm_name, create=True, size=size)
+                np.ndarray((HEADER,), np.int64, self._shm.buf)[:] = (MAGIC, VERSION, slots, width, generation)
+        # The segment outlives any single worker; don't let this process unlink it on exit
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+
+        header = np.ndarray((HEADER,), np.int64, self._shm.buf)
+        if tuple(header[:4].tolist()) != (MAGIC, VERSION, slots, width) or self._shm.size < size:
+            print(f"⚠️  Shared tally segment {settings.tally_shm_name} has another layout; disabled")
+            self.close()
+            return False
+        with self._locked():
+            if header[4] != generation:
+                # Left by another deployment, whose writes may not all have gone through commit()
+                np.ndarray((size // 8 - HEADER,), np.int64, self._shm.buf, 8 * HEADER)[:] = 0
+                header[4] = generation
+                print(f"🧮 Shared tally segment {settings.tally_shm_name} reset for a new generation")
+
+        offset = 8 * HEADER
+        def array(shape):
+            nonlocal offset
+            view = np.ndarray(shape, np.int64, self._shm.buf, offset)
+            offset += view.nbytes
+            return view
+
+        self._epochs = array((BUCKETS,))  # bumped by every write to a poll of the bucket
+        self._pending = array((BUCKETS,))  # writes of the bucket between begin and apply
+        self._keys = array((slots,))  # poll id; 0 empty, -1 removed
+        self._seqs = array((slots,))  # odd while the slot is being written
+        self._likes = array((slots,))
+        self._option_ids = array((slots, width))  # 0 for unused columns
+        self._counts = array((slots, width))
+        self.slots, self.width = slots, width
+        self.enabled = True
+        print(f"🧮 Shared tallies attached ({settings.tally_shm_name}, {slots} polls)")
+        return True
+
+    def close(self):
+        self.enabled = False
+        self.running = False
+        if self._verifier_file is not None:
+            self._verifier_file.close()
+            self._verifier_file = None
+        for name in ("_epochs", "_pending", "_keys", "_seqs", "_likes", "_option_ids", "_counts"):
+            self.__dict__.pop(name, None)
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    @contextmanager
+    def _locked(self):
+        import fcntl
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _probe(self, poll_id: int):
+        start = (poll_id * 2654435761) % self.slots
+        for i in range(MAX_PROBE):
+            yield (start + i) % self.slots
+
+    def _find(self, poll_id: int) -> Optional[int]:
+        for slot in self._probe(poll_id):
+            key = self._keys[slot]
+            if key == poll_id:
+                return slot
+            if key == 0:
+                return None
+        return None
+
+    def _read(self, slot: int, poll_id: int) -> Optional[Tally]:
+        for _ in range(3):
+            seq = int(self._seqs[slot])
+            if seq & 1:
+                continue
+            if self._keys[slot] != poll_id:
+                return None
+            option_ids = self._option_ids[slot].tolist()
+            counts = self._counts[slot].tolist()
+            likes = int(self._likes[slot])
+            if int(self._seqs[slot]) == seq:
+                return {option_id: count for option_id, count in zip(option_ids, counts) if option_id}, likes
+        return None
+
+    @staticmethod
+    def _load(poll_id: int) -> Optional[Tally]:
+        """Counts from the primary (never a replica, whose lag would be cached for good)"""
+        db = SessionLocal()
+        try:
+            # Closed polls are final and served from their snapshots; only active ones are tracked
+            option_ids = [
+                option_id for option_id, in db.query(PollOption.id)
+                    .join(Poll, Poll.id == PollOption.poll_id)
+                    .filter(PollOption.poll_id == poll_id, Poll.is_active == True)
+            ]
+            if not option_ids:
+                return None
+            votes = sharded_counters.counts(db, poll_id)
+            if votes is None:
+                votes = dict(
+                    db.query(Vote.option_id, func.count(Vote.id))
+                        .filter(Vote.poll_id == poll_id)
+                        .group_by(Vote.option_id)
+                        .all()
+                )
+            likes = db.query(func.count(PollLike.id)).filter(PollLike.poll_id == poll_id).scalar()
+            return {option_id: votes.get(option_id, 0) for option_id in option_ids}, likes
+        finally:
+            db.close()
+
+    def _install(self, poll_id: int, tally: Tally):
+        votes, likes = tally
+        if self._find(poll_id) is not None or len(votes) > self.width:
+            return
+        for slot in self._probe(poll_id):
+            if self._keys[slot] <= 0:
+                option_ids = list(votes) + [0] * (self.width - len(votes))
+                counts = list(votes.values()) + [0] * (self.width - len(votes))
+                self._seqs[slot] += 1
+                self._option_ids[slot] = option_ids
+                self._counts[slot] = counts
+                self._likes[slot] = likes
+                self._keys[slot] = poll_id
+                self._seqs[slot] += 1
+                return
+        # Probe window full: this poll is read from the database
+
+    def _drop(self, slot: int):
+        self._seqs[slot] += 1
+        self._keys[slot] = -1
+        self._seqs[slot] += 1
+
+    def _apply(self, poll_id: int, votes: Dict[int, int], likes: int):
+        slot = self._find(poll_id)
+        if slot is None:
+            return
+        self._seqs[slot] += 1
+        row = self._option_ids[slot].tolist()
+        for option_id, delta in votes.items():
+            if option_id not in row:
+                self._keys[slot] = -1  # unknown option: drop the slot, it reloads on the next read
+                break
+            self._counts[slot, row.index(option_id)] += delta
+        self._likes[slot] += likes
+        self._seqs[slot] += 1
+
+    def counts(self, poll_id: int) -> Optional[Tally]:
+        """
+        Current (votes per option, likes) of a poll, or None when tallies are off
+        or the poll can't be tracked (callers then count in the database).
+
+        A miss loads the poll from the database. The load is only kept if no write
+        to a poll of the same bucket started or was in flight meanwhile, so a
+        count read before a concurrent commit never overwrites its increment.
+        """
+        if not self.enabled:
+            return None
+        slot = self._find(poll_id)
+        if slot is not None:
+            return self._read(slot, poll_id)
+
+        bucket = poll_id % BUCKETS
+        with self._locked():
+            epoch = int(self._epochs[bucket])
+            quiet = self._pending[bucket] == 0
+        tally = self._load(poll_id)
+        if tally is not None and quiet:
+            with self._locked():
+                if self._epochs[bucket] == epoch and self._pending[bucket] == 0:
+                    self._install(poll_id, tally)
+        return tally
+
+    def commit(self, db: Session, poll_id: int, votes: Optional[Dict[int, int]] = None, likes: int = 0):
+        """db.commit(), then add the vote deltas (option id -> change) and like delta to the poll's tally"""
+        if not self.enabled:
+            db.commit()
+            return
+
+        bucket = poll_id % BUCKETS
+        with self._locked():
+            self._epochs[bucket] += 1
+            self._pending[bucket] += 1
+        committed = False
+        try:
+            db.commit()
+            committed = True
+        finally:
+            with self._locked():
+                if committed:
+                    self._apply(poll_id, {option_id: delta for option_id, delta in (votes or {}).items() if delta}, likes)
+                if self._pending[bucket] > 0:  # the verifier may have recovered it meanwhile
+                    self._pending[bucket] -= 1
+
+    def forget(self, poll_id: int):
+        """Drop a poll's tally (deleted, closed or archived polls)"""
+        if not self.enabled:
+            return
+        with self._locked():
+            self._epochs[poll_id % BUCKETS] += 1
+            slot = self._find(poll_id)
+            if slot is not None:
+                self._drop(slot)
+
+    def _is_verifier(self) -> bool:
+        """Whether this worker verifies the segment; the lock passes on when its holder exits"""
+        import fcntl
+        if self._verifier_file is None:
+            file = open(os.path.join(tempfile.gettempdir(), f"{settings.tally_shm_name}.verifier"), "a+")
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                return False
+            self._verifier_file = file
+        return True
+
+    def _recover_pending(self):
+        """
+        Clear pending counts of buckets that saw no new write for a whole pass: the
+        worker that raised them died mid-commit. Their slots may miss its increment,
+        so they are dropped and reload from the database.
+        """
+        with self._locked():
+            seen, self._pending_seen = self._pending_seen, {}
+            for bucket in self._pending.nonzero()[0].tolist():
+                epoch = int(self._epochs[bucket])
+                if seen.get(bucket) != epoch:
+                    self._pending_seen[bucket] = epoch
+                    continue
+                self._pending[bucket] = 0
+                self._epochs[bucket] += 1
+                for slot in ((self._keys > 0) & (self._keys % BUCKETS == bucket)).nonzero()[0].tolist():
+                    self._drop(slot)
+                print(f"🧮 Recovered stuck shared tally bucket {bucket}")
+
+    def verify(self, batch: int) -> int:
+        """Compare the next `batch` occupied slots with the database and fix those that differ; returns how many"""
+        if not self.enabled:
+            return 0
+        self._recover_pending()
+        occupied = (self._keys > 0).nonzero()[0]
+        later = occupied[occupied >= self._verify_cursor]
+        slots = (later if len(later) else occupied)[:batch].tolist()
+        self._verify_cursor = slots[-1] + 1 if slots else 0
+
+        repaired = 0
+        for slot in slots:
+            poll_id = int(self._keys[slot])
+            if poll_id <= 0:
+                continue
+            bucket = poll_id % BUCKETS
+            with self._locked():
+                epoch = int(self._epochs[bucket])
+                quiet = self._pending[bucket] == 0
+            if not quiet:
+                continue
+            tally = self._load(poll_id)
+            with self._locked():
+                if self._epochs[bucket] != epoch or self._pending[bucket] != 0 or self._keys[slot] != poll_id:
+                    continue  # written meanwhile; the next pass checks again
+                current = self._read(slot, poll_id)
+                if tally is None or current != tally:
+                    self._drop(slot)
+                    if tally is not None:
+                        self._install(poll_id, tally)
+                    repaired += 1
+        return repaired
+
+    async def start(self):
+        """Verify the segment against the database in the background (one worker per host does)"""
+        if not self.enabled:
+            return
+        self.running = True
+        asyncio.create_task(self._verify_periodically())
+
+    def stop(self):
+        self.running = False
+
+    async def _verify_periodically(self):
+        while self.running:
+            await asyncio.sleep(settings.tally_verify_interval)
+            if not self.running or not self.enabled:
+                break
+            if not self._is_verifier():
+                continue
+            try:
+                repaired = await asyncio.to_thread(self.verify, settings.tally_verify_batch)
+                if repaired:
+                    print(f"🧮 Repaired {repaired} shared tally slot(s) that differed from the database")
+            except Exception as e:
+                print(f"❌ Error verifying shared tallies: {e}")
+
+shared_tallies = SharedTallies()
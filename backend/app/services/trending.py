@@ -0,0 +1,190 @@
+import asyncio
+import bisect
+import math
+import time
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.models import Poll
+
+# Scores are exponentially decayed activity, kept as log(sum(w * exp(t / tau))) with
+# t measured from this fixed epoch. Decay then never has to be applied to stored
+# scores: every poll decays at the same rate, so the ordering only changes on writes.
+SCORE_EPOCH = 1_700_000_000
+
+def _logaddexp(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) without overflow"""
+    if a == -math.inf:
+        return b
+    if b == -math.inf:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+class TrendingRanking:
+    """
+    In-memory ranking of active polls by time-decayed votes and likes.
+
+    Each write updates one poll's score in O(1) and repositions it in a sorted
+    list, so the top-N trending polls are a slice rather than a scan. Activity
+    is added to polls.trending_score by a background flush, so every worker's
+    votes end up in the persisted score, which each worker then reloads.
+    """
+
+    def __init__(self):
+        self.running = False
+        self.tau = settings.trending_half_life_seconds / math.log(2)
+        self._scores: Dict[int, float] = {}  # poll_id -> log score (without booster boost)
+        self._boosted: Set[int] = set()
+        self._ranking: List[Tuple[float, int]] = []  # (-ranking key, poll_id), ascending
+        self._pending: Dict[int, float] = {}  # poll_id -> log of the activity not flushed yet
+        self._loaded = False
+
+    def _key(self, poll_id: int) -> float:
+        score = self._scores[poll_id]
+        if poll_id in self._boosted:
+            score += math.log(settings.trending_booster_boost)
+        return score
+
+    def _place(self, poll_id: int, booster: bool, score: float):
+        if poll_id in self._scores:
+            old = (-self._key(poll_id), poll_id)
+            index = bisect.bisect_left(self._ranking, old)
+            if index < len(self._ranking) and self._ranking[index] == old:
+                del self._ranking[index]
+
+        self._scores[poll_id] = score
+        if booster:
+            self._boosted.add(poll_id)
+        else:
+            self._boosted.discard(poll_id)
+        bisect.insort(self._ranking, (-self._key(poll_id), poll_id))
+
+    def ensure_loaded(self, db: Session):
+        """Load persisted scores of active polls once per process"""
+        if not self._loaded:
+            self.reload(db)
+
+    def reload(self, db: Session):
+        """
+        Rebuild the ranking from the persisted scores of the active polls, plus the
+        activity not flushed yet. Picks up what other workers flushed, including
+        polls this worker never saw a write for, and drops polls closed elsewhere.
+        """
+        rows = db.query(Poll.id, Poll.booster, Poll.trending_score)\
+            .filter(Poll.is_active == True)\
+            .all()
+        self._scores = {
+            poll_id: _logaddexp(score if score is not None else -math.inf, self._pending.get(poll_id, -math.inf))
+            for poll_id, _, score in rows
+        }
+        self._boosted = {poll_id for poll_id, booster, _ in rows if booster}
+        self._ranking = sorted((-self._key(poll_id), poll_id) for poll_id in self._scores)
+        self._loaded = True
+
+    def add_poll(self, poll_id: int, booster: bool):
+        """Track a new poll with no activity yet"""
+        if poll_id not in self._scores:
+            self._place(poll_id, booster, -math.inf)
+
+    def record(self, poll_id: int, booster: bool, votes: int = 0, likes: int = 0):
+        """Add activity to a poll's score"""
+        weight = votes * settings.trending_vote_weight + likes * settings.trending_like_weight
+        if weight <= 0:
+            return
+        increment = math.log(weight) + (time.time() - SCORE_EPOCH) / self.tau
+        self._place(poll_id, booster, _logaddexp(self._scores.get(poll_id, -math.inf), increment))
+        self._pending[poll_id] = _logaddexp(self._pending.get(poll_id, -math.inf), increment)
+
+    def remove(self, poll_id: int):
+        """Drop an inactive poll from the ranking"""
+        if poll_id not in self._scores:
+            return
+        entry = (-self._key(poll_id), poll_id)
+        index = bisect.bisect_left(self._ranking, entry)
+        if index < len(self._ranking) and self._ranking[index] == entry:
+            del self._ranking[index]
+        del self._scores[poll_id]
+        self._boosted.discard(poll_id)
+
+    def top(self, db: Session, skip: int = 0, limit: int = 100) -> List[int]:
+        """Poll ids of the page of the trending feed, hottest first"""
+        self.ensure_loaded(db)
+        return [poll_id for _, poll_id in self._ranking[skip:skip + limit]]
+
+    def flush(self, db: Session):
+        """
+        Add the activity recorded since the last flush to the persisted scores.
+        Other workers add theirs to the same rows, so the stored score is read under
+        a row lock and merged rather than overwritten; the merged score then replaces
+        this worker's own, which picks up the other workers' activity.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        merged: Dict[int, float] = {}
+        try:
+            rows = db.query(Poll.id, Poll.trending_score)\
+                .filter(Poll.id.in_(pending))\
+                .order_by(Poll.id)\
+                .with_for_update()\
+                .all()
+            for poll_id, stored in rows:
+                merged[poll_id] = _logaddexp(stored if stored is not None else -math.inf, pending[poll_id])
+            if merged:
+                polls = Poll.__table__
+                db.execute(
+                    update(polls)
+                    .where(polls.c.id == bindparam("poll_id"))
+                    .values(trending_score=bindparam("score")),
+                    [{"poll_id": poll_id, "score": score} for poll_id, score in merged.items()]
+                )
+            db.commit()
+        except Exception:
+            for poll_id, increment in pending.items():
+                self._pending[poll_id] = _logaddexp(self._pending.get(poll_id, -math.inf), increment)
+            raise
+
+        for poll_id, score in merged.items():
+            if poll_id in self._scores:
+                self._place(poll_id, poll_id in self._boosted, score)
+
+    def _flush_now(self, reload: bool = False):
+        db = SessionLocal()
+        try:
+            self.flush(db)
+            if reload:
+                self.reload(db)
+        except Exception as e:
+            print(f"❌ Error persisting trending scores: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    async def start(self):
+        """Load persisted scores and start persisting new ones in the background"""
+        self.running = True
+        db = SessionLocal()
+        try:
+            self.ensure_loaded(db)
+        finally:
+            db.close()
+        asyncio.create_task(self._flush_periodically())
+
+    def stop(self):
+        """Stop the background flush and persist what it hasn't yet"""
+        self.running = False
+        self._flush_now()
+
+    async def _flush_periodically(self):
+        """Persist dirty scores and reload everyone's every `trending_flush_interval` seconds"""
+        while self.running:
+            await asyncio.sleep(settings.trending_flush_interval)
+            if self.running:
+                self._flush_now(reload=True)
+
+trending = TrendingRanking()
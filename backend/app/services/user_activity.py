@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import select, union_all
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.models import ArchivedPollLike, ArchivedVote, PollLike, Vote
+
+class UserActivity:
+    """A user's votes (poll_id -> option_id) and liked poll ids, hot and archived"""
+    __slots__ = ("votes", "likes", "loaded_at")
+
+    def __init__(self, votes: Dict[int, int], likes: Set[int]):
+        self.votes = votes
+        self.likes = likes
+        self.loaded_at = time.monotonic()
+
+    def state(self, poll_id: int) -> Tuple[Optional[int], bool]:
+        return self.votes.get(poll_id), poll_id in self.likes
+
+class UserActivityCache:
+    """
+    LRU cache of the voted/liked state of recently active users, so poll lists
+    merge the caller's flags in Python instead of two subqueries per row. A user
+    is loaded from the primary (a replica's lag would be cached) with two queries
+    on the user_id indexes. The vote and like handlers keep loaded users current
+    in this process; writes handled by other workers show up once the entry is
+    `ttl` seconds old and reloads.
+    """
+
+    def __init__(self, max_users: int = 10000, ttl: float = 5):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._users: OrderedDict = OrderedDict()  # user_id -> UserActivity
+
+    def get(self, user_id: int) -> UserActivity:
+        activity = self._users.get(user_id)
+        if activity is not None and time.monotonic() - activity.loaded_at < self.ttl:
+            self._users.move_to_end(user_id)
+            return activity
+
+        votes = union_all(
+            select(Vote.poll_id, Vote.option_id).where(Vote.user_id == user_id),
+            select(ArchivedVote.poll_id, ArchivedVote.option_id).where(ArchivedVote.user_id == user_id)
+        )
+        likes = union_all(
+            select(PollLike.poll_id).where(PollLike.user_id == user_id),
+            select(ArchivedPollLike.poll_id).where(ArchivedPollLike.user_id == user_id)
+        )
+        db = SessionLocal()
+        try:
+            activity = UserActivity(
+                {poll_id: option_id for poll_id, option_id in db.execute(votes)},
+                set(db.execute(likes).scalars())
+            )
+        finally:
+            db.close()
+
+        self._users[user_id] = activity
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return activity
+
+    # Writes only update users already loaded: others load the committed rows on their next read
+
+    def voted(self, user_id: int, poll_id: int, option_id: Optional[int]):
+        """Record a vote (option_id None: the vote was removed)"""
+        activity = self._users.get(user_id)
+        if activity is None:
+            return
+        if option_id is None:
+            activity.votes.pop(poll_id, None)
+        else:
+            activity.votes[poll_id] = option_id
+
+    def liked(self, user_id: int, poll_id: int, liked: bool = True):
+        activity = self._users.get(user_id)
+        if activity is None:
+            return
+        if liked:
+            activity.likes.add(poll_id)
+        else:
+            activity.likes.discard(poll_id)
+
+    def forget(self, user_id: int):
+        self._users.pop(user_id, None)
+
+user_activity_cache = UserActivityCache(settings.user_activity_cache_size, settings.user_activity_ttl_seconds)
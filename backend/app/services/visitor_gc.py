@@ -0,0 +1,149 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, exists, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.models import User, Poll, Vote, PollLike, ArchivedPoll, ArchivedVote, ArchivedPollLike
+from app.services.user_activity import user_activity_cache
+
+# Rows that reference a user; a user with any of them is never collected
+OWNED_BY = [Poll, Vote, PollLike, ArchivedPoll, ArchivedVote, ArchivedPollLike]
+
+def _is_throwaway():
+    return or_(User.email.like("%@anonymous.local"), User.username.like("demo_user_%"))
+
+def _owns_nothing():
+    return and_(*[~exists().where(model.user_id == User.id) for model in OWNED_BY])
+
+class VisitorGC:
+    """
+    Deletes anonymous visitor (and leftover demo) users that own no polls, votes
+    or likes and haven't been seen for `visitor_idle_days`.
+
+    Activity is recorded in memory by touch() and written to users.last_seen_at
+    in one UPDATE per sweep, at most once per `visitor_touch_minutes` per user.
+    Sweeps walk users by id in small transactions with a pause in between, so
+    they hold few locks for short times.
+    """
+
+    def __init__(self):
+        self.running = False
+        self.protected_ids: Set[int] = set()  # e.g. the running demo generator's user pool
+        self._touched: Dict[int, float] = {}  # user_id -> monotonic time of the last recorded touch
+        self._pending: Set[int] = set()  # touched users whose last_seen_at still has to be written
+
+    def touch(self, user_id: int):
+        """Note that a user was active; cheap enough to call on every request"""
+        now = time.monotonic()
+        last = self._touched.get(user_id)
+        if last is not None and now - last < settings.visitor_touch_minutes * 60:
+            return
+        self._touched[user_id] = now
+        self._pending.add(user_id)
+
+        if len(self._touched) > 100000:
+            horizon = now - settings.visitor_touch_minutes * 60
+            self._touched = {uid: seen for uid, seen in self._touched.items() if seen >= horizon}
+
+    def protect(self, user_ids: Iterable[int]):
+        self.protected_ids.update(user_ids)
+
+    def flush_touches(self, db: Session) -> int:
+        """Write pending last_seen_at updates; returns the users updated"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, set()
+        try:
+            db.execute(
+                update(User.__table__)
+                .where(User.__table__.c.id.in_(pending))
+                .values(last_seen_at=datetime.now(timezone.utc))
+            )
+            db.commit()
+        except Exception:
+            self._pending |= pending
+            raise
+        return len(pending)
+
+    def _sweep_batch(self, db: Session, after_id: int, cutoff: datetime) -> Tuple[Optional[int], List[int]]:
+        """
+        Delete the collectable users among the next batch of ids. Returns the last
+        id scanned (None past the end) and the deleted ids.
+        """
+        ids = [
+            user_id for user_id, in db.query(User.id)
+                .filter(User.id > after_id)
+                .order_by(User.id)
+                .limit(settings.visitor_gc_batch_size)
+        ]
+        if not ids:
+            return None, []
+
+        candidates = [user_id for user_id in ids if user_id not in self.protected_ids and user_id not in self._pending]
+        # The conditions are checked again in the DELETE itself, so a vote or like
+        # arriving between the scan and the delete keeps its user
+        deleted = db.execute(
+            delete(User)
+            .where(
+                User.id.in_(candidates),
+                _is_throwaway(),
+                func.coalesce(User.last_seen_at, User.created_at) < cutoff,
+                _owns_nothing()
+            )
+            .returning(User.id)
+        ).scalars().all() if candidates else []
+        db.commit()
+        return ids[-1], deleted
+
+    async def sweep(self) -> int:
+        """One full pass over users; returns the number deleted"""
+        db = SessionLocal()
+        try:
+            self.flush_touches(db)
+            cutoff = datetime.now(timezone.utc) - timedelta(days=settings.visitor_idle_days)
+            after_id = 0
+            total = 0
+            while self.running:
+                after_id, deleted = self._sweep_batch(db, after_id, cutoff)
+                total += len(deleted)
+                for user_id in deleted:
+                    self._touched.pop(user_id, None)
+                    user_activity_cache.forget(user_id)
+                if after_id is None:
+                    break
+                # Rate limit: leave the database to live traffic between batches
+                await asyncio.sleep(settings.visitor_gc_pause)
+            return total
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def start(self):
+        """Start sweeping in the background"""
+        self.running = True
+        asyncio.create_task(self._sweep_periodically())
+
+    def stop(self):
+        """Stop the sweeper"""
+        self.running = False
+
+    async def _sweep_periodically(self):
+        """Record activity and collect idle visitors every `visitor_gc_interval` seconds"""
+        while self.running:
+            try:
+                deleted = await self.sweep()
+                if deleted:
+                    print(f"🧹 Deleted {deleted} idle visitor user(s)")
+            except Exception as e:
+                print(f"❌ Error collecting visitor users: {e}")
+
+            await asyncio.sleep(settings.visitor_gc_interval)
+
+visitor_gc = VisitorGC()
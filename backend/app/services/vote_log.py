@@ -0,0 +1,492 @@
+import asyncio
+import os
+import struct
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.models import Poll, PollLike, Vote
+
+VOTE_INSERT, VOTE_CHANGE, VOTE_DELETE, LIKE_INSERT, LIKE_DELETE, POLL_CLOSED = range(1, 7)
+
+LOG_MAGIC = 0x474F4C45544F5651  # "QVOTELOG"
+SNAPSHOT_MAGIC = 0x50414E53544F5651  # "QVOTSNAP"
+VERSION = 1
+
+HEADER = struct.Struct("<QIIQQQ")  # magic, version, record size, base seq, record count, rotated
+HEADER_SIZE = 64
+COUNT_OFFSET = 24
+ROTATED_OFFSET = 32
+RECORD = struct.Struct("<B3xIIId")  # kind, poll id, option id, old option id, unix time
+GROW = 65536 * RECORD.size  # the log file grows this much at a time
+
+SNAPSHOT_HEADER = struct.Struct("<QIQQ")  # magic, version, seq covered, polls
+SNAPSHOT_POLL = struct.Struct("<IqI")  # poll id, likes, options
+SNAPSHOT_OPTION = struct.Struct("<Iq")  # option id, votes
+
+Tally = Tuple[Dict[int, int], int]  # (votes per option id, total likes)
+
+class VoteLog:
+    """
+    Append-only, memory-mapped log of vote and like mutations, with periodic
+    snapshots of the per-poll tallies it implies, so a restart loads the latest
+    snapshot and replays only the events after it instead of aggregating the
+    votes and poll_likes tables.
+
+    Records are fixed 24-byte structs appended after each commit. Every worker
+    on the host appends to the same file under an flock and catches its own
+    in-memory tallies up from the file before reading them. One worker at a time
+    (whichever holds the snapshotter lock) writes snapshots; each one rotates the
+    log, and the next file starts at the snapshot's sequence number. A worker
+    that fell behind by more than one rotation reloads the latest snapshot.
+
+    Only writes made through the app are logged. Before each snapshot the
+    snapshotter compares the tallies with the database and logs a correction for
+    polls that differ the same way on two passes in a row, e.g. a write committed
+    by a worker that died before appending its record (a single difference may
+    just be a write between its commit and its append). Delete the snapshot to
+    rebuild the tallies from the database; a rebuild is refused while other
+    workers have the log open, since their in-flight events would be counted twice.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.running = False
+        self._tallies: Dict[int, list] = {}  # poll_id -> [Counter of votes per option id, likes]
+        self._seq = 0  # absolute number of the next record to apply
+        self._file = None
+        self._map = None
+        self._lock_file = None
+        self._lock_depth = 0
+        self._users_file = None  # shared-locked by every worker with the log open
+        self._snapshotter_file = None  # exclusively locked by the worker that snapshots
+        self._thread_lock = threading.RLock()
+        self._suspects: Dict[int, tuple] = {}  # poll_id -> difference from the database seen on the last pass
+
+    def _path(self, name: str) -> str:
+        return os.path.join(settings.vote_log_dir, name)
+
+    @contextmanager
+    def _locked(self):
+        """The log lock; reentrant, since catching up may need it while appending"""
+        import fcntl
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _try_flock(self, file, mode: int) -> bool:
+        import fcntl
+        try:
+            fcntl.flock(file, mode | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def open(self) -> bool:
+        """Load the snapshot and replay the log tail (VOTE_LOG_DIR); returns whether the log is enabled"""
+        if not settings.vote_log_dir or self.enabled:
+            return self.enabled
+        try:
+            import fcntl  # noqa: F401  (POSIX only)
+        except ImportError:
+            print("⚠️  The vote log needs POSIX file locks; disabled")
+            return False
+
+        import fcntl
+
+        started = time.perf_counter()
+        os.makedirs(settings.vote_log_dir, exist_ok=True)
+        self._lock_file = open(self._path("vote_log.lock"), "a+")
+        self._users_file = open(self._path("vote_log.users"), "a+")
+        with self._locked():
+            if self._reload():
+                source = "snapshot"
+            elif self._try_flock(self._users_file, fcntl.LOCK_EX):
+                # First start, or the snapshot and log don't line up: aggregate the tables once
+                self._rebuild()
+                source = "database"
+            else:
+                source = None
+            if source:
+                self.enabled = True
+                replayed = self._catch_up()
+                fcntl.flock(self._users_file, fcntl.LOCK_SH)
+        if source is None:
+            print("⚠️  Vote log snapshot missing while other workers use the log; stop them all to rebuild. Disabled")
+            self.close()
+            return False
+
+        print(
+            f"📜 Vote log: {len(self._tallies)} polls from the {source}, {replayed} events replayed "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return True
+
+    def close(self):
+        self.running = False
+        self.enabled = False
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+        for name in ("_lock_file", "_users_file", "_snapshotter_file"):
+            if getattr(self, name) is not None:
+                getattr(self, name).close()
+                setattr(self, name, None)
+
+    def _open_log(self, base: int):
+        """Map votes.log, creating it (starting at `base`) if missing"""
+        import mmap
+
+        path = self._path("votes.log")
+        if not os.path.exists(path):
+            with open(path + ".tmp", "wb") as f:
+                f.write(HEADER.pack(LOG_MAGIC, VERSION, RECORD.size, base, 0, 0).ljust(HEADER_SIZE, b"\0"))
+                f.truncate(HEADER_SIZE + GROW)
+            os.replace(path + ".tmp", path)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def _remap(self):
+        import mmap
+
+        self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def _reopen(self):
+        """Follow a rotation to the new votes.log (locked, so it is never caught between remove and create)"""
+        with self._locked():
+            self._map.close()
+            self._file.close()
+            self._open_log(base=self._seq)
+
+    def _reload(self) -> bool:
+        """
+        Replace the tallies with the latest snapshot and map the log that starts
+        after it. Returns False (tallies untouched) when they don't line up.
+        """
+        with self._locked():
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+            tallies = self._tallies
+            snapshot_seq = self._load_snapshot()
+            self._open_log(base=snapshot_seq or 0)
+            _, _, _, base, count, _ = HEADER.unpack_from(self._map)
+            if snapshot_seq is None or not base <= snapshot_seq <= base + count:
+                self._tallies = tallies
+                return False
+            self._seq = snapshot_seq
+            return True
+
+    def _apply(self, kind: int, poll_id: int, option_id: int, old_option_id: int):
+        if kind == POLL_CLOSED:
+            self._tallies.pop(poll_id, None)
+            return
+        tally = self._tallies.get(poll_id)
+        if tally is None:
+            tally = self._tallies[poll_id] = [Counter(), 0]
+        if kind == VOTE_INSERT:
+            tally[0][option_id] += 1
+        elif kind == VOTE_CHANGE:
+            tally[0][old_option_id] -= 1
+            tally[0][option_id] += 1
+        elif kind == VOTE_DELETE:
+            tally[0][option_id] -= 1
+        elif kind == LIKE_INSERT:
+            tally[1] += 1
+        elif kind == LIKE_DELETE:
+            tally[1] -= 1
+
+    def _catch_up(self) -> int:
+        """Apply the records appended (by any worker) since the last call; returns how many"""
+        with self._thread_lock:
+            replayed = 0
+            while True:
+                _, _, _, base, count, rotated = HEADER.unpack_from(self._map)
+                if not base <= self._seq <= base + count:
+                    # Rotated more than once since this worker last read: the events in the
+                    # files in between only survive in the snapshot that rotated them away
+                    if not self._reload():
+                        print("❌ Vote log snapshot doesn't match the log; vote log disabled")
+                        self.enabled = False
+                        return replayed
+                    continue
+                end = HEADER_SIZE + count * RECORD.size
+                if end > len(self._map):
+                    self._remap()  # another worker grew the file
+                start = HEADER_SIZE + (self._seq - base) * RECORD.size
+                for kind, poll_id, option_id, old_option_id, _ in RECORD.iter_unpack(self._map[start:end]):
+                    self._apply(kind, poll_id, option_id, old_option_id)
+                replayed += base + count - self._seq
+                self._seq = base + count
+                if not rotated:
+                    return replayed
+                self._reopen()
+
+    def _rebuild(self):
+        """
+        Tallies of active polls from the votes and poll_likes tables, as of the
+        current end of the log. Only called with no other worker using the log.
+        """
+        db = SessionLocal()
+        try:
+            self._tallies = {}
+            votes = db.query(Vote.poll_id, Vote.option_id, func.count(Vote.id))\
+                .join(Poll, Poll.id == Vote.poll_id)\
+                .filter(Poll.is_active == True)\
+                .group_by(Vote.poll_id, Vote.option_id)
+            for poll_id, option_id, count in votes:
+                self._tallies.setdefault(poll_id, [Counter(), 0])[0][option_id] = count
+            likes = db.query(PollLike.poll_id, func.count(PollLike.id))\
+                .join(Poll, Poll.id == PollLike.poll_id)\
+                .filter(Poll.is_active == True)\
+                .group_by(PollLike.poll_id)
+            for poll_id, count in likes:
+                self._tallies.setdefault(poll_id, [Counter(), 0])[1] = count
+        finally:
+            db.close()
+        _, _, _, base, count, _ = HEADER.unpack_from(self._map)
+        self._seq = base + count
+        self._write_snapshot()
+
+    def _load_snapshot(self) -> Optional[int]:
+        """Load tallies.snapshot; returns the sequence number it covers, or None without a usable one"""
+        path = self._path("tallies.snapshot")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < SNAPSHOT_HEADER.size:
+            return None
+        magic, version, seq, polls = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != VERSION:
+            return None
+
+        tallies = {}
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(polls):
+            poll_id, likes, options = SNAPSHOT_POLL.unpack_from(data, offset)
+            offset += SNAPSHOT_POLL.size
+            end = offset + options * SNAPSHOT_OPTION.size
+            tallies[poll_id] = [Counter(dict(SNAPSHOT_OPTION.iter_unpack(data[offset:end]))), likes]
+            offset = end
+        self._tallies = tallies
+        return seq
+
+    def _write_snapshot(self):
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, VERSION, self._seq, len(self._tallies))]
+        for poll_id, (votes, likes) in self._tallies.items():
+            options = [(option_id, count) for option_id, count in votes.items() if count]
+            parts.append(SNAPSHOT_POLL.pack(poll_id, likes, len(options)))
+            parts.extend(SNAPSHOT_OPTION.pack(option_id, count) for option_id, count in options)
+
+        path = self._path("tallies.snapshot")
+        with open(path + ".tmp", "wb") as f:
+            f.write(b"".join(parts))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def snapshot(self) -> bool:
+        """Write a snapshot and start a new log after it; returns False when nothing was logged since the last one"""
+        if not self.enabled:
+            return False
+        with self._locked():
+            self._catch_up()
+            if HEADER.unpack_from(self._map)[4] == 0:
+                return False
+            self._write_snapshot()
+
+            # Rotate: the new file starts where the snapshot ends. Workers still on the
+            # old file finish reading it, see the flag and move to the new one.
+            old_map, old_file = self._map, self._file
+            os.remove(self._path("votes.log"))
+            self._open_log(base=self._seq)
+            struct.pack_into("<Q", old_map, ROTATED_OFFSET, 1)
+            old_map.flush()
+            old_map.close()
+            old_file.close()
+            return True
+
+    def _append(self, records: List[Tuple[int, int, int, int]]):
+        if not self.enabled or not records:
+            return
+        with self._locked():
+            self._catch_up()
+            count = HEADER.unpack_from(self._map)[4]
+            offset = HEADER_SIZE + count * RECORD.size
+            needed = offset + len(records) * RECORD.size
+            if needed > len(self._map):
+                self._file.truncate(-(-needed // GROW) * GROW + HEADER_SIZE)
+                self._remap()
+
+            now = time.time()
+            for kind, poll_id, option_id, old_option_id in records:
+                RECORD.pack_into(self._map, offset, kind, poll_id, option_id, old_option_id, now)
+                offset += RECORD.size
+            # Publish the records only once they are complete
+            struct.pack_into("<Q", self._map, COUNT_OFFSET, count + len(records))
+            self._catch_up()
+
+    def record(self, poll_id: int, votes: Iterable[Tuple[Optional[int], Optional[int]]] = (), likes: int = 0):
+        """Log committed mutations of a poll: (old option, new option) per vote, and likes added (or removed if negative)"""
+        records = []
+        for old_option_id, new_option_id in votes:
+            if old_option_id is None and new_option_id is not None:
+                records.append((VOTE_INSERT, poll_id, new_option_id, 0))
+            elif old_option_id is not None and new_option_id is None:
+                records.append((VOTE_DELETE, poll_id, old_option_id, 0))
+            elif old_option_id != new_option_id:
+                records.append((VOTE_CHANGE, poll_id, new_option_id, old_option_id))
+        records += [(LIKE_INSERT if likes > 0 else LIKE_DELETE, poll_id, 0, 0)] * abs(likes)
+        self._append(records)
+
+    def voted(self, poll_id: int, old_option_id: Optional[int], new_option_id: Optional[int]):
+        self.record(poll_id, [(old_option_id, new_option_id)])
+
+    def liked(self, poll_id: int, liked: bool = True):
+        self.record(poll_id, likes=1 if liked else -1)
+
+    def closed(self, poll_ids: Iterable[int]):
+        """Drop polls that were deleted, expired or archived (their counts are final and snapshotted)"""
+        self._append([(POLL_CLOSED, poll_id, 0, 0) for poll_id in poll_ids])
+
+    def counts(self, poll_id: int) -> Optional[Tally]:
+        """(votes per option id, likes) of a poll with logged activity, or None when unknown or disabled"""
+        if not self.enabled:
+            return None
+        self._catch_up()
+        tally = self._tallies.get(poll_id)
+        if tally is None:
+            return None
+        return dict(tally[0]), tally[1]
+
+    @staticmethod
+    def _load_tallies(db, poll_ids: List[int]) -> Dict[int, Tally]:
+        """Tallies of the active polls among `poll_ids`, from the votes and poll_likes tables"""
+        tallies: Dict[int, Tally] = {
+            poll_id: ({}, 0)
+            for poll_id, in db.query(Poll.id).filter(Poll.id.in_(poll_ids), Poll.is_active == True)
+        }
+        votes = db.query(Vote.poll_id, Vote.option_id, func.count(Vote.id))\
+            .filter(Vote.poll_id.in_(list(tallies)))\
+            .group_by(Vote.poll_id, Vote.option_id)
+        for poll_id, option_id, count in votes:
+            tallies[poll_id][0][option_id] = count
+        likes = db.query(PollLike.poll_id, func.count(PollLike.id))\
+            .filter(PollLike.poll_id.in_(list(tallies)))\
+            .group_by(PollLike.poll_id)
+        for poll_id, count in likes:
+            tallies[poll_id] = (tallies[poll_id][0], count)
+        return tallies
+
+    def reconcile(self, batch_size: int = 1000) -> int:
+        """
+        Compare the logged tallies with the database and log corrections for polls
+        that differed the same way on the previous pass too; returns how many.
+        """
+        if not self.enabled:
+            return 0
+        with self._locked():
+            self._catch_up()
+            logged = {poll_id: (dict(votes), likes) for poll_id, (votes, likes) in self._tallies.items()}
+
+        suspects: Dict[int, tuple] = {}
+        corrections = []
+        poll_ids = list(logged)
+        db = SessionLocal()
+        try:
+            for start in range(0, len(poll_ids), batch_size):
+                chunk = poll_ids[start:start + batch_size]
+                actual = self._load_tallies(db, chunk)
+                for poll_id in chunk:
+                    difference = self._difference(logged[poll_id], actual.get(poll_id))
+                    if not difference:
+                        continue
+                    if self._suspects.get(poll_id) != difference:
+                        suspects[poll_id] = difference
+                        continue
+                    if difference == ("closed",):
+                        corrections.append([(POLL_CLOSED, poll_id, 0, 0)])
+                        continue
+                    votes, likes = difference
+                    corrections.append(
+                        [(VOTE_INSERT if delta > 0 else VOTE_DELETE, poll_id, option_id, 0)
+                         for option_id, delta in votes for _ in range(abs(delta))]
+                        + [(LIKE_INSERT if likes > 0 else LIKE_DELETE, poll_id, 0, 0)] * abs(likes)
+                    )
+        finally:
+            db.close()
+
+        self._suspects = suspects
+        for records in corrections:
+            self._append(records)
+        return len(corrections)
+
+    @staticmethod
+    def _difference(logged: Tally, actual: Optional[Tally]) -> tuple:
+        """What the database has that the log lacks: ("closed",), (option deltas, like delta), or ()"""
+        if actual is None:
+            return ("closed",)
+        votes = tuple(sorted(
+            (option_id, actual[0].get(option_id, 0) - logged[0].get(option_id, 0))
+            for option_id in set(logged[0]) | set(actual[0])
+            if actual[0].get(option_id, 0) != logged[0].get(option_id, 0)
+        ))
+        likes = actual[1] - logged[1]
+        return (votes, likes) if votes or likes else ()
+
+    async def start(self):
+        """Snapshot and rotate the log in the background"""
+        if not self.enabled:
+            return
+        self.running = True
+        asyncio.create_task(self._snapshot_periodically())
+
+    def stop(self):
+        self.running = False
+
+    def _is_snapshotter(self) -> bool:
+        """Whether this worker writes the snapshots; the lock passes on when its holder exits"""
+        import fcntl
+        if self._snapshotter_file is None:
+            file = open(self._path("vote_log.snapshotter"), "a+")
+            if not self._try_flock(file, fcntl.LOCK_EX):
+                file.close()
+                return False
+            self._snapshotter_file = file
+        return True
+
+    async def _snapshot_periodically(self):
+        """Snapshot every `vote_log_snapshot_interval` seconds, keeping replays on startup short"""
+        while self.running:
+            await asyncio.sleep(settings.vote_log_snapshot_interval)
+            if not self.running or not self.enabled:
+                break
+            if not self._is_snapshotter():
+                continue
+            try:
+                repaired = await asyncio.to_thread(self.reconcile)
+                if repaired:
+                    print(f"📜 Corrected the vote log tallies of {repaired} poll(s) that differed from the database")
+                if self.snapshot():
+                    print(f"📜 Vote log snapshot of {len(self._tallies)} polls at event {self._seq}")
+            except Exception as e:
+                print(f"❌ Error writing vote log snapshot: {e}")
+
+vote_log = VoteLog()
@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.models import RollupWatermark, Vote, VoteRollup
+from app.utils.upsert import upsert_counts
+
+WATERMARK_NAME = "votes"
+
+ROLLUP_KEYS = ["poll_id", "bucket", "option_id"]
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Window returned when the caller doesn't pass `since`
+DEFAULT_WINDOWS = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30),
+}
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def floor_bucket(value: datetime, seconds: int) -> datetime:
+    value = _as_utc(value)
+    epoch = int(value.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc)
+
+class VoteRollupJob:
+    """
+    Keeps vote_rollups (new votes per poll, option and minute) current.
+
+    Each pass reads only the votes above a stored id watermark, aggregates them
+    in memory and upserts the minute buckets in the same transaction that moves
+    the watermark, so a pass is idempotent and never rescans history. The
+    watermark row is locked for each batch, so workers running the job at the
+    same time take turns instead of folding the same votes twice.
+
+    Rollups count vote inserts only: a vote is counted once, under the option it
+    had when rolled up, and later option switches or deletions don't change the
+    buckets (switches are in vote_switches).
+    """
+
+    def __init__(self):
+        self.running = False
+
+    def roll_up(self, db: Session) -> int:
+        """Fold every vote past the watermark into the rollups; returns the votes processed"""
+        if db.get(RollupWatermark, WATERMARK_NAME) is None:
+            try:
+                db.add(RollupWatermark(name=WATERMARK_NAME, last_id=0))
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # another worker created it first
+
+        # Votes younger than the grace period may still have lower ids in flight
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.rollup_grace_seconds)
+        processed = 0
+        while True:
+            # Held until the batch commits; a concurrent pass waits, then sees the moved watermark
+            watermark = db.query(RollupWatermark)\
+                .filter(RollupWatermark.name == WATERMARK_NAME)\
+                .with_for_update()\
+                .populate_existing()\
+                .one()
+            rows = db.query(Vote.id, Vote.poll_id, Vote.option_id, Vote.created_at)\
+                .filter(Vote.id > watermark.last_id)\
+                .order_by(Vote.id)\
+                .limit(settings.rollup_batch_size)\
+                .all()
+            ready = list(itertools.takewhile(lambda row: _as_utc(row.created_at) < cutoff, rows))
+            if not ready:
+                break
+
+            counts = Counter(
+                (row.poll_id, floor_bucket(row.created_at, 60), row.option_id)
+                for row in ready
+            )
+            upsert_counts(db, VoteRollup, [
+                {"poll_id": poll_id, "bucket": bucket, "option_id": option_id, "count": count}
+                for (poll_id, bucket, option_id), count in counts.items()
+            ], ROLLUP_KEYS)
+
+            watermark.last_id = ready[-1].id
+            db.commit()
+            processed += len(ready)
+            if len(ready) < settings.rollup_batch_size:
+                break
+
+        db.commit()
+        return processed
+
+    def get_trend(self, db: Session, poll_id: int, resolution: str = "minute",
+                  since: Optional[datetime] = None, until: Optional[datetime] = None) -> list:
+        """Bucketed vote series of a poll, read only from the rollups"""
+        seconds = RESOLUTIONS[resolution]
+        until = _as_utc(until) if until else datetime.now(timezone.utc)
+        since = _as_utc(since) if since else until - DEFAULT_WINDOWS[resolution]
+
+        rows = db.query(VoteRollup.bucket, VoteRollup.option_id, VoteRollup.count)\
+            .filter(
+                VoteRollup.poll_id == poll_id,
+                VoteRollup.bucket >= floor_bucket(since, 60),
+                VoteRollup.bucket <= until
+            )\
+            .all()
+
+        buckets = defaultdict(lambda: defaultdict(int))
+        for bucket, option_id, count in rows:
+            buckets[floor_bucket(bucket, seconds)][option_id] += count
+
+        return [
+            {"start": start, "total": sum(options.values()), "options": dict(options)}
+            for start, options in sorted(buckets.items())
+        ]
+
+    async def start(self):
+        """Start rolling up votes in the background"""
+        self.running = True
+        asyncio.create_task(self._roll_up_periodically())
+
+    def stop(self):
+        """Stop the rollup job"""
+        self.running = False
+
+    async def _roll_up_periodically(self):
+        """Roll up new votes every `rollup_interval` seconds"""
+        while self.running:
+            db = SessionLocal()
+            try:
+                self.roll_up(db)
+            except Exception as e:
+                print(f"❌ Error rolling up votes: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+            await asyncio.sleep(settings.rollup_interval)
+
+vote_rollup_job = VoteRollupJob()
@@ -0,0 +1,13 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.config import settings
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency guarding operational endpoints; they don't exist until ADMIN_TOKEN is configured"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
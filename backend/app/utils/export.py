@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from app.database.database import open_read_session
+from app.models.models import PollLike, PollOption, Vote
+
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_COLUMNS = {
+    "votes": ["id", "user_id", "option_id", "option_text", "created_at"],
+    "likes": ["id", "user_id", "created_at"],
+}
+
+def _export_query(poll_id: int, kind: str, since: Optional[datetime]):
+    if kind == "votes":
+        stmt = select(Vote.id, Vote.user_id, Vote.option_id, PollOption.text, Vote.created_at)\
+            .join(PollOption, PollOption.id == Vote.option_id)\
+            .where(Vote.poll_id == poll_id)
+        model = Vote
+    else:
+        stmt = select(PollLike.id, PollLike.user_id, PollLike.created_at)\
+            .where(PollLike.poll_id == poll_id)
+        model = PollLike
+
+    if since is not None:
+        stmt = stmt.where(model.created_at > since)
+
+    # yield_per turns on stream_results: a server-side cursor on Postgres, so only
+    # one batch of rows is held in memory at a time
+    return stmt.order_by(model.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+def _format_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def stream_export(poll_id: int, kind: str = "votes", fmt: str = "csv", since: Optional[datetime] = None) -> Iterator[str]:
+    """
+    Yield the raw votes or likes of a poll as CSV or NDJSON, one encoded batch at a time.
+    Opens its own (read) session because it outlives the request's dependencies.
+    """
+    columns = EXPORT_COLUMNS[kind]
+    db = open_read_session()
+    try:
+        result = db.execute(_export_query(poll_id, kind, since))
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+            for batch in result.partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([_format_value(v) for v in row] for row in batch)
+                yield buffer.getvalue()
+        else:
+            for batch in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(columns, (_format_value(v) for v in row)))) + "\n"
+                    for row in batch
+                )
+    finally:
+        db.close()
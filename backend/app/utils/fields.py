@@ -0,0 +1,58 @@
+from typing import FrozenSet, List, Optional
+
+from fastapi import HTTPException
+
+from app.schemas.schemas import Poll as PollSchema, PollOption as PollOptionSchema
+
+class FieldSet:
+    """
+    The poll fields a client asked for with `?fields=`, e.g. `id,title,total_votes`.
+    Option fields are named `options.<field>`; a bare `options` means all of them.
+    The id is always included.
+    """
+
+    def __init__(self, poll: FrozenSet[str], option: FrozenSet[str]):
+        self.poll = poll
+        self.option = option
+
+    def wants(self, *names: str) -> bool:
+        return any(name in self.poll for name in names)
+
+    def trim(self, document: dict) -> dict:
+        trimmed = {name: value for name, value in document.items() if name in self.poll}
+        if "options" in trimmed:
+            trimmed["options"] = [
+                {name: value for name, value in option.items() if name in self.option}
+                for option in trimmed["options"]
+            ]
+        return trimmed
+
+    def trim_all(self, documents: List[dict]) -> List[dict]:
+        return [self.trim(document) for document in documents]
+
+def parse_fields(fields: Optional[str]) -> Optional[FieldSet]:
+    """The FieldSet of a `fields` query parameter, or None for all fields"""
+    if fields is None:
+        return None
+
+    poll_fields = {"id"}
+    option_fields = set()
+    for name in filter(None, (name.strip() for name in fields.split(","))):
+        if name.startswith("options."):
+            option_field = name[len("options."):]
+            if option_field not in PollOptionSchema.model_fields:
+                raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+            poll_fields.add("options")
+            option_fields.add(option_field)
+        elif name in PollSchema.model_fields:
+            poll_fields.add(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+
+    if "options" in poll_fields and not option_fields:
+        option_fields = set(PollOptionSchema.model_fields)
+    return FieldSet(frozenset(poll_fields), frozenset(option_fields))
+
+def wanted(fields: Optional[FieldSet], *names: str) -> bool:
+    """Whether any of the fields is part of the response (all are without `fields`)"""
+    return fields is None or fields.wants(*names)
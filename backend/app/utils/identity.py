@@ -0,0 +1,158 @@
+"""
+Signed anonymous identities, used when IDENTITY_MODE=token.
+
+A visitor is identified by a compact JWT over its session id and, once it has
+one, its users row id. Verifying the token needs no database access, so reads
+never touch `users`; the row is only created (in batches) the first time the
+visitor writes something, and the response then carries a re-issued token
+with the row id in the X-Identity-Token header.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import insert as generic_insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import DEFAULT_SECRET_KEY, settings
+from app.database.database import SessionLocal
+from app.models.models import User
+
+IDENTITY_HEADER = "X-Identity-Token"
+
+class Identity(NamedTuple):
+    session_id: str
+    user_id: Optional[int]
+
+def visitor_username(session_id: str) -> str:
+    return f"visitor_{session_id[:8]}"
+
+VISITOR_EMAIL_DOMAIN = "@anonymous.local"
+
+def visitor_email(session_id: str) -> str:
+    return f"{session_id}{VISITOR_EMAIL_DOMAIN}"
+
+def visitor_session_id(user: User) -> Optional[str]:
+    """The session id a visitor user was created for, None for other users"""
+    if user.email and user.email.endswith(VISITOR_EMAIL_DOMAIN):
+        return user.email[:-len(VISITOR_EMAIL_DOMAIN)]
+    return None
+
+def check_identity_settings():
+    """Refuse token mode with the default SECRET_KEY: anyone could sign tokens for any visitor"""
+    if settings.identity_mode == "token" and settings.secret_key == DEFAULT_SECRET_KEY:
+        raise RuntimeError("IDENTITY_MODE=token needs a SECRET_KEY of its own")
+
+def issue_identity_token(session_id: str, user_id: Optional[int] = None) -> str:
+    from jose import jwt
+
+    expires = datetime.now(timezone.utc) + timedelta(days=settings.identity_token_expire_days)
+    claims = {"sid": session_id, "exp": expires}
+    if user_id is not None:
+        claims["uid"] = user_id
+    return jwt.encode(claims, settings.secret_key, algorithm=settings.algorithm)
+
+def verify_identity_token(token: str) -> Optional[Identity]:
+    from jose import JWTError, jwt
+
+    try:
+        claims = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return None
+    if not isinstance(claims.get("sid"), str):
+        return None
+    return Identity(claims["sid"], claims.get("uid"))
+
+def resolve_identity(identity_token: Optional[str], session_id: Optional[str]) -> Optional[Identity]:
+    """The caller's identity: a valid token wins over a raw (unverified, row-less) session id"""
+    identity = verify_identity_token(identity_token) if identity_token else None
+    if identity is None and session_id:
+        identity = Identity(session_id, None)
+    return identity
+
+def visitor(identity: Identity) -> User:
+    """Transient User standing in for the visitor's row; only id and username are meaningful"""
+    return User(id=identity.user_id, username=visitor_username(identity.session_id), email=visitor_email(identity.session_id))
+
+def create_visitors(db: Session, session_ids: List[str]) -> Dict[str, int]:
+    """
+    Ensure a users row for every session id with one multi-row INSERT that skips
+    existing rows, then read back all the ids. Commits.
+    """
+    def insert_rows(rows: List[dict]):
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            db.execute(insert(User.__table__).values(rows).on_conflict_do_nothing())
+        else:
+            existing = {email for email, in db.query(User.email).filter(User.email.in_([row["email"] for row in rows]))}
+            rows = [row for row in rows if row["email"] not in existing]
+            if rows:
+                db.execute(generic_insert(User.__table__), rows)
+
+    def read_ids() -> Dict[str, int]:
+        emails = {visitor_email(session_id): session_id for session_id in session_ids}
+        return {
+            emails[email]: user_id
+            for user_id, email in db.query(User.id, User.email).filter(User.email.in_(list(emails)))
+        }
+
+    insert_rows([
+        {"username": visitor_username(session_id), "email": visitor_email(session_id), "hashed_password": "no_password", "is_active": True}
+        for session_id in session_ids
+    ])
+    ids = read_ids()
+
+    # Short usernames can collide between sessions; those fall back to the full session id
+    missing = [session_id for session_id in session_ids if session_id not in ids]
+    if missing:
+        insert_rows([
+            {"username": f"visitor_{session_id}", "email": visitor_email(session_id), "hashed_password": "no_password", "is_active": True}
+            for session_id in missing
+        ])
+        ids = read_ids()
+
+    db.commit()
+    return ids
+
+class VisitorMaterializer:
+    """
+    Creates users rows for identities that need a durable one. Requests arriving
+    within `identity_batch_window` seconds of each other share one INSERT.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def user_id(self, session_id: str) -> int:
+        future = self._pending.get(session_id)
+        if future is None:
+            future = self._pending[session_id] = asyncio.get_running_loop().create_future()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_soon())
+        return await future
+
+    async def _flush_soon(self):
+        await asyncio.sleep(settings.identity_batch_window)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+
+        db = SessionLocal()
+        try:
+            ids = create_visitors(db, list(pending))
+            for session_id, future in pending.items():
+                if session_id in ids:
+                    future.set_result(ids[session_id])
+                else:
+                    future.set_exception(RuntimeError(f"Could not create a user for session {session_id[:8]}"))
+        except Exception as e:
+            db.rollback()
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            db.close()
+
+visitor_materializer = VisitorMaterializer()
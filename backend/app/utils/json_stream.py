@@ -0,0 +1,124 @@
+import json
+from typing import Iterable, Iterator, List, Optional, Union
+
+_decoder = json.JSONDecoder()
+
+WHITESPACE = " \t\r\n"
+_NOTHING = object()
+
+class MalformedRecord(ValueError):
+    """Returned in place of a record that isn't valid JSON, so the stream can carry on"""
+
+class JSONRecordStream:
+    """
+    Incremental parser for a stream of JSON objects, either newline-delimited
+    (NDJSON) or wrapped in a single top-level JSON array.
+
+    Feed it text chunks as they arrive; every complete record is returned as soon
+    as it has been read, so memory stays bounded by the largest single record.
+    A record that is complete but not valid JSON is returned as a MalformedRecord
+    in its place and skipped; only a record larger than `max_record_size` (whose
+    end can't be found) raises ValueError.
+    """
+
+    def __init__(self, max_record_size: int = 1024 * 1024):
+        self._buffer = ""
+        self._offset = 0
+        self._array: Optional[bool] = None  # unknown until the first non-blank character
+        self._ended = False  # the top-level array was closed
+        self.max_record_size = max_record_size
+
+    def _skip_separators(self):
+        """Skip whitespace, the top-level array brackets and the commas between elements"""
+        buffer = self._buffer
+        while self._offset < len(buffer):
+            char = buffer[self._offset]
+            if char in WHITESPACE or char == ",":
+                self._offset += 1
+            elif self._array is None:
+                self._array = char == "["
+                if self._array:
+                    self._offset += 1
+            elif self._array and char == "]" and not self._ended:
+                self._ended = True
+                self._offset += 1
+            else:
+                return
+
+    def _record_end(self) -> Optional[int]:
+        """
+        Where the record at the offset ends, judged by bracket depth and strings
+        only, or None if it continues past the buffered input. Only used once
+        decoding failed, to tell a truncated record from a malformed one.
+        """
+        buffer = self._buffer
+        depth = 0
+        in_string = escaped = False
+        for index in range(self._offset, len(buffer)):
+            char = buffer[index]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+                    if depth == 0:
+                        return index + 1
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                if depth <= 1:
+                    return index + 1
+                depth -= 1
+            elif depth == 0 and (char == "," or char == "\n"):
+                return index
+        return None
+
+    def _next(self, final: bool):
+        """The next record, or _NOTHING if there is none yet"""
+        self._skip_separators()
+        if self._offset >= len(self._buffer):
+            return _NOTHING
+        try:
+            record, end = _decoder.raw_decode(self._buffer, self._offset)
+            error = None
+        except json.JSONDecodeError as e:
+            end = self._record_end()
+            if end is None:
+                if not final:
+                    # Incomplete record, wait for more input (unless it can't be a sane record anymore)
+                    if len(self._buffer) - self._offset > self.max_record_size:
+                        raise ValueError(f"Record larger than {self.max_record_size} bytes")
+                    return _NOTHING
+                end = len(self._buffer)
+            record, error = None, MalformedRecord(f"Invalid JSON: {e.msg}")
+        if self._ended:
+            error = MalformedRecord("Unexpected data after the end of the array")
+        self._offset = max(end, self._offset + 1)
+        return error if error is not None else record
+
+    def _drain(self, final: bool) -> List[Union[dict, MalformedRecord]]:
+        records = []
+        while True:
+            record = self._next(final)
+            if record is _NOTHING:
+                return records
+            records.append(record)
+
+    def feed(self, text: str) -> List[Union[dict, MalformedRecord]]:
+        self._buffer = self._buffer[self._offset:] + text
+        self._offset = 0
+        return self._drain(final=False)
+
+    def close(self) -> List[Union[dict, MalformedRecord]]:
+        """Records left at the end of the stream; a truncated one comes back malformed"""
+        return self._drain(final=True)
+
+def iter_json_records(chunks: Iterable[str]) -> Iterator[Union[dict, MalformedRecord]]:
+    stream = JSONRecordStream()
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+    yield from stream.close()
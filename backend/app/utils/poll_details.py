@@ -1,68 +1,107 @@
 from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import func
-from typing import Optional
-from sqlalchemy.sql import func, select
+from typing import Dict, Optional, Tuple
+from sqlalchemy.sql import func, null, select
 
-from app.models.models import Poll, PollOption, User, Vote, PollLike
+from app.models.models import User
 from app.schemas.schemas import Poll as PollSchema, PollOption as PollOptionSchema
+from app.services.sharded_counters import sharded_counters
+from app.services.shared_tallies import shared_tallies
+from app.services.vote_log import vote_log
+from app.services.poll_archive import ARCHIVE_TABLES, HOT_TABLES, PollTables
+from app.services.user_activity import user_activity_cache
+from app.utils.fields import FieldSet, wanted
 
-def get_poll_details(db: Session, poll_id: int, user_id: Optional[int] = None):
-    """Get single poll with full details."""
-    
-    vote_count = select(func.count(Vote.id))\
-        .where(Vote.poll_id == Poll.id)\
-        .correlate(Poll)\
-        .scalar_subquery()
+def cached_counts(poll_id: int) -> Optional[Tuple[Dict[int, int], int]]:
+    """
+    Votes per option id and likes of a hot poll from the shared tallies or the
+    vote log, if enabled. The app never opens the vote log while shared tallies
+    are attached, so the two can't disagree.
+    """
+    tally = shared_tallies.counts(poll_id)
+    return tally if tally is not None else vote_log.counts(poll_id)
+
+def option_vote_counts(db: Session, poll_id: int, tables: PollTables = HOT_TABLES) -> Dict[int, int]:
+    """Votes per option id (options without votes may be missing)"""
+    tally = cached_counts(poll_id) if tables is HOT_TABLES else None
+    if tally is not None:
+        return tally[0]
+
+    # Hot polls keep sharded counters; summing a few shard rows beats counting votes
+    vote_counts = sharded_counters.counts(db, poll_id) if tables is HOT_TABLES else None
+    if vote_counts is not None:
+        return vote_counts
+
+    Vote = tables.vote
+    return dict(
+        db.query(Vote.option_id, func.count(Vote.id))
+            .filter(Vote.poll_id == poll_id)
+            .group_by(Vote.option_id)
+            .all()
+    )
+
+def poll_counts(db: Session, poll_id: int) -> Tuple[Dict[int, int], int]:
+    """Votes per option id and total likes of a hot poll, from memory when possible"""
+    tally = cached_counts(poll_id)
+    if tally is not None:
+        return tally
+    total_likes = db.query(func.count(HOT_TABLES.like.id)).filter(HOT_TABLES.like.poll_id == poll_id).scalar()
+    return option_vote_counts(db, poll_id), total_likes
+
+def get_poll_details(db: Session, poll_id: int, user_id: Optional[int] = None, tables: PollTables = HOT_TABLES, fields: Optional[FieldSet] = None):
+    """
+    Get single poll with full details, from the archive if it has been moved there.
+    With `fields`, the joins and counts behind fields not asked for are skipped
+    (those fields are left at their defaults).
+    """
+    Poll, PollOption, Vote, PollLike = tables
+
+    # In-memory tallies replace both the like subquery and the vote counts
+    tally = cached_counts(poll_id) if tables is HOT_TABLES and wanted(fields, "options", "total_votes", "total_likes") else None
+
+    if wanted(fields, "total_likes") and tally is None:
+        like_count = select(func.count(PollLike.id))\
+            .where(PollLike.poll_id == Poll.id)\
+            .correlate(Poll)\
+            .scalar_subquery()
+    else:
+        like_count = null()
     
-    like_count = select(func.count(PollLike.id))\
-        .where(PollLike.poll_id == Poll.id)\
-        .correlate(Poll)\
-        .scalar_subquery()
+    loads = []
+    if wanted(fields, "username"):
+        loads.append(joinedload(Poll.owner).load_only(User.id, User.username, User.email))
+    if wanted(fields, "options"):
+        loads.append(joinedload(Poll.options))
     
     poll_query = db.query(Poll)\
-        .add_columns(
-            vote_count.label('total_votes'),
-            like_count.label('total_likes')
-        )\
-        .options(
-            joinedload(Poll.owner).load_only(User.id, User.username, User.email),
-            joinedload(Poll.options)
-        )\
+        .add_columns(like_count.label('total_likes'))\
+        .options(*loads)\
         .filter(Poll.id == poll_id)\
         .one_or_none()
     
     if not poll_query:
+        if tables is HOT_TABLES:
+            return get_poll_details(db, poll_id, user_id, ARCHIVE_TABLES, fields)
         return None
     
-    poll, total_votes, total_likes = poll_query
+    poll, total_likes = poll_query
 
-    option_votes = db.query(
-        PollOption.id,
-        func.count(Vote.id).label('vote_count')
-    )\
-    .outerjoin(Vote)\
-    .filter(PollOption.poll_id == poll_id)\
-    .group_by(PollOption.id)\
-    .all()
-    
-    vote_counts = dict(option_votes)
+    if tally is not None:
+        vote_counts, total_likes = tally
+    else:
+        vote_counts = option_vote_counts(db, poll_id, tables) if wanted(fields, "options", "total_votes") else {}
+    total_votes = sum(vote_counts.values())
     
     user_vote = None
     user_liked = False
     
-    if user_id:
-        user_vote = db.query(Vote.option_id)\
-            .filter(Vote.poll_id == poll_id, Vote.user_id == user_id)\
-            .scalar()
-        
-        user_liked = db.query(PollLike.id)\
-            .filter(PollLike.poll_id == poll_id, PollLike.user_id == user_id)\
-            .first() is not None
+    if user_id and wanted(fields, "user_voted_option_id", "user_liked"):
+        user_vote, user_liked = user_activity_cache.get(user_id).state(poll_id)
     
     poll_data = PollSchema(
         id=poll.id,
         user_id=poll.user_id,
-        username=poll.owner.username,
+        username=poll.owner.username if wanted(fields, "username") else None,
         title=poll.title,
         description=poll.description,
         created_at=poll.created_at,
@@ -70,8 +109,8 @@ def get_poll_details(db: Session, poll_id: int, user_id: Optional[int] = None):
         booster=poll.booster,
         expires_in=poll.expires_in,
         total_votes=total_votes,
-        total_likes=total_likes,
-        options=[
+        total_likes=total_likes or 0,
+        options=[] if not wanted(fields, "options") else [
             PollOptionSchema(
                 id=opt.id,
                 text=opt.text,
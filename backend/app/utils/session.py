@@ -1,8 +1,16 @@
+import uuid
+from typing import Optional
+
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app.models.models import User
-from fastapi import Header, Depends
+from fastapi import Header, Depends, Response
+from app.config import settings
 from app.database.database import get_db
+from app.services.visitor_gc import visitor_gc
+from app.utils.identity import (
+    IDENTITY_HEADER, Identity, issue_identity_token, resolve_identity, visitor, visitor_email, visitor_materializer
+)
 
 def get_or_create_user_by_session(db: Session, session_id: str):
     """
@@ -20,6 +28,7 @@ def get_or_create_user_by_session(db: Session, session_id: str):
         if user.username != username:
             user.username = username
             db.commit()
+        visitor_gc.touch(user.id)
         return user
     
     # Try to create new user, handle race condition
@@ -43,8 +52,48 @@ def get_or_create_user_by_session(db: Session, session_id: str):
         # If still not found, raise the error
         raise
 
-def get_current_user(x_session_id: str | None = Header(None), db: Session = Depends(get_db)) -> User | None:
+def get_current_user(x_session_id: str | None = Header(None), x_identity_token: str | None = Header(None), db: Session = Depends(get_db)) -> User | None:
+    """
+    The caller, for per-user flags on reads. In token mode a verified token is
+    enough (no query); a raw session id is only looked up, never inserted, and a
+    visitor without a row yet has nothing to flag.
+    """
+    if settings.identity_mode == "token":
+        identity = resolve_identity(x_identity_token, x_session_id)
+        if identity is None:
+            return None
+        if identity.user_id is not None:
+            visitor_gc.touch(identity.user_id)
+            return visitor(identity)
+        return db.query(User).filter(User.email == visitor_email(identity.session_id)).first()
+
     if x_session_id:
         return get_or_create_user_by_session(db, x_session_id)
     return None
 
+async def get_acting_user(db: Session, response: Response, x_session_id: Optional[str], x_identity_token: Optional[str]) -> User:
+    """
+    The user a write is made as. Callers without any identity get a fresh one.
+    In token mode the users row is created (batched) only now, and the response
+    carries a token with its id for the client to send from then on.
+    """
+    if settings.identity_mode != "token":
+        session_id = x_session_id or str(uuid.uuid4())
+        db.info["session_id"], db.info["identity_token"] = session_id, None
+        return get_or_create_user_by_session(db, session_id)
+
+    identity = resolve_identity(x_identity_token, x_session_id) or Identity(str(uuid.uuid4()), None)
+    if identity.user_id is not None:
+        user = db.get(User, identity.user_id)
+        if user is None or user.email != visitor_email(identity.session_id):
+            # The row was garbage collected while the visitor was away (and its id
+            # possibly reused, as SQLite does for rowids); make a new one
+            identity = Identity(identity.session_id, None)
+    if identity.user_id is None:
+        identity = Identity(identity.session_id, await visitor_materializer.user_id(identity.session_id))
+        response.headers[IDENTITY_HEADER] = issue_identity_token(*identity)
+    # Read-your-writes stickiness follows the identity the write is made as
+    db.info["session_id"], db.info["identity_token"] = identity.session_id, None
+    visitor_gc.touch(identity.user_id)
+    return visitor(identity)
+
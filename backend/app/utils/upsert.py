@@ -0,0 +1,35 @@
+from typing import List
+
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+def upsert_counts(db: Session, model, rows: List[dict], keys: List[str], replace: bool = False):
+    """
+    Insert counter rows of `model`, adding to (or, with replace=True, overwriting)
+    the `count` of rows whose `keys` already exist. Uses a single
+    INSERT ... ON CONFLICT statement on Postgres and SQLite.
+    """
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(model).values(rows)
+        new_count = stmt.excluded.count if replace else model.count + stmt.excluded.count
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_={"count": new_count})
+        db.execute(stmt)
+        return
+
+    # Generic fallback: update in place, insert when the row does not exist yet
+    for row in rows:
+        new_count = row["count"] if replace else model.count + row["count"]
+        result = db.execute(
+            update(model)
+            .where(*[getattr(model, key) == row[key] for key in keys])
+            .values(count=new_count)
+        )
+        if result.rowcount == 0:
+            db.add(model(**row))
+    db.flush()
@@ -0,0 +1,73 @@
+import asyncio
+import secrets
+from typing import List, Optional, Tuple
+
+from app.config import settings
+
+class EventFeed:
+    """
+    Ring buffer of the global broadcast events, shared by every Server-Sent Events
+    subscriber. Each event is encoded into its SSE frame once, when published;
+    a subscriber only holds a cursor (the id of the next event it wants), so an
+    idle listener costs no more than a parked coroutine.
+
+    Event ids carry a token of this feed (`<token>-<n>`), so a Last-Event-ID
+    from before a restart, or from another worker's feed, is recognised.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._frames: List[Optional[bytes]] = [None] * capacity
+        self.token = secrets.token_hex(4)
+        self.next_id = 1  # id the next published event gets
+        self.subscribers = 0
+        self._waiter: Optional[asyncio.Event] = None
+
+    def publish(self, event_type: str, data: str):
+        event_id = self.next_id
+        self._frames[event_id % self.capacity] = f"id: {self.token}-{event_id}\nevent: {event_type}\ndata: {data}\n\n".encode()
+        self.next_id += 1
+
+        # Wake every parked subscriber at once; the next waiter gets a fresh event
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            waiter.set()
+
+    def cursor_after(self, last_event_id: Optional[str]) -> Tuple[int, bool]:
+        """
+        Cursor resuming after `last_event_id`, and whether the client must reset:
+        its id is from another feed (a restart, another worker) or unparseable.
+        Without an id, the cursor is at the next event.
+        """
+        if not last_event_id:
+            return self.next_id, False
+        token, _, number = last_event_id.rpartition("-")
+        try:
+            cursor = int(number) + 1
+        except ValueError:
+            return self.next_id, True
+        if token != self.token or cursor > self.next_id:
+            return self.next_id, True
+        return cursor, False
+
+    def read(self, cursor: int) -> Tuple[bytes, int, bool]:
+        """Frames from `cursor` on, the new cursor, and whether events were lost to the ring wrapping"""
+        oldest = max(1, self.next_id - self.capacity)
+        missed = cursor < oldest
+        cursor = max(cursor, oldest)
+        frames = b"".join(self._frames[event_id % self.capacity] for event_id in range(cursor, self.next_id))
+        return frames, self.next_id, missed
+
+    async def wait(self, cursor: int, timeout: float) -> bool:
+        """Wait until there is an event at `cursor`; False on timeout"""
+        if cursor < self.next_id:
+            return True
+        if self._waiter is None:
+            self._waiter = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._waiter.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+event_feed = EventFeed(settings.sse_buffer_size)
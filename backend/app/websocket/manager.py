@@ -1,54 +1,291 @@
 from fastapi import WebSocket
+import asyncio
 import json
-from typing import List, Dict
+import secrets
+import time
+from collections import Counter, OrderedDict, deque
+from typing import List, Dict, NamedTuple, Optional, Set, Union
 from datetime import datetime
 
+from app.config import settings
+from app.websocket.event_feed import event_feed
+from app.websocket.metrics import WebSocketMetrics
+
 def json_serializer(obj):
     """JSON serializer for objects not serializable by default json code"""
     if isinstance(obj, datetime):
         return obj.isoformat()
     raise TypeError(f"Type {type(obj)} not serializable")
 
+PING_MESSAGE = json.dumps({"type": "ping", "poll_id": 0, "data": {}})
+
+class EncodedMessage(NamedTuple):
+    """A message serialized ahead of time: `json` is one JSON object, without its seq"""
+    type: str
+    json: str
+
+class ReplayBuffer:
+    """
+    The last `size` encoded events of one stream, with their sequence ids.
+    `floor` is the highest id that has been evicted: a client that saw anything
+    after it can be brought up to date from the buffer alone.
+    """
+
+    def __init__(self, size: int, floor: int):
+        self.events = deque(maxlen=size)  # (seq, message_str)
+        self.floor = floor
+
+    def append(self, seq: int, message_str: str):
+        if len(self.events) == self.events.maxlen:
+            self.floor = self.events[0][0]
+        self.events.append((seq, message_str))
+
+    def since(self, seq: int) -> Optional[List[str]]:
+        """Events after `seq`, or None when some of them were already evicted"""
+        if seq < self.floor:
+            return None
+        return [message_str for event_seq, message_str in self.events if event_seq > seq]
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.poll_subscribers: Dict[int, List[WebSocket]] = {}  # poll_id -> websockets
 
-    async def connect(self, websocket: WebSocket):
+        # Sequence ids are `<token>-<n>`: n only orders this process's events, so a seq
+        # from before a restart or from another worker is recognised by its token
+        self.seq_token = secrets.token_hex(4)
+        self.next_seq = 1
+        self.global_replay = ReplayBuffer(settings.ws_replay_size, 0)
+        self.poll_replays: OrderedDict = OrderedDict()  # poll_id -> ReplayBuffer, least recently written first
+        self._evicted_poll_floor = 0
+        self.replaying: Dict[WebSocket, List[str]] = {}  # websocket -> live messages held back while it catches up
+
+        # Liveness: every connection answers the heartbeat pings (or sends anything) within ws_heartbeat_timeout
+        self.last_seen: Dict[WebSocket, float] = {}  # websocket -> monotonic time of its last message
+        self.subscriptions: Dict[WebSocket, Set[int]] = {}  # websocket -> subscribed poll ids
+        self.client_keys: Dict[WebSocket, str] = {}  # websocket -> session id or IP it counts against
+        self.connections_per_client: Counter = Counter()
+        self.client_ips: Dict[WebSocket, str] = {}  # websocket -> peer IP, capped too: session ids are client-chosen
+        self.connections_per_ip: Counter = Counter()
+        self.counters: Counter = Counter()  # accepted, rejected, reaped, send_failures, disconnected
+        self.heartbeat_running = False
+        self.metrics = WebSocketMetrics()
+
+    def _encode(self, message: Union[dict, EncodedMessage]) -> tuple:
+        seq = self.next_seq
+        self.next_seq += 1
+        if isinstance(message, EncodedMessage):
+            return seq, f'{message.json[:-1]}, "seq": "{self.seq_token}-{seq}"}}'
+        return seq, json.dumps({**message, "seq": f"{self.seq_token}-{seq}"}, default=json_serializer)
+
+    def _poll_replay(self, poll_id: int) -> ReplayBuffer:
+        buffer = self.poll_replays.get(poll_id)
+        if buffer is None:
+            buffer = self.poll_replays[poll_id] = ReplayBuffer(settings.ws_replay_poll_size, self._evicted_poll_floor)
+            while len(self.poll_replays) > settings.ws_replay_polls:
+                _, evicted = self.poll_replays.popitem(last=False)
+                # Every event of a poll without a buffer is at or below this id
+                last_seq = evicted.events[-1][0] if evicted.events else evicted.floor
+                self._evicted_poll_floor = max(self._evicted_poll_floor, last_seq)
+        self.poll_replays.move_to_end(poll_id)
+        return buffer
+
+    def missed_events(self, poll_id: int, since: str) -> Optional[List[str]]:
+        """
+        Encoded events of a stream (0 = global) after the seq `since`, or None when
+        the client has to resync: the gap is older than the buffer, or the seq is
+        from another process (a restart, another worker) or unparseable.
+        """
+        token, _, number = since.rpartition("-")
+        try:
+            since = int(number)
+        except ValueError:
+            return None
+        if token != self.seq_token or since > self.next_seq - 1:
+            return None
+        if poll_id == 0:
+            return self.global_replay.since(since)
+        buffer = self.poll_replays.get(poll_id)
+        if buffer is None:
+            return [] if since >= self._evicted_poll_floor else None
+        return buffer.since(since)
+
+    @property
+    def last_seq(self) -> str:
+        return f"{self.seq_token}-{self.next_seq - 1}"
+
+    def hold(self, websocket: WebSocket):
+        """Queue live broadcasts to `websocket` instead of sending them, until release()"""
+        self.replaying[websocket] = []
+
+    async def release(self, websocket: WebSocket):
+        """Send the broadcasts queued since hold(), in order, and go back to sending live"""
+        try:
+            # More may be queued while sending
+            while self.replaying.get(websocket):
+                held, self.replaying[websocket] = self.replaying[websocket], []
+                for message_str in held:
+                    await websocket.send_text(message_str)
+        finally:
+            self.replaying.pop(websocket, None)
+
+    async def _send(self, websocket: WebSocket, message_str: str):
+        if websocket in self.replaying:
+            self.replaying[websocket].append(message_str)
+        else:
+            await websocket.send_text(message_str)
+
+    async def connect(self, websocket: WebSocket, client_key: Optional[str] = None) -> bool:
+        """
+        Accept a connection unless its client (session id, else IP) already holds
+        `ws_max_connections_per_client`, or its IP `ws_max_connections_per_ip` (a
+        client can rotate session ids); rejected sockets are closed and False returned.
+        """
+        ip = websocket.client.host if websocket.client else "unknown"
+        client_key = client_key or ip
+        if (self.connections_per_client[client_key] >= settings.ws_max_connections_per_client
+                or self.connections_per_ip[ip] >= settings.ws_max_connections_per_ip):
+            self.counters["rejected"] += 1
+            await websocket.close(code=1008)  # policy violation
+            return False
+
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.client_keys[websocket] = client_key
+        self.connections_per_client[client_key] += 1
+        self.client_ips[websocket] = ip
+        self.connections_per_ip[ip] += 1
+        self.last_seen[websocket] = time.monotonic()
+        self.counters["accepted"] += 1
+        return True
 
     def disconnect(self, websocket: WebSocket):
+        if websocket not in self.last_seen:
+            return  # already cleaned up (e.g. reaped, then its receive loop ended)
+        self.counters["disconnected"] += 1
+        self.replaying.pop(websocket, None)
+        del self.last_seen[websocket]
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
-        # Remove from all poll subscriptions
-        for poll_id in self.poll_subscribers:
-            if websocket in self.poll_subscribers[poll_id]:
-                self.poll_subscribers[poll_id].remove(websocket)
+
+        client_key = self.client_keys.pop(websocket, None)
+        self.connections_per_client[client_key] -= 1
+        if self.connections_per_client[client_key] <= 0:
+            del self.connections_per_client[client_key]
+        ip = self.client_ips.pop(websocket, None)
+        self.connections_per_ip[ip] -= 1
+        if self.connections_per_ip[ip] <= 0:
+            del self.connections_per_ip[ip]
+
+        # Remove from its poll subscriptions, dropping polls nobody watches anymore
+        for poll_id in self.subscriptions.pop(websocket, ()):
+            subscribers = self.poll_subscribers.get(poll_id, [])
+            if websocket in subscribers:
+                subscribers.remove(websocket)
+            if not subscribers:
+                self.poll_subscribers.pop(poll_id, None)
+
+    @staticmethod
+    def is_pong(data: str) -> bool:
+        """Whether a client message is a heartbeat reply ("pong" or {"type": "pong"})"""
+        if data == "pong":
+            return True
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return False
+        return isinstance(message, dict) and message.get("type") == "pong"
+
+    def touch(self, websocket: WebSocket):
+        """Record that the client is alive (it sent a message or a pong)"""
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
 
     async def subscribe_to_poll(self, poll_id: int, websocket: WebSocket):
         if poll_id not in self.poll_subscribers:
             self.poll_subscribers[poll_id] = []
         if websocket not in self.poll_subscribers[poll_id]:
             self.poll_subscribers[poll_id].append(websocket)
+            self.subscriptions.setdefault(websocket, set()).add(poll_id)
 
     async def unsubscribe_from_poll(self, poll_id: int, websocket: WebSocket):
         if poll_id in self.poll_subscribers and websocket in self.poll_subscribers[poll_id]:
             self.poll_subscribers[poll_id].remove(websocket)
+            self.subscriptions.get(websocket, set()).discard(poll_id)
+            if not self.poll_subscribers[poll_id]:
+                del self.poll_subscribers[poll_id]
 
-    async def broadcast_to_poll(self, poll_id: int, message: dict):
-        if poll_id in self.poll_subscribers:
-            disconnected = []
-            message_str = json.dumps(message, default=json_serializer)
-            for websocket in self.poll_subscribers[poll_id]:
-                try:
-                    await websocket.send_text(message_str)
-                except:
-                    disconnected.append(websocket)
+    def _send_failed(self, websocket: WebSocket, error: Exception):
+        self.counters["send_failures"] += 1
+        print(f"⚠️ Dropping WebSocket {self.client_keys.get(websocket)}: send failed ({type(error).__name__}: {error})")
+        self.disconnect(websocket)
+
+    async def _close(self, websocket: WebSocket, code: int = 1001):
+        self.disconnect(websocket)
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass  # the transport is usually gone already
+
+    async def heartbeat(self):
+        """Ping every connection and reap those silent for longer than ws_heartbeat_timeout"""
+        now = time.monotonic()
+        for websocket, last_seen in list(self.last_seen.items()):
+            if now - last_seen > settings.ws_heartbeat_timeout:
+                self.counters["reaped"] += 1
+                await self._close(websocket)
+                continue
+            try:
+                await websocket.send_text(PING_MESSAGE)
+            except Exception as e:
+                self._send_failed(websocket, e)
+
+    async def start_heartbeat(self):
+        """Start pinging connections in the background"""
+        self.heartbeat_running = True
+        asyncio.create_task(self._heartbeat_periodically())
+
+    def stop_heartbeat(self):
+        """Stop the heartbeat"""
+        self.heartbeat_running = False
+
+    async def _heartbeat_periodically(self):
+        """Ping and reap every `ws_heartbeat_interval` seconds"""
+        while self.heartbeat_running:
+            await asyncio.sleep(settings.ws_heartbeat_interval)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                print(f"❌ Error in WebSocket heartbeat: {e}")
 
-            # Remove disconnected websockets
-            for websocket in disconnected:
-                self.disconnect(websocket)
+    def subscriber_counts(self) -> Dict[int, int]:
+        return {poll_id: len(subscribers) for poll_id, subscribers in self.poll_subscribers.items()}
+
+    def stats(self) -> dict:
+        """Connection counters; active counts are of live (not yet reaped) sockets"""
+        return {
+            "active_connections": len(self.active_connections),
+            "subscribed_polls": len(self.poll_subscribers),
+            "clients": len(self.connections_per_client),
+            "accepted": self.counters["accepted"],
+            "rejected": self.counters["rejected"],
+            "reaped": self.counters["reaped"],
+            "send_failures": self.counters["send_failures"],
+            "disconnected": self.counters["disconnected"],
+        }
+
+    async def broadcast_to_poll(self, poll_id: int, message: Union[dict, EncodedMessage]):
+        started = time.perf_counter()
+        seq, message_str = self._encode(message)
+        encoded = time.perf_counter()
+        self._poll_replay(poll_id).append(seq, message_str)
+        subscribers = list(self.poll_subscribers.get(poll_id, ()))
+        for websocket in subscribers:
+            try:
+                await self._send(websocket, message_str)
+            except Exception as e:
+                self._send_failed(websocket, e)
+        self.metrics.record_broadcast(poll_id, encoded - started, time.perf_counter() - encoded, len(message_str), len(subscribers))
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         try:
@@ -56,22 +293,22 @@ class ConnectionManager:
                 await websocket.send_text(json.dumps(message))
             else:
                 await websocket.send_text(message)
-        except Exception:
-            print(f"Error broadcasting personal message to {websocket.client.host}: {message}")
-            pass
+        except Exception as e:
+            self._send_failed(websocket, e)
 
-    async def broadcast(self, message: dict):
-        disconnected = []
-        message_str = json.dumps(message, default=json_serializer)
-        for websocket in self.active_connections:
+    async def broadcast(self, message: Union[dict, EncodedMessage]):
+        started = time.perf_counter()
+        seq, message_str = self._encode(message)
+        encoded = time.perf_counter()
+        self.global_replay.append(seq, message_str)
+        event_feed.publish(message.type if isinstance(message, EncodedMessage) else message["type"], message_str)
+        connections = list(self.active_connections)
+        for websocket in connections:
             try:
-                await websocket.send_text(message_str)
-            except:
-                disconnected.append(websocket)
-
-        # Remove disconnected websockets
-        for websocket in disconnected:
-            self.disconnect(websocket)
+                await self._send(websocket, message_str)
+            except Exception as e:
+                self._send_failed(websocket, e)
+        self.metrics.record_broadcast(None, encoded - started, time.perf_counter() - encoded, len(message_str), len(connections))
 
 # Create a global instance of the connection manager
 manager = ConnectionManager()
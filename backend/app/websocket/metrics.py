@@ -0,0 +1,167 @@
+import bisect
+import heapq
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Bucket upper bounds; an implicit +Inf bucket follows the last one
+SECONDS_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+BYTES_BUCKETS = [64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536]
+
+RATE_WINDOW = 60  # seconds of per-second byte counts kept for bytes_per_second
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout; observe() is one bisect"""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the last bound for the +Inf bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+    def exposition(self, name: str, labels: str = "") -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + ["+Inf"], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+class PollFanout:
+    __slots__ = ("broadcasts", "sends", "bytes", "seconds")
+
+    def __init__(self):
+        self.broadcasts = 0
+        self.sends = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+class WebSocketMetrics:
+    """
+    Counters and histograms of the broadcast path, cheap enough to leave on:
+    a broadcast costs a few perf_counter() calls, two bisects and some additions.
+    Per-poll fan-out cost is kept for the `max_polls` most recently broadcast polls.
+    """
+
+    def __init__(self, max_polls: int = 10000):
+        self.max_polls = max_polls
+        self.fanout_seconds = {"poll": Histogram(SECONDS_BUCKETS), "global": Histogram(SECONDS_BUCKETS)}
+        self.encode_seconds = Histogram(SECONDS_BUCKETS)
+        self.message_bytes = Histogram(BYTES_BUCKETS)
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.polls: OrderedDict = OrderedDict()  # poll_id -> PollFanout
+        self._rate = [0] * RATE_WINDOW  # bytes sent per second, indexed by second % RATE_WINDOW
+        self._rate_seconds = [0] * RATE_WINDOW
+
+    def record_broadcast(self, poll_id: Optional[int], encode_seconds: float, fanout_seconds: float, size: int, sends: int):
+        """One broadcast: poll_id None for the global stream"""
+        self.encode_seconds.observe(encode_seconds)
+        self.message_bytes.observe(size)
+        self.fanout_seconds["global" if poll_id is None else "poll"].observe(fanout_seconds)
+        self.messages_sent += sends
+        self.bytes_sent += size * sends
+
+        second = int(time.monotonic())
+        slot = second % RATE_WINDOW
+        if self._rate_seconds[slot] != second:
+            self._rate_seconds[slot] = second
+            self._rate[slot] = 0
+        self._rate[slot] += size * sends
+
+        if poll_id is not None:
+            fanout = self.polls.get(poll_id)
+            if fanout is None:
+                fanout = self.polls[poll_id] = PollFanout()
+                if len(self.polls) > self.max_polls:
+                    self.polls.popitem(last=False)
+            else:
+                self.polls.move_to_end(poll_id)
+            fanout.broadcasts += 1
+            fanout.sends += sends
+            fanout.bytes += size * sends
+            fanout.seconds += fanout_seconds
+
+    def bytes_per_second(self) -> float:
+        """Average over the last RATE_WINDOW seconds"""
+        now = int(time.monotonic())
+        return sum(
+            sent for sent, second in zip(self._rate, self._rate_seconds)
+            if now - second < RATE_WINDOW
+        ) / RATE_WINDOW
+
+    def top_polls(self, subscribers: Dict[int, int], top: int = 10) -> List[dict]:
+        """The polls with the highest cumulative fan-out time"""
+        hottest = heapq.nlargest(top, self.polls.items(), key=lambda item: item[1].seconds)
+        return [
+            {
+                "poll_id": poll_id,
+                "subscribers": subscribers.get(poll_id, 0),
+                "broadcasts": fanout.broadcasts,
+                "sends": fanout.sends,
+                "bytes": fanout.bytes,
+                "fanout_seconds": round(fanout.seconds, 6),
+                "mean_fanout_ms": round(fanout.seconds / fanout.broadcasts * 1000, 3),
+            }
+            for poll_id, fanout in hottest
+        ]
+
+    def summary(self) -> dict:
+        return {
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "bytes_per_second": round(self.bytes_per_second(), 1),
+            "encode_ms_p99": self.encode_seconds.quantile(0.99) * 1000,
+            "poll_fanout_ms_p50": self.fanout_seconds["poll"].quantile(0.5) * 1000,
+            "poll_fanout_ms_p99": self.fanout_seconds["poll"].quantile(0.99) * 1000,
+            "global_fanout_ms_p99": self.fanout_seconds["global"].quantile(0.99) * 1000,
+            "message_bytes_p99": self.message_bytes.quantile(0.99),
+        }
+
+    def exposition(self, connection_stats: dict, subscribers: Dict[int, int]) -> str:
+        """Prometheus text format"""
+        lines = [
+            "# TYPE quickpoll_ws_connections gauge",
+            f"quickpoll_ws_connections {connection_stats['active_connections']}",
+            "# TYPE quickpoll_ws_subscribed_polls gauge",
+            f"quickpoll_ws_subscribed_polls {connection_stats['subscribed_polls']}",
+            "# TYPE quickpoll_ws_poll_subscribers_max gauge",
+            f"quickpoll_ws_poll_subscribers_max {max(subscribers.values(), default=0)}",
+        ]
+        for name in ("accepted", "rejected", "reaped", "send_failures", "disconnected"):
+            lines.append(f"# TYPE quickpoll_ws_{name}_total counter")
+            lines.append(f"quickpoll_ws_{name}_total {connection_stats[name]}")
+        lines += [
+            "# TYPE quickpoll_ws_messages_sent_total counter",
+            f"quickpoll_ws_messages_sent_total {self.messages_sent}",
+            "# TYPE quickpoll_ws_bytes_sent_total counter",
+            f"quickpoll_ws_bytes_sent_total {self.bytes_sent}",
+            "# TYPE quickpoll_ws_fanout_seconds histogram",
+        ]
+        for kind, histogram in self.fanout_seconds.items():
+            lines += histogram.exposition("quickpoll_ws_fanout_seconds", f'stream="{kind}"')
+        lines.append("# TYPE quickpoll_ws_encode_seconds histogram")
+        lines += self.encode_seconds.exposition("quickpoll_ws_encode_seconds")
+        lines.append("# TYPE quickpoll_ws_message_bytes histogram")
+        lines += self.message_bytes.exposition("quickpoll_ws_message_bytes")
+        return "\n".join(lines) + "\n"
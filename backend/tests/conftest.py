@@ -0,0 +1,77 @@
+import os
+import tempfile
+import uuid
+
+# The engine is created at import time: point it at a throwaway SQLite file first
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+
+import pytest
+
+import app.main  # noqa: F401  (registers every model)
+from app.config import settings
+from app.database.database import Base, SessionLocal, create_tables, engine
+
+@pytest.fixture
+def db():
+    from app.services.poll_snapshots import poll_snapshots
+
+    Base.metadata.drop_all(bind=engine)
+    create_tables()
+    # Poll ids start over with the tables: drop snapshots held for the previous test's polls
+    poll_snapshots._entries.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def vote_log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vote_log_dir", str(tmp_path))
+    return tmp_path
+
+@pytest.fixture
+def make_poll(db):
+    """Create an active poll with `options` options; returns (poll, [option ids])"""
+    from app.models.models import Poll, PollOption, User
+
+    def make(options: int = 2, booster: bool = False):
+        owner = User(username=f"owner_{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex}@test.local", hashed_password="x")
+        db.add(owner)
+        db.flush()
+        poll = Poll(title="Test poll", user_id=owner.id, booster=booster)
+        db.add(poll)
+        db.flush()
+        rows = [PollOption(text=f"option {i}", poll_id=poll.id) for i in range(options)]
+        db.add_all(rows)
+        db.commit()
+        return poll, [row.id for row in rows]
+    return make
+
+@pytest.fixture
+def voter(db):
+    """Create a user to vote with"""
+    from app.models.models import User
+
+    def make():
+        user = User(username=f"voter_{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex}@test.local", hashed_password="x")
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+@pytest.fixture
+def tally_segment(monkeypatch):
+    """A fresh, small shared tally segment name; unlinked afterwards"""
+    from multiprocessing import shared_memory
+
+    name = f"test_tallies_{uuid.uuid4().hex[:8]}"
+    monkeypatch.setattr(settings, "tally_shm_name", name)
+    monkeypatch.setattr(settings, "tally_slots", 64)
+    yield name
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
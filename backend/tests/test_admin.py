@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.websocket.manager import manager
+
+client = TestClient(app)
+
+@pytest.mark.parametrize("path", ["/metrics", "/api/admin/websockets", "/api/admin/profile/memory"])
+def test_admin_endpoints_hidden_without_token(path, monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", None)
+    assert client.get(path).status_code == 404
+
+def test_admin_endpoints_require_token(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.get("/api/admin/websockets").status_code == 403
+    assert client.get("/api/admin/websockets", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/api/admin/websockets", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+def test_memory_tracing_is_time_limited(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    assert client.post("/api/admin/profile/memory?seconds=100000", headers=headers).status_code == 400
+    started = client.post("/api/admin/profile/memory?seconds=60", headers=headers).json()
+    try:
+        assert started["tracing"] and 0 < started["stops_in_seconds"] <= 60
+    finally:
+        assert client.delete("/api/admin/profile/memory", headers=headers).json()["tracing"] is False
+
+def metric(text, name):
+    return next(float(line.split()[-1]) for line in text.splitlines() if line.startswith(name + " "))
+
+def test_metrics_expose_the_broadcast_path(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    assert client.get("/metrics", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    before = client.get("/metrics", headers=headers)
+    assert before.status_code == 200
+    assert before.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE quickpoll_ws_connections gauge" in before.text
+    assert "# TYPE quickpoll_ws_fanout_seconds histogram" in before.text
+
+    asyncio.run(manager.broadcast_to_poll(1, {"type": "poll_update", "poll_id": 1, "data": {}}))
+    after = client.get("/metrics", headers=headers).text
+    assert metric(after, "quickpoll_ws_encode_seconds_count") == metric(before.text, "quickpoll_ws_encode_seconds_count") + 1
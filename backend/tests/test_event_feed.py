@@ -0,0 +1,26 @@
+from app.websocket.event_feed import EventFeed
+
+def test_resumes_after_known_id():
+    feed = EventFeed(capacity=8)
+    feed.publish("poll_update", "{}")
+    feed.publish("poll_update", "{}")
+    assert feed.cursor_after(f"{feed.token}-1") == (2, False)
+    assert feed.cursor_after(None) == (3, False)
+
+def test_ids_from_another_feed_reset():
+    before_restart = EventFeed(capacity=8)
+    for _ in range(5):
+        before_restart.publish("poll_update", "{}")
+    feed = EventFeed(capacity=8)
+    assert feed.cursor_after(f"{before_restart.token}-4") == (1, True)
+    assert feed.cursor_after(f"{feed.token}-40") == (1, True)  # from the future
+    assert feed.cursor_after("garbage") == (1, True)
+
+def test_wrapped_ring_reports_missed_events():
+    feed = EventFeed(capacity=4)
+    for _ in range(10):
+        feed.publish("poll_update", "{}")
+    cursor, reset = feed.cursor_after(f"{feed.token}-2")
+    assert not reset
+    _, _, missed = feed.read(cursor)
+    assert missed
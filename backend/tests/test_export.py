@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.models import PollLike, Vote
+
+client = TestClient(app)
+
+def add_votes(db, make_poll, voter):
+    """A poll with one vote from January and one from March; returns (poll id, option ids)"""
+    poll, option_ids = make_poll()
+    db.add_all([
+        Vote(user_id=voter().id, poll_id=poll.id, option_id=option_ids[0], created_at=datetime(2026, 1, 1, tzinfo=timezone.utc)),
+        Vote(user_id=voter().id, poll_id=poll.id, option_id=option_ids[1], created_at=datetime(2026, 3, 1, tzinfo=timezone.utc)),
+    ])
+    db.commit()
+    return poll.id, option_ids
+
+def test_csv_export_streams_header_and_rows(db, make_poll, voter):
+    poll_id, option_ids = add_votes(db, make_poll, voter)
+    response = client.get(f"/api/polls/{poll_id}/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "user_id", "option_id", "option_text", "created_at"]
+    assert [(int(row[2]), row[3]) for row in rows[1:]] == [(option_ids[0], "option 0"), (option_ids[1], "option 1")]
+
+def test_ndjson_export_filters_by_since(db, make_poll, voter):
+    poll_id, option_ids = add_votes(db, make_poll, voter)
+    response = client.get(f"/api/polls/{poll_id}/export?format=ndjson&since=2026-02-01T00:00:00Z")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["option_id"] for record in records] == [option_ids[1]]
+    assert records[0]["created_at"].startswith("2026-03-01")
+
+def test_likes_export_and_bad_parameters(db, make_poll, voter):
+    poll, _ = make_poll()
+    db.add(PollLike(user_id=voter().id, poll_id=poll.id))
+    db.commit()
+
+    rows = list(csv.reader(io.StringIO(client.get(f"/api/polls/{poll.id}/export?kind=likes").text)))
+    assert rows[0] == ["id", "user_id", "created_at"] and len(rows) == 2
+    assert client.get(f"/api/polls/{poll.id}/export?format=xml").status_code == 400
+    assert client.get(f"/api/polls/{poll.id}/export?kind=switches").status_code == 400
+    assert client.get("/api/polls/999999/export").status_code == 404
@@ -0,0 +1,56 @@
+import asyncio
+import uuid
+
+from fastapi import Response
+
+from app.config import settings
+from app.models.models import User
+from app.utils.identity import IDENTITY_HEADER, issue_identity_token, visitor_email
+from app.utils.session import get_acting_user
+
+def test_token_for_a_reused_user_id_gets_a_new_user(db, monkeypatch):
+    monkeypatch.setattr(settings, "identity_mode", "token")
+    session_id = str(uuid.uuid4())
+
+    # The visitor's row was collected and its id handed to someone else
+    other = User(username="someone_else", email="someone@else.test", hashed_password="x")
+    db.add(other)
+    db.commit()
+    token = issue_identity_token(session_id, other.id)
+
+    response = Response()
+    user = asyncio.run(get_acting_user(db, response, session_id, token))
+    assert user.id != other.id
+    assert IDENTITY_HEADER in response.headers
+    assert db.get(User, user.id).email == visitor_email(session_id)
+
+def test_token_of_existing_visitor_is_trusted(db, monkeypatch):
+    monkeypatch.setattr(settings, "identity_mode", "token")
+    session_id = str(uuid.uuid4())
+    row = User(username=f"visitor_{session_id[:8]}", email=visitor_email(session_id), hashed_password="no_password")
+    db.add(row)
+    db.commit()
+
+    response = Response()
+    user = asyncio.run(get_acting_user(db, response, session_id, issue_identity_token(session_id, row.id)))
+    assert user.id == row.id
+    assert IDENTITY_HEADER not in response.headers
+
+def test_expired_token_is_not_trusted(monkeypatch):
+    from app.utils.identity import verify_identity_token
+
+    monkeypatch.setattr(settings, "identity_token_expire_days", -1)
+    assert verify_identity_token(issue_identity_token("abc", 7)) is None
+
+def test_token_mode_refuses_the_default_secret_key(monkeypatch):
+    import pytest
+
+    from app.config import DEFAULT_SECRET_KEY
+    from app.utils.identity import check_identity_settings
+
+    monkeypatch.setattr(settings, "identity_mode", "token")
+    monkeypatch.setattr(settings, "secret_key", DEFAULT_SECRET_KEY)
+    with pytest.raises(RuntimeError):
+        check_identity_settings()
+    monkeypatch.setattr(settings, "secret_key", "something-long-and-random")
+    check_identity_settings()
@@ -0,0 +1,20 @@
+from app.utils.json_stream import JSONRecordStream, MalformedRecord, iter_json_records
+
+def chunked(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_array_elements_keep_their_nesting():
+    records = list(iter_json_records(chunked('[{"a": 1}, [{"b": 2}], {"c": "x,]}"}]')))
+    assert records == [{"a": 1}, [{"b": 2}], {"c": "x,]}"}]
+
+def test_malformed_records_are_returned_in_place():
+    records = list(iter_json_records(chunked('{"a": 1}\n{"a": tru}\n{"a": 2}\n{"a": "cut')))
+    assert records[0] == {"a": 1} and records[2] == {"a": 2}
+    assert isinstance(records[1], MalformedRecord)
+    assert isinstance(records[3], MalformedRecord)
+
+def test_truncated_record_waits_for_more_input():
+    stream = JSONRecordStream()
+    assert stream.feed('[{"a": [1, 2') == []
+    assert stream.feed(']}]') == [{"a": [1, 2]}]
+    assert stream.close() == []
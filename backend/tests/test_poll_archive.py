@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.models.models import ArchivedPoll, ArchivedVote, Poll, PollLike, PollResultSnapshot, Vote
+from app.services import poll_archive
+from app.services.poll_archive import poll_archiver
+from app.utils.poll_details import get_poll_details
+
+client = TestClient(app)
+
+@pytest.fixture
+def closed_poll(db, make_poll, voter):
+    """A poll closed long ago, with two votes and a like, and no snapshot yet"""
+    poll, option_ids = make_poll()
+    first, second = voter(), voter()
+    db.add_all([
+        Vote(user_id=first.id, poll_id=poll.id, option_id=option_ids[0]),
+        Vote(user_id=second.id, poll_id=poll.id, option_id=option_ids[1]),
+        PollLike(user_id=first.id, poll_id=poll.id),
+    ])
+    poll.is_active = False
+    poll.deactivated_at = datetime.now(timezone.utc) - timedelta(days=settings.archive_after_days + 1)
+    db.commit()
+    return poll.id, option_ids
+
+def test_archiver_moves_polls_with_their_snapshot(db, closed_poll):
+    poll_id, _ = closed_poll
+    assert poll_archiver.archive(db) == 1
+
+    assert db.get(Poll, poll_id) is None
+    assert db.query(Vote).count() == 0
+    assert db.get(ArchivedPoll, poll_id) is not None
+    assert db.query(ArchivedVote).filter(ArchivedVote.poll_id == poll_id).count() == 2
+    assert db.query(PollResultSnapshot).filter(PollResultSnapshot.poll_id == poll_id).count() == 1
+
+def test_failed_batch_leaves_no_snapshot_behind(db, closed_poll, monkeypatch):
+    poll_id, _ = closed_poll
+
+    def fail(db, poll_ids):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(poll_archive, "unindex_polls", fail)
+    with pytest.raises(RuntimeError):
+        poll_archiver.archive(db)
+    db.rollback()
+
+    # Snapshot and move are one transaction: neither happened
+    assert db.get(Poll, poll_id) is not None
+    assert db.query(PollResultSnapshot).count() == 0
+
+def test_archived_polls_are_read_transparently(db, closed_poll):
+    poll_id, option_ids = closed_poll
+    poll_archiver.archive(db)
+
+    details = get_poll_details(db, poll_id)
+    assert details.total_votes == 2
+    assert details.total_likes == 1
+    assert [option.vote_count for option in details.options] == [1, 1]
+
+    listed = client.get("/api/polls/?status=inactive").json()
+    assert [(poll["id"], poll["total_votes"], poll["total_likes"]) for poll in listed] == [(poll_id, 2, 1)]
@@ -0,0 +1,70 @@
+import re
+import uuid
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database.database import engine
+from app.main import app
+
+client = TestClient(app)
+
+@contextmanager
+def statements():
+    """Collect the SQL statements run on the primary"""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+def tables(seen):
+    return {name for statement in seen for name in re.findall(r"(?:FROM|JOIN)\s+(\w+)", statement)}
+
+def create_voted_poll(headers):
+    poll = client.post("/api/polls/", json={"title": "Lunch", "options": ["soup", "salad"]}, headers=headers).json()
+    client.post("/api/votes/", json={"poll_id": poll["id"], "option_id": poll["options"][0]["id"]}, headers=headers)
+    return poll
+
+def test_fields_trim_the_list(db):
+    headers = {"X-Session-Id": str(uuid.uuid4())}
+    poll = create_voted_poll(headers)
+
+    response = client.get("/api/polls/?fields=title,total_votes", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == [{"id": poll["id"], "title": "Lunch", "total_votes": 1}]
+
+def test_fields_trim_poll_details(db):
+    headers = {"X-Session-Id": str(uuid.uuid4())}
+    poll = create_voted_poll(headers)
+
+    response = client.get(f"/api/polls/{poll['id']}?fields=title,options.vote_count", headers=headers)
+    assert response.json() == {"id": poll["id"], "title": "Lunch", "options": [{"vote_count": 1}, {"vote_count": 0}]}
+
+def test_unknown_fields_are_rejected(db):
+    assert client.get("/api/polls/?fields=title,secret").status_code == 400
+    assert client.get("/api/polls/1?fields=options.secret").status_code == 400
+
+def test_fields_skip_the_count_and_user_state_queries(db):
+    headers = {"X-Session-Id": str(uuid.uuid4())}
+    poll = create_voted_poll(headers)
+
+    with statements() as seen:
+        assert client.get("/api/polls/?fields=title", headers=headers).status_code == 200
+    assert not tables(seen) & {"votes", "poll_likes", "poll_options"}
+    assert not any("count(" in statement for statement in seen)
+
+    with statements() as seen:
+        assert client.get(f"/api/polls/{poll['id']}?fields=title", headers=headers).status_code == 200
+    assert not tables(seen) & {"votes", "poll_likes", "poll_options"}
+
+    # Without fields, the counts and the caller's votes are looked up
+    with statements() as seen:
+        client.get("/api/polls/", headers=headers)
+    assert {"votes", "poll_likes"} <= tables(seen)
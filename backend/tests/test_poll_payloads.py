@@ -0,0 +1,61 @@
+import json
+
+from app.models.models import Poll, PollLike, Vote
+from app.services.poll_payloads import PollPayloadBuilder
+from app.websocket.manager import json_serializer
+
+def schema_message(db, poll_id):
+    """The poll_update message as it was built before the fragments: a dict through json.dumps"""
+    db.expire_all()
+    poll = db.get(Poll, poll_id)
+    counts = {option.id: db.query(Vote).filter(Vote.option_id == option.id).count() for option in poll.options}
+    total_votes = sum(counts.values())
+    message = {
+        "type": "poll_update",
+        "poll_id": poll.id,
+        "data": {
+            "id": poll.id,
+            "title": poll.title,
+            "description": poll.description,
+            "total_votes": total_votes,
+            "total_likes": db.query(PollLike).filter(PollLike.poll_id == poll.id).count(),
+            "options": [{
+                "id": o.id,
+                "text": o.text,
+                "vote_count": counts[o.id],
+                "created_at": o.created_at,
+                "poll_id": o.poll_id,
+                "percentage": int((counts[o.id] / total_votes * 100) if total_votes > 0 else 0)
+            } for o in sorted(poll.options, key=lambda o: o.id)],
+            "user_id": poll.user_id,
+            "username": poll.owner.username,
+            "created_at": poll.created_at,
+            "booster": poll.booster,
+            "expires_in": poll.expires_in,
+            "is_active": poll.is_active
+        }
+    }
+    return json.dumps(message, default=json_serializer)
+
+def test_encoded_update_matches_the_schema_dump(db, make_poll, voter):
+    poll, option_ids = make_poll(options=3)
+    poll.title = 'Lunch "today" ☕'
+    poll.description = None
+    poll.expires_in = 3600
+    db.commit()
+    payloads = PollPayloadBuilder()
+
+    assert payloads.poll_update(db, poll.id).json == schema_message(db, poll.id)
+
+    # Only the counts change between updates; the cached fragments stay valid
+    user = voter()
+    db.add_all([Vote(user_id=user.id, poll_id=poll.id, option_id=option_ids[2]), PollLike(user_id=user.id, poll_id=poll.id)])
+    db.add(Vote(user_id=voter().id, poll_id=poll.id, option_id=option_ids[0]))
+    db.commit()
+    message = payloads.poll_update(db, poll.id)
+    assert message.type == "poll_update"
+    assert message.json == schema_message(db, poll.id)
+    assert json.loads(message.json)["data"]["options"][2]["percentage"] == 50
+
+def test_missing_poll_has_no_update(db):
+    assert PollPayloadBuilder().poll_update(db, 999999) is None
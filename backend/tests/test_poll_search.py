@@ -0,0 +1,12 @@
+from app.services.poll_search import index_missing, ranked_matches
+
+def matches(db, q):
+    return [poll_id for poll_id, _ in db.query(ranked_matches(db, q)).all()]
+
+def test_index_missing_covers_polls_written_directly(db, make_poll):
+    poll, _ = make_poll()
+    assert matches(db, "test") == []
+
+    assert index_missing(db) == 1
+    assert matches(db, "test") == [poll.id]
+    assert index_missing(db) == 0
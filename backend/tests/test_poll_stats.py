@@ -0,0 +1,39 @@
+from app.models.models import Vote
+from app.services import poll_stats
+from app.services.poll_stats import GLOBAL_KEY, PollStatsCache, compute_global_stats, compute_poll_stats
+
+def test_votes_keep_global_stats_until_they_age_out():
+    cache = PollStatsCache(max_age=60)
+    cache.set(GLOBAL_KEY, "hour", {"total_votes": 1})
+    cache.set(7, "hour", {"total_votes": 1})
+    cache.invalidate(7)
+    assert cache.get(7, "hour") is None
+    assert cache.get(GLOBAL_KEY, "hour") == {"total_votes": 1}
+
+    cache.max_age = 0
+    assert cache.get(GLOBAL_KEY, "hour") is None
+
+def test_top_is_sliced_from_the_cached_ranking(db, make_poll, voter, monkeypatch):
+    monkeypatch.setattr(poll_stats, "poll_stats_cache", PollStatsCache(max_age=60))
+    for votes in (3, 2, 1):
+        poll, option_ids = make_poll()
+        db.add_all([Vote(user_id=voter().id, poll_id=poll.id, option_id=option_ids[0]) for _ in range(votes)])
+    db.commit()
+
+    assert len(compute_global_stats(db, top=1)["top_polls"]) == 1
+    assert [p["total_votes"] for p in compute_global_stats(db, top=5)["top_polls"]] == [3, 2, 1]
+    assert len(compute_global_stats(db, top=1)["top_polls"]) == 1
+
+def test_poll_stats_pick_up_writes_made_elsewhere_after_max_age(db, make_poll, voter, monkeypatch):
+    cache = PollStatsCache(max_age=60)
+    monkeypatch.setattr(poll_stats, "poll_stats_cache", cache)
+    poll, option_ids = make_poll()
+    assert compute_poll_stats(db, poll.id)["total_votes"] == 0
+
+    # Another worker's vote: nothing invalidates this process's entry
+    db.add(Vote(user_id=voter().id, poll_id=poll.id, option_id=option_ids[0]))
+    db.commit()
+    assert compute_poll_stats(db, poll.id)["total_votes"] == 0
+
+    cache.max_age = 0
+    assert compute_poll_stats(db, poll.id)["total_votes"] == 1
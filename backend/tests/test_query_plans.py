@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+
+from app.benchmarks.query_plans import capture, explain, hot_paths
+from app.seed import analyze, build_dataset
+
+def test_hot_paths_do_not_scan_hot_tables(db):
+    build_dataset(500, 300, 20000, 5000, chunk_size=1000, until=datetime.now(timezone.utc))
+    analyze()
+
+    checked = 0
+    for name, run in hot_paths().items():
+        for statement, parameters in capture(run):
+            scans, _ = explain(statement, parameters)
+            assert not scans, f"{name} scans {', '.join(scans)}: {' '.join(statement.split())}"
+            checked += 1
+    assert checked
+
+def test_full_scans_are_reported(db):
+    assert explain("SELECT * FROM votes WHERE created_at > '2026-01-01'", ())[0] == ["votes"]
+    assert explain("SELECT * FROM votes WHERE id = 1", ())[0] == []
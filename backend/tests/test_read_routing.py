@@ -0,0 +1,64 @@
+import os
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import database
+from app.database.database import engine, get_read_db, open_read_session
+from app.main import app
+from app.utils.identity import IDENTITY_HEADER, issue_identity_token
+
+client = TestClient(app)
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """Route reads to a second SQLite file; returns its engine"""
+    replica_engine = create_engine("sqlite:///" + str(tmp_path / "replica.db"))
+    monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(bind=replica_engine))
+    monkeypatch.setattr(database, "_sticky_sessions", {})
+    monkeypatch.setattr(database, "_replica_down_until", 0.0)
+    yield replica_engine
+    replica_engine.dispose()
+
+def read_engine(x_session_id=None, x_identity_token=None):
+    dependency = get_read_db(x_session_id, x_identity_token)
+    db = next(dependency)
+    try:
+        return db.get_bind()
+    finally:
+        dependency.close()
+
+def test_reads_go_to_the_replica(replica):
+    assert read_engine() is replica
+    assert read_engine(str(uuid.uuid4())) is replica
+
+def test_unreachable_replica_falls_back_to_the_primary(tmp_path, monkeypatch):
+    broken = create_engine("sqlite:///" + os.path.join(str(tmp_path), "missing", "replica.db"))
+    monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(bind=broken))
+    monkeypatch.setattr(database, "_replica_down_until", 0.0)
+
+    assert open_read_session().get_bind() is engine
+    # Not retried until replica_retry_seconds have passed
+    assert database._replica_down_until > 0
+    monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(bind=create_engine("sqlite://")))
+    assert open_read_session().get_bind() is engine
+
+def test_writer_reads_its_own_writes_from_the_primary(db, replica):
+    headers = {"X-Session-Id": str(uuid.uuid4())}
+    assert client.post("/api/polls/", json={"title": "Lunch", "options": ["soup", "salad"]}, headers=headers).status_code == 200
+
+    assert read_engine(headers["X-Session-Id"]) is engine
+    assert read_engine(str(uuid.uuid4())) is replica
+
+def test_token_writer_without_session_header_is_sticky(db, replica, monkeypatch):
+    monkeypatch.setattr(settings, "identity_mode", "token")
+    response = client.post("/api/polls/", json={"title": "Lunch", "options": ["soup", "salad"]})
+    assert response.status_code == 200
+    token = response.headers[IDENTITY_HEADER]
+
+    assert read_engine(x_identity_token=token) is engine
+    assert read_engine(x_identity_token=issue_identity_token(str(uuid.uuid4()))) is replica
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.database.database import Base, create_tables, engine
+from app.models.models import Poll, PollLike, PollOption, User, Vote
+from app.seed import build_dataset, is_seeded
+
+UNTIL = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+def dataset(seed: int):
+    """Seed an empty database and return every seeded row"""
+    Base.metadata.drop_all(bind=engine)
+    create_tables()
+    counts = build_dataset(200, 50, 2000, 500, chunk_size=1000, seed=seed, until=UNTIL)
+    with engine.connect() as conn:
+        rows = {model.__tablename__: conn.execute(select(model.__table__).order_by(model.id)).all() for model in (User, Poll, PollOption, Vote, PollLike)}
+    return counts, rows
+
+def test_same_seed_builds_the_same_dataset(db):
+    counts, rows = dataset(seed=7)
+    assert counts["polls"] == 50 and counts["votes"] > 0 and counts["likes"] > 0
+    assert counts == {name: len(rows[table]) for name, table in
+                      [("users", "users"), ("polls", "polls"), ("options", "poll_options"), ("votes", "votes"), ("likes", "poll_likes")]}
+    assert is_seeded(db)
+
+    assert dataset(seed=7) == (counts, rows)
+    assert dataset(seed=8)[1]["votes"] != rows["votes"]
+
+def test_history_ends_at_until(db):
+    _, rows = dataset(seed=7)
+    latest = max(row.created_at for row in rows["votes"])
+    assert latest.replace(tzinfo=timezone.utc) <= UNTIL
@@ -0,0 +1,96 @@
+from app.models.models import PollCounterShard, ShardedPoll, Vote
+from app.services.sharded_counters import ShardedCounterService
+
+def vote(db, counters, poll, user, option_id, old_option_id=None):
+    counters.record_vote(db, poll, old_option_id, option_id)
+    if old_option_id is None:
+        db.add(Vote(user_id=user.id, poll_id=poll.id, option_id=option_id))
+    else:
+        db.query(Vote).filter(Vote.user_id == user.id, Vote.poll_id == poll.id).update({Vote.option_id: option_id})
+    db.commit()
+
+def test_sharded_state_is_shared_between_workers(db, make_poll, voter):
+    poll, (a, b) = make_poll()
+    first, second = ShardedCounterService(num_shards=4), ShardedCounterService(num_shards=4)
+    vote(db, second, poll, voter(), a)  # not hot anywhere yet: plain vote
+
+    first.hot_poll_ids.add(poll.id)
+    vote(db, first, poll, voter(), a)  # seeds from the committed vote, then counts itself
+    assert db.get(ShardedPoll, poll.id) is not None
+
+    # The other worker never saw the poll as hot, but must keep the shards current
+    user = voter()
+    vote(db, second, poll, user, b)
+    vote(db, second, poll, user, a, old_option_id=b)
+    assert first.counts(db, poll.id) == second.counts(db, poll.id) == {a: 3, b: 0}
+
+def test_unsharded_poll_has_no_counts(db, make_poll, voter):
+    poll, (a, _) = make_poll()
+    counters = ShardedCounterService()
+    vote(db, counters, poll, voter(), a)
+    assert counters.counts(db, poll.id) is None
+
+def test_compact_folds_shards_into_shard_zero(db, make_poll, voter):
+    poll, (a, b) = make_poll(booster=True)
+    counters = ShardedCounterService(num_shards=8)
+    for option_id in (a, a, b, a):
+        vote(db, counters, poll, voter(), option_id)
+    counters.compact(db, poll.id)
+
+    nonzero = db.query(PollCounterShard.shard, PollCounterShard.count)\
+        .filter(PollCounterShard.poll_id == poll.id, PollCounterShard.count != 0).all()
+    assert {shard for shard, _ in nonzero} == {0}
+    assert counters.counts(db, poll.id) == {a: 3, b: 1}
+
+def test_cool_down_unshards_closed_polls(db, make_poll, voter):
+    poll, (a, _) = make_poll(booster=True)
+    counters = ShardedCounterService()
+    vote(db, counters, poll, voter(), a)
+    poll.is_active = False
+    db.commit()
+
+    counters._cool_down(db)
+    assert counters.counts(db, poll.id) is None
+    assert db.query(PollCounterShard).filter(PollCounterShard.poll_id == poll.id).count() == 0
+
+def test_plain_poll_votes_skip_the_poll_row_lock(db, make_poll, voter):
+    from sqlalchemy import event
+
+    from app.database.database import engine
+
+    poll, (a, _) = make_poll()
+    db.refresh(poll)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        ShardedCounterService().record_vote(db, poll, None, a)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert len(statements) == 1 and "FROM polls" not in statements[0]
+
+def test_reseed_counts_a_vote_that_raced_the_seed(db, make_poll, voter):
+    from datetime import datetime, timedelta, timezone
+
+    from app.database.database import SessionLocal
+
+    poll, (a, _) = make_poll()
+    seeder, plain = ShardedCounterService(compaction_interval=60), ShardedCounterService()
+
+    # A worker that doesn't see the poll as hot checks sharded_polls, then another seeds it
+    user = voter()
+    plain.record_vote(db, poll, None, a)
+    other = SessionLocal()
+    try:
+        seeder.hot_poll_ids.add(poll.id)
+        vote(other, seeder, other.get(type(poll), poll.id), voter(), a)
+    finally:
+        other.close()
+    db.add(Vote(user_id=user.id, poll_id=poll.id, option_id=a))
+    db.commit()
+    assert seeder.counts(db, poll.id) == {a: 1}
+
+    db.query(ShardedPoll).update({ShardedPoll.seeded_at: datetime.now(timezone.utc) - timedelta(seconds=90)})
+    db.commit()
+    seeder._reseed_new(db)
+    assert seeder.counts(db, poll.id) == {a: 2}
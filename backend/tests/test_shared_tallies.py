@@ -0,0 +1,56 @@
+from app.config import settings
+from app.models.models import Vote
+from app.services.shared_tallies import BUCKETS, SharedTallies
+
+def attached():
+    tallies = SharedTallies()
+    assert tallies.attach()
+    return tallies
+
+def test_commit_updates_every_worker(db, tally_segment, make_poll, voter):
+    poll, (a, b) = make_poll()
+    first, second = attached(), attached()
+    assert first.counts(poll.id) == ({a: 0, b: 0}, 0)
+
+    db.add(Vote(user_id=voter().id, poll_id=poll.id, option_id=a))
+    second.commit(db, poll.id, {a: 1})
+    assert first.counts(poll.id) == ({a: 1, b: 0}, 0)
+
+def test_verify_repairs_writes_outside_commit(db, tally_segment, make_poll, voter):
+    poll, (a, b) = make_poll()
+    tallies = attached()
+    tallies.counts(poll.id)
+
+    db.add(Vote(user_id=voter().id, poll_id=poll.id, option_id=b))
+    db.commit()
+    assert tallies.counts(poll.id) == ({a: 0, b: 0}, 0)
+    assert tallies.verify(batch=100) == 1
+    assert tallies.counts(poll.id) == ({a: 0, b: 1}, 0)
+
+def test_verify_recovers_pending_of_dead_worker(db, tally_segment, make_poll, voter):
+    poll, (a, b) = make_poll()
+    tallies = attached()
+    tallies.counts(poll.id)
+
+    # A worker raised the bucket's pending count, committed, and died before applying
+    bucket = poll.id % BUCKETS
+    tallies._epochs[bucket] += 1
+    tallies._pending[bucket] += 1
+    db.add(Vote(user_id=voter().id, poll_id=poll.id, option_id=a))
+    db.commit()
+
+    tallies.verify(batch=100)  # first sight: could still be a slow commit
+    assert tallies._pending[bucket] == 1
+    tallies.verify(batch=100)
+    assert tallies._pending[bucket] == 0
+    assert tallies.counts(poll.id) == ({a: 1, b: 0}, 0)
+
+def test_new_generation_clears_segment(db, tally_segment, make_poll, monkeypatch):
+    poll, _ = make_poll()
+    old = attached()
+    old.counts(poll.id)
+    assert old._find(poll.id) is not None
+
+    monkeypatch.setattr(settings, "tally_generation", "next-release")
+    new = attached()
+    assert new._find(poll.id) is None
@@ -0,0 +1,46 @@
+import math
+
+from app.models.models import Poll
+from app.services.trending import TrendingRanking, _logaddexp
+
+def test_flushes_of_two_workers_add_up(db, make_poll):
+    poll, _ = make_poll()
+    first, second = TrendingRanking(), TrendingRanking()
+    first.ensure_loaded(db)
+    second.ensure_loaded(db)
+
+    first.record(poll.id, False, votes=1)
+    second.record(poll.id, False, votes=1)
+    expected = _logaddexp(first._scores[poll.id], second._scores[poll.id])
+    first.flush(db)
+    second.flush(db)
+
+    db.expire_all()
+    assert math.isclose(db.get(Poll, poll.id).trending_score, expected)
+    # The second worker now ranks with both workers' activity
+    assert math.isclose(second._scores[poll.id], expected)
+
+def test_stop_flushes_pending_scores(db, make_poll):
+    poll, _ = make_poll()
+    ranking = TrendingRanking()
+    ranking.record(poll.id, False, likes=1)
+    ranking.stop()
+
+    db.expire_all()
+    assert math.isclose(db.get(Poll, poll.id).trending_score, ranking._scores[poll.id])
+
+def test_reload_picks_up_polls_only_other_workers_saw(db, make_poll):
+    quiet, busy = make_poll()[0], make_poll()[0]
+    here, elsewhere = TrendingRanking(), TrendingRanking()
+    here.ensure_loaded(db)
+    elsewhere.ensure_loaded(db)
+
+    here.record(quiet.id, False, votes=1)
+    for _ in range(5):
+        elsewhere.record(busy.id, False, votes=1)
+    elsewhere.flush(db)
+    here.flush(db)
+    assert here.top(db)[0] == quiet.id
+
+    here.reload(db)
+    assert here.top(db) == [busy.id, quiet.id]
@@ -0,0 +1,25 @@
+import time
+
+from app.models.models import PollLike, Vote
+from app.services.user_activity import UserActivityCache
+
+def test_other_workers_writes_show_after_ttl(db, make_poll, voter):
+    poll, (a, _) = make_poll()
+    user = voter()
+    cache = UserActivityCache(ttl=0.05)
+    assert cache.get(user.id).state(poll.id) == (None, False)
+
+    # Written by another worker: this cache's handlers never saw it
+    db.add_all([Vote(user_id=user.id, poll_id=poll.id, option_id=a), PollLike(user_id=user.id, poll_id=poll.id)])
+    db.commit()
+    time.sleep(0.06)
+    assert cache.get(user.id).state(poll.id) == (a, True)
+
+def test_own_writes_update_loaded_users(db, make_poll, voter):
+    poll, (a, b) = make_poll()
+    user = voter()
+    cache = UserActivityCache(ttl=60)
+    cache.get(user.id)
+    cache.voted(user.id, poll.id, b)
+    cache.liked(user.id, poll.id)
+    assert cache.get(user.id).state(poll.id) == (b, True)
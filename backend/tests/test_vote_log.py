@@ -0,0 +1,93 @@
+import os
+
+from app.services.vote_log import VoteLog
+
+def open_logs(count):
+    logs = [VoteLog() for _ in range(count)]
+    for log in logs:
+        assert log.open()
+    return logs
+
+def test_replays_other_workers_events(db, vote_log_dir):
+    a, b = open_logs(2)
+    a.voted(1, None, 10)
+    b.voted(1, None, 11)
+    b.voted(1, 11, 10)
+    a.liked(1)
+    assert a.counts(1) == ({10: 2, 11: 0}, 1)
+    assert b.counts(1) == a.counts(1)
+
+def test_restart_loads_snapshot_and_replays_tail(db, vote_log_dir):
+    (a,) = open_logs(1)
+    a.voted(1, None, 10)
+    assert a.snapshot()
+    a.voted(1, None, 12)
+    a.close()
+
+    (b,) = open_logs(1)
+    assert b.counts(1) == ({10: 1, 12: 1}, 0)
+
+def test_worker_two_rotations_behind_reloads_snapshot(db, vote_log_dir):
+    a, b, c = open_logs(3)
+    a.voted(1, None, 10)
+    assert a.snapshot()
+    b.voted(1, None, 10)
+    assert b.snapshot()
+    c.voted(1, None, 12)
+    assert c.snapshot()
+
+    # a never saw the middle file; it must not skip b's vote
+    assert a.counts(1) == ({10: 2, 12: 1}, 0)
+    a.voted(1, None, 12)
+    assert a.snapshot()
+    for log in (b, c):
+        assert log.counts(1) == ({10: 2, 12: 2}, 0)
+
+def test_closed_polls_are_dropped(db, vote_log_dir):
+    a, b = open_logs(2)
+    a.voted(1, None, 10)
+    a.voted(2, None, 20)
+    b.closed([1])
+    assert a.counts(1) is None
+    assert a.counts(2) == ({20: 1}, 0)
+
+def test_rebuild_refused_while_other_workers_use_the_log(db, vote_log_dir):
+    (a,) = open_logs(1)
+    a.voted(1, None, 10)
+    os.remove(vote_log_dir / "tallies.snapshot")
+
+    b = VoteLog()
+    assert not b.open()
+    assert a.counts(1) == ({10: 1}, 0)
+
+def test_reconcile_repairs_a_lost_append_on_the_second_pass(db, vote_log_dir, make_poll, voter):
+    from app.models.models import Vote
+
+    poll, (a, b) = make_poll()
+    (log,) = open_logs(1)
+    log.voted(poll.id, None, a)
+    db.add(Vote(user_id=voter().id, poll_id=poll.id, option_id=a))
+    # Committed, but the worker died before appending its record
+    db.add(Vote(user_id=voter().id, poll_id=poll.id, option_id=b))
+    db.commit()
+
+    assert log.reconcile() == 0  # could still be in flight
+    assert log.counts(poll.id) == ({a: 1}, 0)
+    assert log.reconcile() == 1
+    assert log.counts(poll.id) == ({a: 1, b: 1}, 0)
+    assert log.reconcile() == 0
+
+def test_reconcile_leaves_in_flight_appends_alone(db, vote_log_dir, make_poll, voter):
+    from app.models.models import Vote
+
+    poll, (a, _) = make_poll()
+    (log,) = open_logs(1)
+    log.voted(poll.id, None, a)
+    db.add_all([Vote(user_id=voter().id, poll_id=poll.id, option_id=a) for _ in range(2)])
+    db.commit()
+    assert log.reconcile() == 0
+
+    # The second vote's append arrives after the first pass
+    log.voted(poll.id, None, a)
+    assert log.reconcile() == 0
+    assert log.counts(poll.id) == ({a: 2}, 0)
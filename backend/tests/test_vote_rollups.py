@@ -0,0 +1,17 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.models import RollupWatermark, Vote, VoteRollup
+from app.services.vote_rollups import WATERMARK_NAME, VoteRollupJob
+
+def test_roll_up_is_idempotent(db, make_poll, voter):
+    poll, (a, b) = make_poll()
+    old = datetime.now(timezone.utc) - timedelta(minutes=5)
+    db.add_all([Vote(user_id=voter().id, poll_id=poll.id, option_id=option_id, created_at=old) for option_id in (a, a, b)])
+    db.commit()
+
+    job = VoteRollupJob()
+    assert job.roll_up(db) == 3
+    assert job.roll_up(db) == 0
+    totals = {option_id: count for option_id, count in db.query(VoteRollup.option_id, VoteRollup.count)}
+    assert totals == {a: 2, b: 1}
+    assert db.get(RollupWatermark, WATERMARK_NAME).last_id == db.query(Vote.id).order_by(Vote.id.desc()).first()[0]
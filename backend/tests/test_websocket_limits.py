@@ -0,0 +1,38 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.config import settings
+from app.main import app
+from app.websocket.manager import ConnectionManager, manager
+
+def test_rotating_session_ids_hit_the_ip_cap(monkeypatch):
+    monkeypatch.setattr(settings, "ws_max_connections_per_ip", 2)
+    client = TestClient(app)
+    with client.websocket_connect(f"/ws/0?session_id={uuid.uuid4()}"), \
+            client.websocket_connect(f"/ws/0?session_id={uuid.uuid4()}"):
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(f"/ws/0?session_id={uuid.uuid4()}") as third:
+                third.receive_text()
+    assert not manager.connections_per_ip
+
+class DeadSocket:
+    """Accepts, then fails every send, as a socket whose peer went away"""
+    client = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        raise RuntimeError("connection closed")
+
+def test_failed_personal_message_drops_the_socket():
+    manager = ConnectionManager()
+    websocket = DeadSocket()
+    assert asyncio.run(manager.connect(websocket))
+    asyncio.run(manager.send_personal_message({"type": "pong"}, websocket))
+    assert websocket not in manager.active_connections
+    assert manager.counters["send_failures"] == 1
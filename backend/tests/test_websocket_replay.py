@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+from app.config import settings
+from app.websocket.manager import ConnectionManager
+
+def seqs(messages):
+    return [json.loads(message)["seq"] for message in messages]
+
+def test_reconnect_replays_only_missed_events():
+    manager = ConnectionManager()
+    asyncio.run(manager.broadcast_to_poll(1, {"type": "poll_update", "poll_id": 1, "data": {}}))
+    seen = manager.last_seq
+    asyncio.run(manager.broadcast_to_poll(1, {"type": "poll_update", "poll_id": 1, "data": {}}))
+    asyncio.run(manager.broadcast_to_poll(2, {"type": "poll_update", "poll_id": 2, "data": {}}))
+
+    assert seqs(manager.missed_events(1, seen)) == [f"{manager.seq_token}-2"]
+    assert manager.missed_events(1, manager.last_seq) == []
+
+def test_evicted_events_need_a_resync(monkeypatch):
+    monkeypatch.setattr(settings, "ws_replay_size", 2)
+    manager = ConnectionManager()
+    for _ in range(3):
+        asyncio.run(manager.broadcast({"type": "poll_created", "poll_id": 1, "data": {}}))
+    assert manager.missed_events(0, f"{manager.seq_token}-0") is None
+    assert len(manager.missed_events(0, f"{manager.seq_token}-1")) == 2
+
+def test_seq_of_another_worker_needs_a_resync():
+    earlier, later = ConnectionManager(), ConnectionManager()
+    for _ in range(5):
+        asyncio.run(later.broadcast({"type": "poll_created", "poll_id": 1, "data": {}}))
+    asyncio.run(earlier.broadcast({"type": "poll_created", "poll_id": 1, "data": {}}))
+
+    assert earlier.missed_events(0, later.last_seq) is None
+    assert earlier.missed_events(0, f"{earlier.seq_token}-9") is None
+    assert earlier.missed_events(0, "12345") is None
@@ -68,12 +68,17 @@ export default function PollList({ onOpenPoll, onNewPoll }: PollListProps) {
         setPolls(prev => prev.filter(poll => poll.id !== poll_id))
     }
 
+    // Missed too many events while disconnected to replay them
+    const handleResync = () => fetchPolls(status)
+
     window.addEventListener('pollUpdate', handlePollUpdate)
     window.addEventListener('pollDeleted', handlePollDeleted)
+    window.addEventListener('pollsResync', handleResync)
 
     return () => {
         window.removeEventListener('pollUpdate', handlePollUpdate)
         window.removeEventListener('pollDeleted', handlePollDeleted)
+        window.removeEventListener('pollsResync', handleResync)
     }
   }, [status])
 
@@ -18,18 +18,25 @@ export class ApiClient {
   ): Promise<ApiResponse<T>> {
     try {
       // Import session dynamically to avoid SSR issues
-      const { getSessionId } = await import('./session')
+      const { getSessionId, getIdentityToken, setIdentityToken } = await import('./session')
       const sessionId = await getSessionId()
+      const identityToken = getIdentityToken()
 
       const response = await fetch(`${this.baseUrl}${endpoint}`, {
         headers: {
           'Content-Type': 'application/json',
           'X-Session-ID': sessionId,
+          ...(identityToken ? { 'X-Identity-Token': identityToken } : {}),
           ...options.headers,
         },
         ...options,
       })
 
+      const issuedToken = response.headers.get('X-Identity-Token')
+      if (issuedToken) {
+        setIdentityToken(issuedToken)
+      }
+
       if (!response.ok) {
         return { error: `HTTP ${response.status}: ${response.statusText}` }
       }
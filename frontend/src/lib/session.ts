@@ -4,6 +4,7 @@
  */
 
 const SESSION_KEY = 'poll_session_id'
+const IDENTITY_TOKEN_KEY = 'poll_identity_token'
 
 // Store fingerprint promise to avoid multiple calls
 let fingerprintPromise: Promise<string> | null = null
@@ -114,6 +115,7 @@ export async function resetSessionId(): Promise<void> {
     localStorage.removeItem(SESSION_KEY)
     localStorage.removeItem(`${SESSION_KEY}_created`)
     localStorage.removeItem(`${SESSION_KEY}_last_active`)
+    localStorage.removeItem(IDENTITY_TOKEN_KEY)
     
     // Reset fingerprint cache
     try {
@@ -133,3 +135,20 @@ export async function resetSessionId(): Promise<void> {
   }
 }
 
+
+/**
+ * Signed identity issued by the backend (when it runs with IDENTITY_MODE=token)
+ * on the first write; sent back so it never has to look the visitor up
+ */
+export function getIdentityToken(): string | null {
+  if (typeof window === 'undefined') {
+    return null
+  }
+  return localStorage.getItem(IDENTITY_TOKEN_KEY)
+}
+
+export function setIdentityToken(token: string): void {
+  if (typeof window !== 'undefined') {
+    localStorage.setItem(IDENTITY_TOKEN_KEY, token)
+  }
+}
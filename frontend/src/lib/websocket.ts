@@ -1,10 +1,46 @@
 import { WSMessage } from '@/types/ws'
+import { Poll } from '@/types/poll'
 
 export class WebSocketManager {
   private connections: Map<number, WebSocket> = new Map()
   private globalConnection: WebSocket | null = null
   private reconnectAttempts: Map<number, number> = new Map()
   private maxReconnectAttempts = 5
+  // Last event seq seen per stream (0 = global), sent on reconnect to replay only what was missed
+  private lastSeq: Map<number, string> = new Map()
+  // The server caps connections per session (or per IP until the session id is known)
+  private sessionId: string | null = null
+
+  constructor() {
+    if (typeof window !== 'undefined') {
+      import('./session')
+        .then(({ getSessionId }) => getSessionId())
+        .then((sessionId) => { this.sessionId = sessionId })
+    }
+  }
+
+  private url(pollId: number) {
+    const params = new URLSearchParams()
+    const since = this.lastSeq.get(pollId)
+    if (since !== undefined) params.set('since', since)
+    if (this.sessionId) params.set('session_id', this.sessionId)
+    const query = params.toString()
+    return `ws://localhost:8000/ws/${pollId}${query ? `?${query}` : ''}`
+  }
+
+  // Server heartbeat: a connection that doesn't answer is reaped
+  private answerPing(ws: WebSocket, message: WSMessage) {
+    if (message.type !== 'ping') return false
+    ws.send(JSON.stringify({ type: 'pong' }))
+    return true
+  }
+
+  private noteSeq(pollId: number, message: WSMessage) {
+    // Events arrive in order on a connection; seqs from different workers don't compare
+    if (message.seq !== undefined) {
+      this.lastSeq.set(pollId, message.seq)
+    }
+  }
 
   /**
    * Connects to the global WebSocket for listening to poll_created events
@@ -15,15 +51,22 @@ export class WebSocketManager {
     }
 
     // Use poll_id 0 as a special case for global updates
-    const wsUrl = `ws://localhost:8000/ws/0`
-    const ws = new WebSocket(wsUrl)
+    const ws = new WebSocket(this.url(0))
 
     ws.onmessage = (event) => {
       try {
         const message: WSMessage = JSON.parse(event.data)
+        if (this.answerPing(ws, message)) return
+        this.noteSeq(0, message)
         
         // Handle different message types
         switch (message.type) {
+          case 'connected':
+            // The server could not replay everything missed while disconnected
+            if ((message.data as unknown as { resync?: boolean }).resync) {
+              window.dispatchEvent(new CustomEvent('pollsResync'))
+            }
+            break
           case 'poll_created':
           case 'poll_update':
           case 'vote_cast':
@@ -33,6 +76,16 @@ export class WebSocketManager {
               new CustomEvent('pollUpdate', { detail: message })
             )
             break
+          case 'polls_created':
+            // Bulk imports announce a whole chunk of polls in one message
+            for (const poll of message.data as unknown as Poll[]) {
+              window.dispatchEvent(
+                new CustomEvent('pollUpdate', {
+                  detail: { type: 'poll_created', poll_id: poll.id, data: poll },
+                })
+              )
+            }
+            break
           case 'poll_deleted':
             window.dispatchEvent(
               new CustomEvent('pollDeleted', { detail: { poll_id: message.poll_id } })
@@ -62,8 +115,7 @@ export class WebSocketManager {
       return this.connections.get(pollId)!
     }
 
-    const wsUrl = `ws://localhost:8000/ws/${pollId}`
-    const ws = new WebSocket(wsUrl)
+    const ws = new WebSocket(this.url(pollId))
 
     ws.onopen = () => {
       this.reconnectAttempts.set(pollId, 0)
@@ -72,6 +124,8 @@ export class WebSocketManager {
     ws.onmessage = (event) => {
       try {
         const message: WSMessage = JSON.parse(event.data)
+        if (this.answerPing(ws, message)) return
+        this.noteSeq(pollId, message)
         this.handleMessage(pollId, message)
       } catch (error) {
         console.error('Failed to parse WebSocket message:', error)
@@ -103,6 +157,7 @@ export class WebSocketManager {
       ws.close()
       this.connections.delete(pollId)
       this.reconnectAttempts.delete(pollId)
+      this.lastSeq.delete(pollId)
     }
   }
 
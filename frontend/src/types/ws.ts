@@ -3,5 +3,6 @@ import { Poll } from "./poll";
 export interface WSMessage {
   type: string
   poll_id: number
+  seq?: string  // `<token>-<n>`, opaque to the client
   data: Poll
 }